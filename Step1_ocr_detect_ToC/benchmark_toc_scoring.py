@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录页评分微基准
+用合成页面文本对比原逐行多正则实现与预编译评分引擎的速度，并校验判定结果一致
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+
+from optimized_ocr import TOCDetector
+
+
+class LegacyTOCDetector:
+    """原有的逐行多次re.search实现，仅作为基准和一致性参照"""
+
+    def __init__(self, detector: TOCDetector):
+        self.keywords = detector.toc_keywords['chinese'] + detector.toc_keywords['english']
+
+    def is_toc_page(self, text: str) -> bool:
+        if not text:
+            return False
+        text_lower = text.lower()
+        for keyword in self.keywords:
+            if keyword in text_lower:
+                return True
+        return self._enhanced_toc_detection(text)
+
+    def _enhanced_toc_detection(self, text: str) -> bool:
+        lines = text.split('\n')
+        toc_indicators = 0
+        lines_with_content = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            lines_with_content += 1
+            if re.search(r'^\d+\.?\s+[A-Za-z\u4e00-\u9fff]', line):
+                toc_indicators += 2
+            if re.search(r'\.{3,}\s*\d+\s*$', line):
+                toc_indicators += 2
+            if re.search(r'\.{3,}|…{3,}', line):
+                toc_indicators += 1
+            chapter_keywords = ['chapter', 'section', 'part', 'appendix', 'references',
+                                '章', '節', '部', '篇', '编', '編', '附录', '附錄', '参考文献']
+            if any(keyword in line.lower() for keyword in chapter_keywords):
+                toc_indicators += 1
+            if re.search(r'\d+[\.-]\d+', line):
+                toc_indicators += 1
+            if re.search(r'^\d+\s+[A-Za-z\u4e00-\u9fff].*\s+\d+$', line):
+                toc_indicators += 2
+        non_toc_keywords = ['季度', '年度', '报告', '報告', 'quarter', 'annual', 'report',
+                            '业绩', '業績', '表现', '表現', '良好', '下滑', '恢复']
+        if any(keyword in text.lower() for keyword in non_toc_keywords):
+            return False
+        if lines_with_content == 0:
+            return False
+        toc_density = toc_indicators / lines_with_content
+        return (toc_density > 0.5 and toc_indicators >= 5) or toc_indicators >= 8
+
+
+_CN_WORDS = ['环境', '社会', '治理', '员工', '排放', '能源', '供应链', '社区', '董事会', '风险',
+             '可持续发展', '气候变化', '安全生产', '客户服务', '合规经营', '数据安全']
+_EN_WORDS = ['environment', 'social', 'governance', 'employee', 'emissions', 'energy',
+             'supply', 'community', 'board', 'risk', 'climate', 'safety', 'customer']
+
+
+def _toc_line(rng: random.Random, i: int) -> str:
+    title = ''.join(rng.sample(_CN_WORDS, 2)) if rng.random() < 0.6 else ' '.join(rng.sample(_EN_WORDS, 3)).title()
+    page = rng.randint(1, 120)
+    style = rng.randrange(4)
+    if style == 0:
+        return f"{i}. {title} {'.' * rng.randint(3, 20)} {page}"
+    if style == 1:
+        return f"{i} {title}    {page}"
+    if style == 2:
+        return f"{i}.{rng.randint(1, 9)} {title}......{page}"
+    return f"{title} {page}"
+
+
+def _body_line(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return '，'.join(''.join(rng.sample(_CN_WORDS, 3)) for _ in range(rng.randint(2, 5))) + '。'
+    return ' '.join(rng.choice(_EN_WORDS) for _ in range(rng.randint(8, 20))) + '.'
+
+
+def synthetic_pages(num_pages: int, seed: int = 42) -> list:
+    """生成合成页面文本：约1/5为目录样式页面（部分不含“目录”字样），其余为正文"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(num_pages):
+        kind = rng.random()
+        if kind < 0.1:
+            lines = [rng.choice(['目录', 'CONTENTS', '目 录'])]
+            lines += [_toc_line(rng, i) for i in range(1, rng.randint(8, 30))]
+        elif kind < 0.2:
+            lines = [_toc_line(rng, i) for i in range(1, rng.randint(8, 30))]
+        else:
+            lines = [_body_line(rng) for _ in range(rng.randint(15, 60))]
+        pages.append('\n'.join(lines))
+    return pages
+
+
+def _time(func, pages, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in pages:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目录页评分微基准")
+    parser.add_argument('--pages', type=int, default=2000, help="合成页面数")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数（取最快一次）")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages, args.seed)
+    detector = TOCDetector()
+    legacy = LegacyTOCDetector(detector)
+
+    mismatches = [i for i, text in enumerate(pages)
+                  if legacy.is_toc_page(text) != detector.is_toc_page(text)]
+
+    legacy_time = _time(legacy.is_toc_page, pages, args.repeat)
+    engine_time = _time(detector.score, pages, args.repeat)
+
+    print(f"合成页面数: {len(pages)}")
+    print(f"原实现:   {legacy_time * 1000:.1f} ms  ({len(pages) / legacy_time:.0f} 页/秒)")
+    print(f"评分引擎: {engine_time * 1000:.1f} ms  ({len(pages) / engine_time:.0f} 页/秒)")
+    print(f"加速比:   {legacy_time / engine_time:.2f}x")
+    print(f"判定不一致页数: {len(mismatches)}")
+
+    if mismatches:
+        print(f"不一致的页面索引（前10个）: {mismatches[:10]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标题字号线索
+从文字层逐行读取字号和加粗，把字号明显大于正文的短行（以及与正文同号的加粗短行）作为候选标题，
+按字号排名（1为最大字号）写出逐页清单 <文件名>_headings.json。
+页码按去掉目录页后的顺序编号，与Step2内容列表的page_idx一致；
+结构增强阶段对齐标题时，据此确认版面分析漏标为正文的标题，减少调用LLM插入的次数。
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+import fitz
+
+logger = logging.getLogger(__name__)
+
+# 线索清单后缀（<文件名>_headings.json）
+HEADINGS_SUFFIX = "_headings.json"
+HEADING_HINTS_VERSION = 1
+
+# 字号不小于正文字号的此倍数时视为候选标题
+HEADING_SIZE_RATIO = 1.15
+# 候选标题的字符数范围；与正文同号的加粗行更短才算
+MIN_HEADING_CHARS = 2
+MAX_HEADING_CHARS = 40
+MAX_BOLD_HEADING_CHARS = 20
+# 字号排名最多区分的级数（更小的字号都记为最后一级）
+MAX_SIZE_RANKS = 6
+# 同一文本出现在超过此比例的页面上时视为页眉页脚
+REPEATED_LINE_RATIO = 0.3
+
+_WORD_RE = re.compile(r'[A-Za-z\u4e00-\u9fff]')
+
+
+def headings_sidecar_path(output_dir: str, pdf_name: str) -> str:
+    """线索清单路径"""
+    return os.path.join(output_dir, f"{pdf_name}{HEADINGS_SUFFIX}")
+
+
+def text_lines(page: fitz.Page) -> List[Dict[str, Any]]:
+    """页面文字行：文本、最大字号、是否加粗"""
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            spans = [s for s in line["spans"] if s["text"].strip()]
+            if not spans:
+                continue
+            lines.append({
+                'text': ''.join(s["text"] for s in spans).strip(),
+                'size': round(max(s["size"] for s in spans) * 2) / 2,
+                'bold': any(s["flags"] & 16 or 'bold' in s["font"].lower() for s in spans),
+            })
+    return lines
+
+
+def build_heading_hints(lines_by_page: Dict[int, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    由逐页文字行得到候选标题
+
+    Args:
+        lines_by_page: page_idx -> text_lines的结果（只需包含有文字层的页面）
+
+    Returns:
+        字典：body_size（正文字号）、sizes（候选标题字号，按排名）、pages（page_idx -> 候选标题列表）
+    """
+    # 正文字号：按字符数加权出现最多的字号
+    weights = Counter()
+    for lines in lines_by_page.values():
+        for line in lines:
+            weights[line['size']] += len(line['text'])
+    if not weights:
+        return {'body_size': 0.0, 'sizes': [], 'pages': {}}
+    body_size = weights.most_common(1)[0][0]
+
+    candidates = defaultdict(list)
+    occurrences = Counter()
+    for page_idx, lines in lines_by_page.items():
+        for line in lines:
+            text = line['text']
+            if not (MIN_HEADING_CHARS <= len(text) <= MAX_HEADING_CHARS) or not _WORD_RE.search(text):
+                continue
+            larger = line['size'] >= body_size * HEADING_SIZE_RATIO
+            emphasized = line['bold'] and line['size'] >= body_size and len(text) <= MAX_BOLD_HEADING_CHARS
+            if larger or emphasized:
+                candidates[page_idx].append(line)
+        for text in {line['text'] for line in candidates[page_idx]}:
+            occurrences[text] += 1
+
+    repeated_limit = max(2, len(lines_by_page) * REPEATED_LINE_RATIO)
+    sizes = sorted({line['size'] for lines in candidates.values() for line in lines
+                    if occurrences[line['text']] <= repeated_limit}, reverse=True)
+    rank = {size: min(i + 1, MAX_SIZE_RANKS) for i, size in enumerate(sizes)}
+
+    pages = {}
+    for page_idx in sorted(candidates):
+        hints = [{'text': line['text'], 'size': line['size'], 'rank': rank[line['size']], 'bold': line['bold']}
+                 for line in candidates[page_idx] if occurrences[line['text']] <= repeated_limit]
+        if hints:
+            pages[str(page_idx)] = hints
+    return {'body_size': body_size, 'sizes': sizes, 'pages': pages}
+
+
+def collect_heading_hints(doc: fitz.Document, skip_pages: Iterable[int] = (),
+                          kinds: Optional[str] = None) -> Dict[str, Any]:
+    """
+    读取整份文档的候选标题（单独运行时使用；Step1批处理在会话内逐页读取）
+
+    Args:
+        doc: 已打开的文档
+        skip_pages: 不参与编号的页码（从0开始，如目录页）
+        kinds: 分诊类别字符串，给出时只读取文字层页面（'T'）
+    """
+    skip = set(skip_pages)
+    lines_by_page = {}
+    page_idx = 0
+    for n in range(len(doc)):
+        if n in skip:
+            continue
+        if kinds is None or (n < len(kinds) and kinds[n] == 'T'):
+            lines_by_page[page_idx] = text_lines(doc.load_page(n))
+        page_idx += 1
+    return build_heading_hints(lines_by_page)
+
+
+def write_heading_hints(hints: Dict[str, Any], path: str, source_pdf: str, skip_pages: Iterable[int] = ()):
+    """写出线索清单（skip_pages为编号时跳过的原PDF页码，从0开始）"""
+    payload = {
+        'version': HEADING_HINTS_VERSION,
+        'source_pdf': source_pdf,
+        'skip_pages': sorted(skip_pages),
+        'body_size': hints['body_size'],
+        'sizes': hints['sizes'],
+        'pages': hints['pages']
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        print("用法: python heading_hints.py <PDF路径> [输出路径] [跳过的页码，从1开始，逗号分隔]")
+        sys.exit(1)
+    pdf_path = sys.argv[1]
+    output_path = (sys.argv[2] if len(sys.argv) > 2
+                   else headings_sidecar_path(os.path.dirname(pdf_path), os.path.splitext(os.path.basename(pdf_path))[0]))
+    skip_pages = [int(p) - 1 for p in sys.argv[3].split(',')] if len(sys.argv) > 3 else []
+
+    with fitz.open(pdf_path) as doc:
+        hints = collect_heading_hints(doc, skip_pages)
+    write_heading_hints(hints, output_path, os.path.abspath(pdf_path), skip_pages)
+    count = sum(len(h) for h in hints['pages'].values())
+    print(f"正文字号{hints['body_size']}，候选标题{count}行（{len(hints['pages'])}页），字号级数{len(hints['sizes'])}")
+    print(f"结果已保存: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入库去重索引
+按PDF内容哈希把重复的报告（重新下载、股票代码格式不同的文件名等）归并到一个规范文件，
+只处理规范文件；处理结束后用符号链接（不支持时复制）填充重复文件的输出文件夹
+"""
+
+import os
+import json
+import shutil
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from ocr_cache import file_sha256
+from pdf_triage import load_triage
+
+logger = logging.getLogger(__name__)
+
+# 索引文件名（位于输出基础目录下）
+INGEST_INDEX_NAME = "ingest_index.json"
+
+
+def pdf_content_hash(pdf_path: str, manifest=None, sidecar_dir: Optional[str] = None) -> str:
+    """
+    PDF内容哈希
+
+    优先取分诊清单（sidecar_dir为分诊目录）或处理清单中记录的哈希（文件大小和修改时间一致时），
+    否则读取文件计算。
+    """
+    triage = load_triage(pdf_path, sidecar_dir) if sidecar_dir else None
+    if triage is not None and triage.get('sha256'):
+        return triage['sha256']
+    if manifest is not None:
+        record = manifest.records.get(os.path.basename(pdf_path))
+        if record and record.get('sha256'):
+            stat = os.stat(pdf_path)
+            if stat.st_size == record.get('size') and stat.st_mtime_ns == record.get('mtime_ns'):
+                return record['sha256']
+    return file_sha256(pdf_path)
+
+
+class IngestIndex:
+    """内容哈希 -> PDF列表的索引，每组选出一个规范文件"""
+
+    def __init__(self, pdf_paths: Iterable[str], manifest=None, preferred: Iterable[str] = (),
+                 sidecar_dir: Optional[str] = None):
+        """
+        Args:
+            pdf_paths: 待入库的PDF路径
+            manifest: 处理清单（用于复用已记录的哈希）
+            preferred: 优先作为规范文件的路径（如已处理成功的PDF）
+            sidecar_dir: 分诊目录（用于复用分诊清单中的哈希）
+        """
+        preferred = set(preferred)
+        self.groups: Dict[str, List[str]] = {}
+        for pdf_path in pdf_paths:
+            try:
+                digest = pdf_content_hash(pdf_path, manifest, sidecar_dir)
+            except OSError as e:
+                logger.warning(f"无法计算内容哈希，按独立文件处理: {pdf_path} - {e}")
+                digest = f"unreadable:{pdf_path}"
+            self.groups.setdefault(digest, []).append(pdf_path)
+
+        # 规范文件：组内已处理成功的优先，其次按文件名排序取第一个
+        self._canonical: Dict[str, str] = {}
+        for paths in self.groups.values():
+            paths.sort(key=lambda p: (p not in preferred, os.path.basename(p)))
+            for pdf_path in paths:
+                self._canonical[pdf_path] = paths[0]
+
+    def canonical_of(self, pdf_path: str) -> str:
+        return self._canonical.get(pdf_path, pdf_path)
+
+    def is_duplicate(self, pdf_path: str) -> bool:
+        return self.canonical_of(pdf_path) != pdf_path
+
+    @property
+    def duplicate_count(self) -> int:
+        return sum(len(paths) - 1 for paths in self.groups.values())
+
+    def save(self, index_path: str):
+        """写出有重复的分组：哈希 -> 规范文件名和重复文件名"""
+        index = {
+            digest: {
+                'canonical': os.path.basename(paths[0]),
+                'duplicates': [os.path.basename(p) for p in paths[1:]]
+            }
+            for digest, paths in self.groups.items() if len(paths) > 1
+        }
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+
+
+def _link_or_copy(src_path: str, dst_path: str):
+    """创建相对符号链接，不支持时（如Windows无权限）复制"""
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.symlink(os.path.relpath(src_path, os.path.dirname(dst_path)), dst_path)
+    except (OSError, NotImplementedError):
+        shutil.copy2(src_path, dst_path)
+
+
+def link_outputs(canonical_pdf: str, canonical_dir: str, duplicate_pdf: str,
+                 duplicate_dir: str) -> Dict[str, str]:
+    """
+    用规范文件的输出填充重复文件的输出文件夹
+
+    文件名中的规范文件名替换为重复文件名；带source_pdf字段的JSON清单
+    （如跳过页清单）改写为指向重复文件自己的路径，其余文件建立符号链接。
+
+    Args:
+        canonical_pdf: 规范PDF路径
+        canonical_dir: 规范PDF的输出文件夹
+        duplicate_pdf: 重复PDF路径
+        duplicate_dir: 重复PDF的输出文件夹
+
+    Returns:
+        规范输出路径 -> 重复输出路径
+    """
+    canonical_stem = os.path.splitext(os.path.basename(canonical_pdf))[0]
+    duplicate_stem = os.path.splitext(os.path.basename(duplicate_pdf))[0]
+    os.makedirs(duplicate_dir, exist_ok=True)
+
+    mapping = {}
+    for name in sorted(os.listdir(canonical_dir)):
+        src_path = os.path.join(canonical_dir, name)
+        if not os.path.isfile(src_path):
+            continue
+        if name.startswith(canonical_stem):
+            name = duplicate_stem + name[len(canonical_stem):]
+        mapping[src_path] = os.path.join(duplicate_dir, name)
+
+    # 清单中的source_pdf：规范PDF -> 重复PDF，规范输出 -> 对应的重复输出
+    source_map = {os.path.abspath(src): os.path.abspath(dst) for src, dst in mapping.items()}
+    source_map[os.path.abspath(canonical_pdf)] = os.path.abspath(duplicate_pdf)
+
+    for src_path, dst_path in mapping.items():
+        sidecar = _load_sidecar(src_path)
+        if sidecar is not None:
+            sidecar['source_pdf'] = source_map.get(sidecar['source_pdf'], sidecar['source_pdf'])
+            with open(dst_path, 'w', encoding='utf-8') as f:
+                json.dump(sidecar, f, ensure_ascii=False, indent=2)
+        else:
+            _link_or_copy(src_path, dst_path)
+    return mapping
+
+
+def _load_sidecar(path: str) -> Optional[Dict[str, Any]]:
+    """读取带source_pdf字段的JSON清单，其他文件返回None"""
+    if not path.endswith('.json'):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and 'source_pdf' in data else None
+
+
+def duplicate_result(result: Dict[str, Any], canonical_pdf: str, duplicate_pdf: str,
+                     mapping: Dict[str, str]) -> Dict[str, Any]:
+    """由规范文件的处理结果得到重复文件的结果（输出路径换成重复文件夹中的路径）"""
+    remap = lambda path: mapping.get(path, path) if path else path
+    return dict(
+        result,
+        pdf_path=duplicate_pdf,
+        image_paths=[remap(p) for p in result.get('image_paths', [])],
+        output_pdf=remap(result.get('output_pdf', '')),
+        skip_sidecar=remap(result.get('skip_sidecar', '')),
+        titles_sidecar=remap(result.get('titles_sidecar', '')),
+        headings_sidecar=remap(result.get('headings_sidecar', '')),
+        duplicate_of=os.path.basename(canonical_pdf),
+        elapsed=0.0
+    )
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面文本MinHash签名
+对文字层文本取字符k-gram，计算固定种子的MinHash签名（跨进程、跨运行可比），
+随分诊清单一起写入分诊目录中的 <文件名>_<路径哈希>_minhash.npz（路径见pdf_triage.signatures_path），
+供近似重复检测使用
+"""
+
+import os
+import re
+import zlib
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 签名文件后缀
+MINHASH_SUFFIX = "_minhash.npz"
+
+# 签名长度（哈希函数个数）和字符k-gram长度
+NUM_PERM = 64
+SHINGLE_SIZE = 5
+# 去掉空白后不足此数的k-gram（封面、章节页等文字很少的页面）不计算签名
+MIN_PAGE_SHINGLES = 50
+
+# 通用哈希 h(x) = (a*x + b) mod p：x < 2^32、a < 2^31，乘积不会溢出uint64
+_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(20240607)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def page_shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    """去掉空白并转为小写后的字符k-gram集合（中文报告按字符切分，不依赖分词）"""
+    text = _WHITESPACE_RE.sub('', text).lower()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """
+    页面文本的MinHash签名
+
+    Returns:
+        长度为NUM_PERM的uint32数组；文字过少时返回None
+    """
+    shingles = page_shingles(text)
+    if len(shingles) < MIN_PAGE_SHINGLES:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    values = (np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME
+    return values.min(axis=0).astype(np.uint32)
+
+
+def signature_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """由两个签名估计Jaccard相似度"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def write_signatures(path: str, sha256: str, signatures: List[Optional[np.ndarray]]):
+    """
+    写出逐页签名（没有签名的页面不写）
+
+    Args:
+        path: 签名文件路径
+        sha256: PDF内容哈希（读取时据此判断签名是否过期）
+        signatures: 逐页签名，按页码排列
+    """
+    pages = [n for n, sig in enumerate(signatures) if sig is not None]
+    matrix = (np.stack([signatures[n] for n in pages]) if pages
+              else np.zeros((0, NUM_PERM), dtype=np.uint32))
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, sha256=np.array(sha256), page_count=np.array(len(signatures)),
+                            pages=np.array(pages, dtype=np.int32), signatures=matrix)
+
+
+def load_signatures(path: str, sha256: str) -> Optional[Dict[int, np.ndarray]]:
+    """
+    读取逐页签名
+
+    Args:
+        path: 签名文件路径
+        sha256: PDF内容哈希
+
+    Returns:
+        页码 -> 签名；文件不存在、损坏或与sha256不一致时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data['sha256']) != sha256 or data['signatures'].shape[1:] != (NUM_PERM,):
+                return None
+            return {int(n): sig for n, sig in zip(data['pages'], data['signatures'])}
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug(f"读取签名文件失败: {path} - {e}")
+        return None
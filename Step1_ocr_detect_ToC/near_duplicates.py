@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复报告检测
+读取分诊时写出的逐页MinHash签名，用LSH分桶找出文本近似相同的页面，
+再按共享页面的比例标记近似重复的报告（删节版、更换封面后重新发布的版本等）。
+结果写入 near_duplicates.json，后续阶段可按页面对应关系复用已有的版面分析、对齐和VLM结果。
+"""
+
+import os
+import sys
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from minhash import NUM_PERM, load_signatures, signature_similarity
+from pdf_triage import TRIAGE_DIR_NAME, load_triage, signatures_path
+
+logger = logging.getLogger(__name__)
+
+# 结果文件名（位于输出基础目录下）
+NEAR_DUPLICATES_NAME = "near_duplicates.json"
+
+# LSH分桶：16段 x 每段4个哈希值，估计相似度约0.5以上的页面对大概率落入同一桶
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# 单个分桶的键数上限：超过的分桶多为大量报告共用的模板页（免责声明、封底、GRI索引说明等），
+# 桶内两两组合是平方级，直接跳过，不作为候选
+MAX_BUCKET_SIZE = 50
+
+# 估计Jaccard相似度不低于此值的两页视为近似重复页
+PAGE_SIMILARITY = 0.8
+# 较短报告中有此比例以上的页面能在另一份报告中找到近似重复页时，两份报告视为近似重复
+REPORT_OVERLAP = 0.5
+# 近似重复报告至少共享的页数
+MIN_SHARED_PAGES = 2
+
+
+class LSHIndex:
+    """MinHash签名的LSH分桶索引"""
+
+    def __init__(self, bands: int = LSH_BANDS, rows: int = LSH_ROWS, max_bucket_size: int = MAX_BUCKET_SIZE):
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket_size = max_bucket_size
+        # 最近一次candidate_pairs跳过的超大分桶数
+        self.skipped_buckets = 0
+        self._buckets: List[Dict[bytes, List[Any]]] = [defaultdict(list) for _ in range(bands)]
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: Any, signature: np.ndarray):
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band][band_key].append(key)
+
+    def candidate_pairs(self) -> set:
+        """
+        至少在一个分桶中相遇的键对
+
+        同一对键在多个段中相遇时只保留一次（集合去重），每对只验证一次；
+        键数超过max_bucket_size的分桶视为模板页，整桶跳过（其中的页面仍可能在其他段中成为候选）。
+        """
+        pairs = set()
+        self.skipped_buckets = 0
+        for buckets in self._buckets:
+            for keys in buckets.values():
+                if len(keys) > self.max_bucket_size:
+                    self.skipped_buckets += 1
+                    continue
+                for i in range(len(keys)):
+                    for j in range(i + 1, len(keys)):
+                        pairs.add((keys[i], keys[j]) if keys[i] < keys[j] else (keys[j], keys[i]))
+        return pairs
+
+
+def _load_documents(pdf_paths: Iterable[str], sidecar_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读取各PDF的签名，内容完全相同的文件只保留一份（精确重复由入库去重索引处理）
+
+    Args:
+        pdf_paths: PDF路径
+        sidecar_dir: 分诊目录
+
+    Returns:
+        内容哈希 -> {'file', 'page_count', 'signatures'}
+    """
+    documents = {}
+    for pdf_path in pdf_paths:
+        triage = load_triage(pdf_path, sidecar_dir)
+        if triage is None or triage.get('status') != 'ok':
+            continue
+        digest = triage['sha256']
+        if digest in documents:
+            continue
+        signatures = load_signatures(signatures_path(pdf_path, sidecar_dir), digest)
+        if signatures is None:
+            logger.debug(f"没有可用的页面签名: {pdf_path}")
+            continue
+        documents[digest] = {
+            'file': os.path.basename(pdf_path),
+            'page_count': triage['page_count'],
+            'signatures': signatures
+        }
+    return documents
+
+
+def find_near_duplicates(pdf_paths: Iterable[str], sidecar_dir: str) -> Dict[str, Any]:
+    """
+    检测近似重复的报告和页面
+
+    Args:
+        pdf_paths: PDF路径（需已有分诊清单和签名文件）
+        sidecar_dir: 分诊目录
+
+    Returns:
+        字典：documents（参与比较的PDF数）、reports（近似重复的报告对，按共享比例降序）、
+        pages（文件名 -> {页码: [另一文件名, 页码, 相似度]}，每页取相似度最高的一个）
+    """
+    documents = _load_documents(pdf_paths, sidecar_dir)
+
+    index = LSHIndex()
+    for digest, doc in documents.items():
+        for page, signature in doc['signatures'].items():
+            index.add((digest, page), signature)
+
+    # 验证候选页对；同一报告内的重复页（如每章重复的免责声明）不计
+    page_matches: Dict[Tuple[str, int], Tuple[str, int, float]] = {}
+    shared: Dict[Tuple[str, str], Dict[str, set]] = defaultdict(lambda: defaultdict(set))
+    candidates = index.candidate_pairs()
+    if index.skipped_buckets:
+        logger.info(f"跳过{index.skipped_buckets}个超过{index.max_bucket_size}页的LSH分桶（模板页）")
+    for (digest_a, page_a), (digest_b, page_b) in candidates:
+        if digest_a == digest_b:
+            continue
+        similarity = signature_similarity(documents[digest_a]['signatures'][page_a],
+                                          documents[digest_b]['signatures'][page_b])
+        if similarity < PAGE_SIMILARITY:
+            continue
+        for key, other in (((digest_a, page_a), (digest_b, page_b)), ((digest_b, page_b), (digest_a, page_a))):
+            if key not in page_matches or page_matches[key][2] < similarity:
+                page_matches[key] = (other[0], other[1], similarity)
+        pair = shared[(digest_a, digest_b)]
+        pair[digest_a].add(page_a)
+        pair[digest_b].add(page_b)
+
+    reports = []
+    for (digest_a, digest_b), pages in shared.items():
+        # 以共享页数较少的一侧计算（一页可能与对方多页近似）
+        shared_pages = min(len(pages[digest_a]), len(pages[digest_b]))
+        signed = min(len(documents[digest_a]['signatures']), len(documents[digest_b]['signatures']))
+        overlap = shared_pages / signed if signed else 0.0
+        if shared_pages < MIN_SHARED_PAGES or overlap < REPORT_OVERLAP:
+            continue
+        reports.append({
+            'a': documents[digest_a]['file'],
+            'b': documents[digest_b]['file'],
+            'a_sha256': digest_a,
+            'b_sha256': digest_b,
+            'shared_pages': shared_pages,
+            'overlap': round(overlap, 3)
+        })
+    reports.sort(key=lambda r: (-r['overlap'], r['a'], r['b']))
+
+    pages: Dict[str, Dict[str, list]] = defaultdict(dict)
+    for (digest, page), (other, other_page, similarity) in sorted(page_matches.items()):
+        pages[documents[digest]['file']][str(page)] = [documents[other]['file'], other_page,
+                                                      round(similarity, 3)]
+
+    return {
+        'documents': len(documents),
+        'page_similarity': PAGE_SIMILARITY,
+        'report_overlap': REPORT_OVERLAP,
+        'reports': reports,
+        'pages': dict(pages)
+    }
+
+
+def write_near_duplicates(result: Dict[str, Any], path: str):
+    """写出检测结果"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def load_page_matches(path: str) -> Dict[str, Dict[int, Tuple[str, int, float]]]:
+    """
+    读取检测结果中的页面对应关系
+
+    Returns:
+        文件名 -> {页码: (另一文件名, 页码, 相似度)}；文件不存在或损坏时返回空字典
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        name: {int(page): tuple(match) for page, match in matches.items()}
+        for name, matches in result.get('pages', {}).items()
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else r"/Users/liucun/Desktop/目录页提取代码/USESG/downloaded_pdfs"
+    # 第二个参数为Step1的输出基础目录：从其下的triage/读取分诊清单，结果也写在该目录
+    output_base_dir = sys.argv[2] if len(sys.argv) > 2 else r"/Users/liucun/Desktop/目录页提取代码/processed_pdfs"
+    output_path = os.path.join(output_base_dir, NEAR_DUPLICATES_NAME)
+
+    pdf_paths = [os.path.join(input_dir, f) for f in sorted(os.listdir(input_dir)) if f.lower().endswith('.pdf')]
+    result = find_near_duplicates(pdf_paths, os.path.join(output_base_dir, TRIAGE_DIR_NAME))
+    write_near_duplicates(result, output_path)
+
+    print(f"比较了{result['documents']}个PDF（共{len(pdf_paths)}个，其余缺少分诊签名，"
+          f"可先运行 pdf_triage.py），近似重复报告{len(result['reports'])}对，"
+          f"有近似重复页的报告{len(result['pages'])}个")
+    for report in result['reports']:
+        print(f"  {report['a']} ~ {report['b']}: 共享{report['shared_pages']}页（{report['overlap']:.0%}）")
+    print(f"结果已保存: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
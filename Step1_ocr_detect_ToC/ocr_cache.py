@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR结果持久化缓存
+以 (PDF内容哈希, 页码, DPI, OCR语言/模型版本) 为键缓存识别文本，
+SQLite存储，按总大小上限做LRU淘汰，多个工作进程可共享同一缓存目录。
+命中时的访问时间先记在内存中，批量写回（避免每次读取都占用写锁并提交事务）
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import hashlib
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 访问时间批量写回：待写回的条目数或距上次写回的时间达到其一即写回
+ACCESS_FLUSH_ENTRIES = 256
+ACCESS_FLUSH_SECONDS = 30.0
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """基于SQLite的OCR文本缓存（LRU淘汰）"""
+
+    DB_NAME = "ocr_cache.sqlite3"
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存文本总大小上限（字节），超出后淘汰最久未使用的条目
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, self.DB_NAME)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # 距上次淘汰检查后新写入的字节数，累计到上限的5%时检查一次
+        self._written_since_check = 0
+        # 尚未写回的访问时间：key -> 最近命中时间
+        self._pending_access: Dict[str, float] = {}
+        self._last_flush = time.time()
+
+        # 预取线程也会查询缓存，连接允许跨线程使用，由锁串行化访问
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+        self._conn.commit()
+        self._evict()
+
+    @staticmethod
+    def make_key(pdf_hash: str, page_num: int, dpi: int, namespace: str) -> str:
+        """
+        构造缓存键
+
+        Args:
+            pdf_hash: PDF内容哈希
+            page_num: 页码（从0开始）
+            dpi: 渲染分辨率
+            namespace: OCR语言/模型版本标识
+        """
+        return f"{pdf_hash}:{page_num}:{dpi}:{namespace}"
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存文本，命中时记录访问时间（批量写回，见flush）"""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT text FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                now = time.time()
+                self._pending_access[key] = now
+                self.hits += 1
+                if (len(self._pending_access) >= ACCESS_FLUSH_ENTRIES
+                        or now - self._last_flush >= ACCESS_FLUSH_SECONDS):
+                    self._flush_access()
+                    self._conn.commit()
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"读取OCR缓存失败: {e}")
+            self.misses += 1
+            return None
+
+    def _flush_access(self):
+        """把内存中的访问时间写入当前事务（调用方持有锁并负责提交）"""
+        if self._pending_access:
+            self._conn.executemany("UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+                                   [(t, key) for key, t in self._pending_access.items()])
+            self._pending_access.clear()
+        self._last_flush = time.time()
+
+    def flush(self):
+        """写回尚未写入的访问时间（每个PDF处理完后和关闭时调用）"""
+        try:
+            with self._lock:
+                if self._pending_access:
+                    self._flush_access()
+                    self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写回OCR缓存访问时间失败: {e}")
+
+    def put(self, key: str, text: str):
+        """写入缓存文本"""
+        size = len(text.encode('utf-8'))
+        try:
+            with self._lock:
+                # 与待写回的访问时间合并为一个事务
+                self._flush_access()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, text, size, time.time())
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入OCR缓存失败: {e}")
+            return
+
+        self._written_since_check += size
+        if self._written_since_check >= self.max_bytes * 0.05:
+            self._evict()
+
+    def _evict(self):
+        """总大小超过上限时，按最近访问时间保留不超过上限90%的条目"""
+        self._written_since_check = 0
+        try:
+            with self._lock:
+                # 先写回访问时间，淘汰顺序才准确
+                self._flush_access()
+                self._conn.commit()
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total <= self.max_bytes:
+                    return
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    " SELECT key FROM ("
+                    "  SELECT key, SUM(size) OVER (ORDER BY last_access DESC) AS kept FROM entries"
+                    " ) WHERE kept > ?)",
+                    (int(self.max_bytes * 0.9),)
+                )
+                self._conn.commit()
+            logger.info(f"OCR缓存超过上限，已淘汰最久未使用的条目（原大小 {total / (1 << 20):.1f} MB）")
+        except sqlite3.Error as e:
+            logger.warning(f"OCR缓存淘汰失败: {e}")
+
+    def stats(self) -> dict:
+        """命中统计"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -8,15 +8,43 @@
 import os
 import sys
 import re
+import json
+import time
+
+# 进程启动计时起点（用于统计启动耗时）
+_PROCESS_START = time.time()
+
+import shutil
+import hashlib
 import logging
+import multiprocessing
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, Future
 import fitz  # PyMuPDF
 from PIL import Image
 import io
 import numpy as np
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Union, Callable
 from datetime import datetime
 
+from toc_scoring import TOCScoringEngine, TOCScore
+from ocr_cache import OCRCache, file_sha256
+from run_manifest import RunManifest
+from ingest_index import IngestIndex, INGEST_INDEX_NAME, link_outputs, duplicate_result
+from minhash import minhash_signature, write_signatures
+from near_duplicates import NEAR_DUPLICATES_NAME, find_near_duplicates, write_near_duplicates
+from toc_classifier import TOCClassifier, DEFAULT_MODEL_PATH, load_classifier, page_features
+from toc_parser import TOCTextParser, TOC_PARSER_VERSION, titles_sidecar_path, write_titles_sidecar
+from thread_budget import CPUMeter, apply_thread_budget, cpu_budget, threads_per_worker, utilization
+from heading_hints import (HEADING_HINTS_VERSION, build_heading_hints, headings_sidecar_path, text_lines,
+                           write_heading_hints)
+from pdf_triage import (analyze_text_layer, classify_page, MIN_TEXT_LAYER_CHARS, MIN_VALID_CHAR_RATIO,
+                        BLANK_CONTENT_BYTES, OCR_PAGE_KINDS, TRIAGE_DIR_NAME, TRIAGE_VERSION, load_triage,
+                        build_triage, derive_triage, write_triage, triage_path, signatures_path,
+                        has_signatures)
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -27,18 +55,62 @@ logger = logging.getLogger(__name__)
 class OptimizedOCR:
     """优化的OCR处理器"""
     
-    def __init__(self, use_gpu: bool = True, lang: str = 'ch'):
+    def __init__(self, use_gpu: bool = True, lang: str = 'ch', cache: Optional[OCRCache] = None,
+                 cpu_threads: Optional[int] = None):
         """
         初始化OCR处理器
         
         Args:
             use_gpu: 是否使用GPU
             lang: 语言设置 ('ch' for Chinese, 'en' for English, 'ch' for both)
+            cache: OCR结果持久化缓存（None表示不缓存）
+            cpu_threads: CPU推理线程数（None时使用PaddleOCR默认值）；多进程时由线程预算分配
         """
         self.use_gpu = use_gpu
         self.lang = lang
-        self.ocr = None
-        self._init_ocr()
+        self.cache = cache
+        self.cpu_threads = cpu_threads
+        self._cache_namespace: Optional[str] = None
+        # 文档路径 -> 内容哈希（ocr_pages按页对象查缓存时使用）
+        self._doc_hashes: Dict[str, str] = {}
+        self._ocr = None
+        self._load_error: Optional[Exception] = None
+        # 模型加载耗时（秒）；模型在首次需要OCR时才加载
+        self.model_load_time = 0.0
+    
+    @property
+    def ocr(self):
+        """PaddleOCR实例，首次访问时才导入paddleocr并加载模型"""
+        if self._ocr is None:
+            if self._load_error is not None:
+                raise RuntimeError(f"PaddleOCR此前初始化失败: {self._load_error}")
+            start_time = time.time()
+            try:
+                self._init_ocr()
+            except Exception as e:
+                self._load_error = e
+                raise
+            finally:
+                self.model_load_time = time.time() - start_time
+            logger.info(f"PaddleOCR模型加载耗时: {self.model_load_time:.2f}秒")
+        return self._ocr
+    
+    @property
+    def is_loaded(self) -> bool:
+        """模型是否已加载"""
+        return self._ocr is not None
+    
+    @property
+    def cache_namespace(self) -> str:
+        """缓存键中的OCR语言/模型版本标识（读取安装包元数据，不导入paddleocr）"""
+        if self._cache_namespace is None:
+            try:
+                from importlib.metadata import version
+                paddle_version = version('paddleocr')
+            except Exception:
+                paddle_version = 'unknown'
+            self._cache_namespace = f"paddleocr-{paddle_version}|{self.lang}|textline_orientation"
+        return self._cache_namespace
     
     def _init_ocr(self):
         """初始化PaddleOCR"""
@@ -62,9 +134,13 @@ class OptimizedOCR:
                 use_gpu = False
             
             # 初始化PaddleOCR - 支持中文繁体和英文
-            self.ocr = PaddleOCR(
+            options = {}
+            if self.cpu_threads:
+                options['cpu_threads'] = self.cpu_threads
+            self._ocr = PaddleOCR(
                 use_textline_orientation=True,
-                lang='ch'  # 中文（包含繁体）
+                lang='ch',  # 中文（包含繁体）
+                **options
             )
             logger.info(f"✅ PaddleOCR初始化成功 (GPU: {use_gpu})")
             
@@ -85,31 +161,193 @@ class OptimizedOCR:
             logger.error(f"提取第{page_num + 1}页文本失败: {e}")
             return ""
     
-    def ocr_page_image(self, page: fitz.Page, dpi: int = 300) -> str:
-        """对PDF页面进行OCR识别"""
-        try:
-            # 将页面渲染为高分辨率图像
-            mat = fitz.Matrix(dpi/72, dpi/72)  # 72是PDF的默认DPI
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
+    @staticmethod
+    def render_page_array(page: fitz.Page, dpi: int = 300) -> np.ndarray:
+        """
+        将页面渲染为BGR格式的NumPy数组（不经过PNG编码/解码）
+        
+        Args:
+            page: PDF页面
+            dpi: 渲染分辨率
             
-            # 使用PaddleOCR识别
-            result = self.ocr.ocr(img_data)
+        Returns:
+            形状为 (高, 宽, 3) 的uint8数组
+        """
+        mat = fitz.Matrix(dpi/72, dpi/72)  # 72是PDF的默认DPI
+        pix = page.get_pixmap(matrix=mat, colorspace=fitz.csRGB, alpha=False)
+        return OptimizedOCR.pixmap_to_array(pix)
+    
+    @staticmethod
+    def pixmap_to_array(pix: fitz.Pixmap) -> np.ndarray:
+        """
+        直接包装pixmap的像素缓冲区为NumPy数组
+        
+        pix.samples_mv 是底层缓冲区的memoryview，frombuffer不复制数据；
+        仅在RGB->BGR（PaddleOCR约定）时做一次连续化拷贝，
+        返回的数组因此不再引用pixmap的内存。
+        """
+        samples = getattr(pix, 'samples_mv', None) or pix.samples
+        arr = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        if pix.n >= 3:
+            return np.ascontiguousarray(arr[:, :, 2::-1])  # RGB(A) -> BGR
+        return arr.copy()
+    
+    @staticmethod
+    def _result_to_text(page_result: Any) -> str:
+        """将单页识别结果转换为文本（兼容PaddleOCR 2.x与3.x结果格式）"""
+        if not page_result:
+            return ""
+        
+        # PaddleOCR 3.x: OCRResult（类字典），文本在 rec_texts 中
+        if hasattr(page_result, 'get') and page_result.get('rec_texts') is not None:
+            return "\n".join(t for t in page_result['rec_texts'] if t)
+        
+        # PaddleOCR 2.x: [[box, (text, score)], ...]
+        text_lines = []
+        for line in page_result:
+            if line and len(line) >= 2:
+                text_lines.append(line[1][0])
+        return "\n".join(text_lines)
+    
+    def ocr_arrays(self, images: List[np.ndarray]) -> List[str]:
+        """
+        对一组图像数组进行OCR识别
+        
+        支持批量推理的PaddleOCR版本（predict）一次调用处理所有图像，
+        否则逐张调用ocr。
+        
+        Args:
+            images: BGR格式的图像数组列表
             
-            if not result or not result[0]:
-                return ""
+        Returns:
+            与输入顺序一致的文本列表，识别失败的页面为空字符串
+        """
+        texts = self._run_ocr(images)
+        return texts if texts is not None else [""] * len(images)
+    
+    def _run_ocr(self, images: List[np.ndarray]) -> Optional[List[str]]:
+        """执行推理；识别失败返回None（区别于识别结果为空，失败结果不写入缓存）"""
+        if not images:
+            return []
+        
+        # 首次调用时加载模型；加载失败直接抛出，不当作识别结果为空
+        engine = self.ocr
+        
+        try:
+            if hasattr(engine, 'predict'):
+                results = list(engine.predict(images))
+            else:
+                results = []
+                for img in images:
+                    result = engine.ocr(img)
+                    results.append(result[0] if result else None)
+            return [self._result_to_text(r) for r in results]
+        except Exception as e:
+            logger.error(f"OCR识别失败: {e}")
+            return None
+    
+    def cached_texts(self, doc_hash: Optional[str], page_nums: List[int], dpi: int) -> Dict[int, str]:
+        """
+        查询OCR缓存
+        
+        Args:
+            doc_hash: PDF内容哈希（None时不使用缓存）
+            page_nums: 页码列表
+            dpi: 渲染分辨率（缓存键的一部分）
             
-            # 提取识别的文本
-            text_lines = []
-            for line in result[0]:
-                if line and len(line) >= 2:
-                    text_lines.append(line[1][0])
+        Returns:
+            页码 -> 缓存文本（只包含命中的页面）
+        """
+        if self.cache is None or doc_hash is None:
+            return {}
+        texts = {}
+        for n in page_nums:
+            text = self.cache.get(OCRCache.make_key(doc_hash, n, dpi, self.cache_namespace))
+            if text is not None:
+                texts[n] = text
+        return texts
+    
+    def recognize(self, doc_hash: Optional[str], page_nums: List[int], dpi: int,
+                  images: List[np.ndarray]) -> List[str]:
+        """对已渲染的页面批量OCR，识别成功的结果写入缓存"""
+        texts = self._run_ocr(images)
+        if texts is None:
+            return [""] * len(images)
+        if self.cache is not None and doc_hash is not None:
+            for n, text in zip(page_nums, texts):
+                self.cache.put(OCRCache.make_key(doc_hash, n, dpi, self.cache_namespace), text)
+        return texts
+    
+    def ocr_cached(self, doc_hash: Optional[str], page_nums: List[int], dpi: int,
+                   render: Callable[[int], np.ndarray]) -> List[str]:
+        """
+        先查缓存、只对未命中的页面渲染并批量OCR
+        
+        缓存全部命中时既不渲染页面，也不会触发模型加载。
+        
+        Args:
+            doc_hash: PDF内容哈希（None时不使用缓存）
+            page_nums: 页码列表
+            dpi: 渲染分辨率（缓存键的一部分）
+            render: 页码 -> BGR图像数组
             
-            return "\n".join(text_lines)
+        Returns:
+            与page_nums顺序一致的文本列表
+        """
+        texts = self.cached_texts(doc_hash, page_nums, dpi)
+        
+        images, misses = [], []
+        for n in page_nums:
+            if n in texts:
+                continue
+            try:
+                images.append(render(n))
+                misses.append(n)
+            except Exception as e:
+                logger.error(f"渲染第{n + 1}页失败: {e}")
+        
+        if images:
+            texts.update(zip(misses, self.recognize(doc_hash, misses, dpi, images)))
+            del images
+        
+        return [texts.get(n, "") for n in page_nums]
+    
+    def _document_hash(self, doc: fitz.Document) -> Optional[str]:
+        """按文档文件路径计算（并记住）内容哈希；内存中打开的文档返回None"""
+        path = doc.name
+        if not path or not os.path.isfile(path):
+            return None
+        if path not in self._doc_hashes:
+            self._doc_hashes[path] = file_sha256(path)
+        return self._doc_hashes[path]
+    
+    def ocr_pages(self, pages: List[fitz.Page], dpi: int = 300) -> List[str]:
+        """
+        批量对PDF页面进行OCR识别（启用缓存时先查缓存）
+        
+        Args:
+            pages: 同一文档的PDF页面列表
+            dpi: 渲染分辨率
             
-        except Exception as e:
-            logger.error(f"OCR识别失败: {e}")
-            return ""
+        Returns:
+            与输入顺序一致的文本列表
+        """
+        if not pages:
+            return []
+        doc_hash = self._document_hash(pages[0].parent) if self.cache is not None else None
+        by_number = {page.number: page for page in pages}
+        return self.ocr_cached(doc_hash, [page.number for page in pages], dpi,
+                               lambda n: self.render_page_array(by_number[n], dpi))
+    
+    def ocr_page_image(self, page: fitz.Page, dpi: int = 300) -> str:
+        """对PDF页面进行OCR识别"""
+        return self.ocr_pages([page], dpi)[0]
+    
+    def ocr_session_pages(self, session: 'PDFDocumentSession', page_nums: List[int], dpi: int) -> List[str]:
+        """对文档会话中的页面批量OCR（渲染结果缓存在会话中，识别文本缓存在OCRCache中）"""
+        doc_hash = session.content_hash if self.cache is not None else None
+        return self.ocr_cached(doc_hash, page_nums, dpi,
+                               lambda n: self.pixmap_to_array(session.render(n, dpi)))
 
 class TOCDetector:
     """目录页检测器"""
@@ -128,6 +366,23 @@ class TOCDetector:
             ]
         }
         
+        # 可信度高的目录关键词（其余关键词仍判定为目录页，但置信度较低）
+        self.strong_keywords = [
+            '目录', '目錄', '目次', '章节目录', '章節目錄', 'table of contents', 'contents'
+        ]
+        
+        # 章节关键词（按行计分）
+        self.chapter_keywords = [
+            'chapter', 'section', 'part', 'appendix', 'references',
+            '章', '節', '部', '篇', '编', '編', '附录', '附錄', '参考文献'
+        ]
+        
+        # 非目录内容关键词
+        self.non_toc_keywords = [
+            '季度', '年度', '报告', '報告', 'quarter', 'annual', 'report',
+            '业绩', '業績', '表现', '表現', '良好', '下滑', '恢复'
+        ]
+        
         # 目录项模式
         self.item_patterns = [
             r'^\s*\d+\.\s+[^\n]+',  # 1. 标题
@@ -145,6 +400,28 @@ class TOCDetector:
             r'\.{2,}\s*\d+$',  # .. 数字
             r'\.{2,}\d+$',     # ..数字
         ]
+        
+        # 预编译的单次扫描评分引擎
+        self.engine = TOCScoringEngine(
+            toc_keywords=self.toc_keywords,
+            chapter_keywords=self.chapter_keywords,
+            non_toc_keywords=self.non_toc_keywords,
+            strong_keywords=self.strong_keywords,
+            item_patterns=self.item_patterns,
+            page_patterns=self.page_patterns
+        )
+    
+    def score(self, text: str) -> TOCScore:
+        """
+        对页面文本评分
+        
+        Args:
+            text: 页面文本内容
+            
+        Returns:
+            TOCScore：is_toc（目录页判定）、confidence（0~1置信度）及各项特征统计
+        """
+        return self.engine.score(text)
     
     def is_toc_page(self, text: str) -> bool:
         """
@@ -156,208 +433,772 @@ class TOCDetector:
         Returns:
             是否为目录页
         """
-        if not text:
-            return False
+        return self.engine.score(text).is_toc
+    
+    def score_page(self, text: str) -> float:
+        """
+        计算页面的目录页置信度
+        
+        Args:
+            text: 页面文本内容
+            
+        Returns:
+            0~1之间的置信度
+        """
+        return self.engine.score(text).confidence
+
+
+# OCR分辨率级联配置
+PROBE_DPI = 36                 # 墨迹覆盖率检测用的低分辨率渲染
+LOW_OCR_DPI = 150              # 第二级：低分辨率OCR
+HIGH_OCR_DPI = 300             # 第三级：高分辨率OCR
+TOC_IMAGE_DPI = 216            # 导出目录页图像的最低分辨率（原3倍缩放）
+AMBIGUOUS_SCORE_RANGE = (0.35, 1.0)  # 低分辨率OCR未判定为目录页但置信度落在此区间时升级到高分辨率
+
+BLANK_INK_RATIO = 0.003        # 深色像素占比低于此值视为空白页
+PHOTO_PAPER_RATIO = 0.03       # 纸色像素占比低于此值……
+PHOTO_EDGE_RATIO = 0.02        # ……且强边缘占比低于此值，视为整页照片
+
+
+def page_ink_profile(gray: np.ndarray) -> Dict[str, Any]:
+    """
+    基于低分辨率灰度图评估页面墨迹分布
+    
+    Args:
+        gray: 二维uint8灰度图
         
-        # 转换为小写进行匹配
-        text_lower = text.lower()
+    Returns:
+        字典：ink_ratio（深色像素占比）、paper_ratio（纸色像素占比）、
+        edge_ratio（强水平边缘占比）、kind（blank/photo/content）
+    """
+    if gray.size == 0:
+        return {'ink_ratio': 0.0, 'paper_ratio': 1.0, 'edge_ratio': 0.0, 'kind': 'blank'}
+    
+    ink_ratio = float(np.count_nonzero(gray < 160)) / gray.size
+    paper_ratio = float(np.count_nonzero(gray > 235)) / gray.size
+    if gray.shape[1] > 1:
+        edges = np.abs(np.diff(gray.astype(np.int16), axis=1))
+        edge_ratio = float(np.count_nonzero(edges > 60)) / edges.size
+    else:
+        edge_ratio = 0.0
+    
+    if ink_ratio < BLANK_INK_RATIO:
+        kind = 'blank'
+    elif paper_ratio < PHOTO_PAPER_RATIO and edge_ratio < PHOTO_EDGE_RATIO:
+        kind = 'photo'
+    else:
+        kind = 'content'
+    
+    return {
+        'ink_ratio': round(ink_ratio, 4),
+        'paper_ratio': round(paper_ratio, 4),
+        'edge_ratio': round(edge_ratio, 4),
+        'kind': kind
+    }
+
+
+# PyMuPDF不支持多线程并发调用：渲染线程、预取线程与主线程的所有MuPDF调用都经此锁串行化；
+# 与渲染重叠的是OCR推理（PaddleOCR推理期间释放GIL）
+_MUPDF_LOCK = threading.RLock()
+
+# 虚拟“去目录”视图：只写出跳过页清单（Step2按清单过滤页面），不复制PDF
+SKIP_PAGES_SUFFIX = "_skip_pages.json"
+
+# 渲染流水线配置
+RENDER_QUEUE_SIZE = 4          # 渲染队列容量（页），限制预渲染图像占用的内存
+OCR_BATCH_SIZE = 4             # OCR消费端每批最多识别的页数
+
+
+class PDFDocumentSession:
+    """
+    PDF文档会话
+    
+    在一次处理过程中只打开、解析PDF一次，并缓存目录页的渲染结果，
+    供OCR、目录页图像导出和删页保存复用。
+    """
+    
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        with _MUPDF_LOCK:
+            self.doc = fitz.open(pdf_path)
+        # 页码 -> (dpi, pixmap)
+        self._renders: Dict[int, Tuple[int, fitz.Pixmap]] = {}
+        self._content_hash: Optional[str] = None
+    
+    def __enter__(self) -> 'PDFDocumentSession':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def close(self):
+        """释放文档和缓存的渲染结果"""
+        with _MUPDF_LOCK:
+            self._renders.clear()
+            if not self.doc.is_closed:
+                self.doc.close()
+    
+    @property
+    def page_count(self) -> int:
+        return len(self.doc)
+    
+    @property
+    def content_hash(self) -> str:
+        """PDF文件内容的SHA-256（首次访问时计算）"""
+        if self._content_hash is None:
+            self._content_hash = file_sha256(self.pdf_path)
+        return self._content_hash
+    
+    def load_page(self, page_num: int) -> fitz.Page:
+        with _MUPDF_LOCK:
+            return self.doc.load_page(page_num)
+    
+    def page_text(self, page_num: int) -> Tuple[str, float]:
+        """提取页面文字层，返回 (文本, 页面面积)"""
+        with _MUPDF_LOCK:
+            page = self.doc.load_page(page_num)
+            return page.get_text().strip(), abs(page.rect)
+    
+    def page_lines(self, page_num: int) -> List[Dict[str, Any]]:
+        """页面文字行（文本、字号、加粗），见heading_hints.text_lines"""
+        with _MUPDF_LOCK:
+            return text_lines(self.doc.load_page(page_num))
+    
+    def page_profile(self, page_num: int) -> Dict[str, Any]:
+        """提取页面文字层并分诊，见pdf_triage.classify_page"""
+        with _MUPDF_LOCK:
+            return classify_page(self.doc.load_page(page_num))
+    
+    def render(self, page_num: int, dpi: int = 300, cache: bool = True) -> fitz.Pixmap:
+        """渲染页面为RGB pixmap；cache为True时缓存结果"""
+        cached = self._renders.get(page_num)
+        if cached and cached[0] == dpi:
+            return cached[1]
         
-        # 1. 检查是否包含目录关键词
-        for keyword in self.toc_keywords['chinese'] + self.toc_keywords['english']:
-            if keyword in text_lower:
+        mat = fitz.Matrix(dpi/72, dpi/72)
+        with _MUPDF_LOCK:
+            pix = self.doc.load_page(page_num).get_pixmap(matrix=mat, colorspace=fitz.csRGB, alpha=False)
+        if cache:
+            self._renders[page_num] = (dpi, pix)
+        return pix
+    
+    def cached_render(self, page_num: int, min_dpi: int = 0) -> Optional[fitz.Pixmap]:
+        """获取已缓存且分辨率不低于min_dpi的页面渲染结果（没有则返回None）"""
+        cached = self._renders.get(page_num)
+        if cached and cached[0] >= min_dpi:
+            return cached[1]
+        return None
+    
+    def render_gray(self, page_num: int, dpi: int) -> np.ndarray:
+        """渲染灰度图并返回二维数组（不缓存，用于快速探测）"""
+        mat = fitz.Matrix(dpi/72, dpi/72)
+        with _MUPDF_LOCK:
+            pix = self.doc.load_page(page_num).get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+        samples = getattr(pix, 'samples_mv', None) or pix.samples
+        return np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width).copy()
+    
+    def keep_renders(self, page_nums: List[int]):
+        """只保留指定页面的渲染结果，释放其余pixmap"""
+        keep = set(page_nums)
+        for page_num in list(self._renders):
+            if page_num not in keep:
+                del self._renders[page_num]
+
+
+class RenderPipeline:
+    """
+    候选页渲染流水线（生产者/消费者）
+    
+    渲染线程按页序对候选页做墨迹探测并渲染为BGR数组，放入有界队列；
+    OCR在消费端批量识别。队列满时渲染线程阻塞，预渲染内存不超过
+    queue_size页。threaded为False时在消费端按需同步渲染。
+    
+    队列元素为 (页码, 类型, 图像)，类型为 content/cached/blank/photo/error，
+    只有content带图像。
+    """
+    
+    def __init__(self, session: PDFDocumentSession, pages: List[int], dpi: int,
+                 skip: Optional[set] = None, threaded: bool = True,
+                 queue_size: int = RENDER_QUEUE_SIZE):
+        """
+        Args:
+            session: 文档会话
+            pages: 候选页码（按处理顺序）
+            dpi: OCR渲染分辨率
+            skip: 无需渲染的页码（如OCR缓存已命中），以cached类型产出
+            threaded: 是否在后台线程渲染
+            queue_size: 队列容量（页）
+        """
+        self.session = session
+        self.pages = list(pages)
+        self.dpi = dpi
+        self.skip = skip or set()
+        self.threaded = threaded
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next = 0                      # 同步模式下的下一个候选页
+        self._done = not self.pages         # 线程模式下是否已取到结束标记
+        if threaded and self.pages:
+            self._thread = threading.Thread(target=self._produce, name="page-render", daemon=True)
+            self._thread.start()
+    
+    def _render_item(self, page_num: int) -> Tuple[int, str, Optional[np.ndarray]]:
+        if page_num in self.skip:
+            return page_num, 'cached', None
+        try:
+            profile = page_ink_profile(self.session.render_gray(page_num, PROBE_DPI))
+            if profile['kind'] != 'content':
+                logger.debug(f"第{page_num + 1}页判定为{profile['kind']}，跳过OCR: {profile}")
+                return page_num, profile['kind'], None
+            pix = self.session.render(page_num, self.dpi, cache=False)
+            return page_num, 'content', OptimizedOCR.pixmap_to_array(pix)
+        except Exception as e:
+            logger.error(f"渲染第{page_num + 1}页失败: {e}")
+            return page_num, 'error', None
+    
+    def _put(self, item) -> bool:
+        """放入队列；流水线被关闭时返回False"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
                 return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _produce(self):
+        for page_num in self.pages:
+            if self._stop.is_set() or not self._put(self._render_item(page_num)):
+                return
+        self._put(None)
+    
+    def next_batch(self, max_size: int) -> list:
+        """
+        按页序取出下一批元素
         
-        # 2. 增强的目录页检测
-        return self._enhanced_toc_detection(text)
+        阻塞等待第一个元素，再带上队列中已就绪的元素，最多max_size个；
+        所有候选页都已取出时返回空列表。
+        """
+        batch = []
+        if not self.threaded:
+            while self._next < len(self.pages) and len(batch) < max_size:
+                batch.append(self._render_item(self.pages[self._next]))
+                self._next += 1
+            return batch
+        
+        if self._done:
+            return batch
+        item = self._queue.get()
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= max_size:
+                return batch
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+        self._done = True
+        return batch
     
-    def _enhanced_toc_detection(self, text: str) -> bool:
-        """增强的目录页检测逻辑"""
-        if not text:
-            return False
+    def close(self):
+        """停止渲染线程并释放队列中的图像"""
+        self._stop.set()
+        if self._thread is not None:
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+class PDFProcessor:
+    """PDF处理器"""
+    
+    def __init__(self, use_gpu: bool = True, max_pages: int = 5, ocr_cache: Optional[OCRCache] = None,
+                 pipelined: bool = True, virtual_no_toc: bool = False,
+                 toc_classifier: Optional[TOCClassifier] = None, cpu_threads: Optional[int] = None,
+                 sidecar_dir: Optional[str] = None):
+        """
+        初始化PDF处理器
         
-        lines = text.split('\n')
-        toc_indicators = 0
-        lines_with_content = 0
+        Args:
+            use_gpu: 是否使用GPU
+            max_pages: 目录页评分窗口（默认前5页）；文字层扫描覆盖全部页面，
+                但只有窗口内的页面可被判定为目录页或送入OCR
+            ocr_cache: OCR结果持久化缓存（None表示不缓存）
+            pipelined: 是否启用流水线：渲染线程与OCR重叠，并可预取下一个PDF
+            virtual_no_toc: 为True时不生成去目录PDF副本，只写出跳过页清单
+                （<文件名>_skip_pages.json），由Step2在版面分析时过滤页面
+            toc_classifier: 目录页分类器（None时只用规则评分）；评分窗口内规则未判定为
+                目录页、但分类器判定为目录页的页面也作为文字层命中
+            cpu_threads: OCR的CPU推理线程数（None时使用PaddleOCR默认值）
+            sidecar_dir: 分诊目录（输出基础目录下的triage/），分诊清单读写于此；
+                None时不读写分诊清单，每次全量扫描文字层
+        """
+        self.ocr = OptimizedOCR(use_gpu=use_gpu, cache=ocr_cache, cpu_threads=cpu_threads)
+        self.toc_detector = TOCDetector()
+        self.toc_classifier = toc_classifier
+        self.toc_parser = TOCTextParser(self.toc_detector.item_patterns, self.toc_detector.page_patterns)
+        self.max_pages = max_pages
+        self.pipelined = pipelined
+        self.virtual_no_toc = virtual_no_toc
+        self.sidecar_dir = sidecar_dir
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+        # 最近一次find_toc_pages的扫描统计（用于吞吐量统计和报告）
+        self.last_scan: Dict[str, Any] = {}
+    
+    @staticmethod
+    def _session(source: Union[str, PDFDocumentSession]) -> PDFDocumentSession:
+        """已有会话直接复用，传入路径时新开会话"""
+        if isinstance(source, PDFDocumentSession):
+            return source
+        return PDFDocumentSession(source)
+    
+    def scan_text_layer(self, session: PDFDocumentSession,
+                        page_count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        第一阶段：对页面做一次get_text()扫描
         
-        # 检查每行是否包含目录特征
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            lines_with_content += 1
-            
-            # 检查章节编号模式
-            if re.search(r'^\d+\.?\s+[A-Za-z\u4e00-\u9fff]', line):
-                toc_indicators += 2
-            
-            # 检查页码模式
-            if re.search(r'\.{3,}\s*\d+\s*$', line):
-                toc_indicators += 2
+        Args:
+            session: 文档会话
+            page_count: 只扫描前page_count页（None时扫描全部页面）
             
-            # 检查省略号
-            if re.search(r'\.{3,}|…{3,}', line):
-                toc_indicators += 1
+        Returns:
+            每页的统计字典：page、score（目录页得分）、is_toc、kind（分诊类别），
+            以及analyze_text_layer给出的文字层密度和状态；扫描全部页面时另含
+            signature（文本MinHash签名，供近似重复检测）；启用分类器时评分窗口内
+            有文字层的页面另含features（分类器特征）
+        """
+        page_stats = []
+        for page_num in range(session.page_count if page_count is None else page_count):
+            try:
+                stats = session.page_profile(page_num)
+            except Exception as e:
+                logger.error(f"提取第{page_num + 1}页文本失败: {e}")
+                stats = analyze_text_layer("", 0.0)
+                stats.update(text="", kind='V')
             
-            # 检查章节关键词
-            chapter_keywords = ['chapter', 'section', 'part', 'appendix', 'references',
-                              '章', '節', '部', '篇', '编', '編', '附录', '附錄', '参考文献']
-            if any(keyword in line.lower() for keyword in chapter_keywords):
-                toc_indicators += 1
+            text = stats.pop('text')
+            stats['page'] = page_num
+            if page_count is None:
+                stats['signature'] = minhash_signature(text) if stats['kind'] == 'T' else None
+            toc_score = self.toc_detector.score(text)
+            stats['score'] = toc_score.confidence
+            stats['is_toc'] = toc_score.is_toc
+            if self.toc_classifier is not None and page_num < self.max_pages and stats['kind'] in ('T', 'G'):
+                stats['features'] = page_features(text, toc_score, stats, page_num)
+            page_stats.append(stats)
             
-            # 检查数字-数字模式
-            if re.search(r'\d+[\.-]\d+', line):
-                toc_indicators += 1
+            logger.debug(f"第{page_num + 1}页文字层: {stats['status']}, 密度{stats['density']}, "
+                         f"目录置信度{stats['score']:.2f}")
+        
+        return page_stats
+    
+    def prepare(self, session: PDFDocumentSession) -> Dict[str, Any]:
+        """
+        第一阶段：扫描文字层，确定文字层命中页和OCR候选页，并启动候选页的渲染流水线
+        
+        可以在预取线程中执行，使下一个PDF的扫描和渲染与当前PDF的OCR重叠。
+        
+        Args:
+            session: 文档会话
             
-            # 检查目录页特有格式
-            if re.search(r'^\d+\s+[A-Za-z\u4e00-\u9fff].*\s+\d+$', line):
-                toc_indicators += 2
+        Returns:
+            处理计划字典：session、page_stats、triage（分诊记录）、window、text_hit、
+            candidates（OCR候选页）、cached（候选页的低分辨率OCR缓存文本）、pipeline
+        """
+        window = min(self.max_pages, session.page_count)
+        triage = load_triage(session.pdf_path, self.sidecar_dir) if self.sidecar_dir else None
+        if triage is not None and triage['status'] != 'ok':
+            raise ValueError(f"分诊结果为{triage['status']}: {triage['error']}")
         
-        # 排除非目录内容
-        non_toc_keywords = ['季度', '年度', '报告', '報告', 'quarter', 'annual', 'report', 
-                           '业绩', '業績', '表现', '表現', '良好', '下滑', '恢复']
-        if any(keyword in text.lower() for keyword in non_toc_keywords):
-            return False
+        if (triage is not None and triage['page_count'] == session.page_count
+                and has_signatures(session.pdf_path, triage, self.sidecar_dir)):
+            # 已有分诊清单：只读取评分窗口内的文字层，页面类别沿用清单，不再重新判断
+            logger.info(f"沿用分诊清单（{triage['parse_method']}模式），扫描前{window}页文字层...")
+            page_stats = self.scan_text_layer(session, window)
+            for stats in page_stats:
+                stats['kind'] = triage['pages'][stats['page']]
+        else:
+            logger.info(f"扫描全部{session.page_count}页文字层（评分窗口: 前{window}页）...")
+            page_stats = self.scan_text_layer(session)
+            triage = self._write_triage(session, page_stats)
         
-        # 判断条件
-        if lines_with_content == 0:
-            return False
+        classifier_hits = self._apply_classifier(page_stats[:window])
         
-        toc_density = toc_indicators / lines_with_content
+        # 评分窗口内有多个文字层命中时，取置信度最高者（同分取靠前的页）
+        text_hits = [p for p in page_stats[:window] if p['is_toc']]
+        text_hit = max(text_hits, key=lambda p: (p['score'], -p['page']))['page'] if text_hits else None
         
-        # 需要更高的密度和更多的特征
-        if toc_density > 0.5 and toc_indicators >= 5:
-            return True
+        # 只对文字层命中页之前、需要OCR才能得到文字的页面（扫描页、矢量页、乱码页）OCR
+        ocr_limit = text_hit if text_hit is not None else window
+        candidates = [p['page'] for p in page_stats[:ocr_limit] if p['kind'] in OCR_PAGE_KINDS]
         
-        # 或者有很强的目录特征
-        if toc_indicators >= 8:
-            return True
+        cached, pipeline = {}, None
+        if candidates:
+            doc_hash = session.content_hash if self.ocr.cache is not None else None
+            cached = self.ocr.cached_texts(doc_hash, candidates, LOW_OCR_DPI)
+            pipeline = RenderPipeline(session, candidates, LOW_OCR_DPI, skip=set(cached),
+                                      threaded=self.pipelined)
         
-        return False
-
-class PDFProcessor:
-    """PDF处理器"""
+        return {
+            'session': session,
+            'page_stats': page_stats,
+            'triage': triage,
+            'window': window,
+            'text_hit': text_hit,
+            'classifier_hits': classifier_hits,
+            'candidates': candidates,
+            'cached': cached,
+            'pipeline': pipeline
+        }
     
-    def __init__(self, use_gpu: bool = True, max_pages: int = 5):
+    def _apply_classifier(self, page_stats: List[Dict[str, Any]]) -> int:
         """
-        初始化PDF处理器
+        用分类器一次对评分窗口内的所有文字层页面打分，补判规则漏判的目录页
         
-        Args:
-            use_gpu: 是否使用GPU
-            max_pages: 最大检查页数（默认5页）
+        Returns:
+            只由分类器判定为目录页的页数
         """
-        self.ocr = OptimizedOCR(use_gpu=use_gpu)
-        self.toc_detector = TOCDetector()
-        self.max_pages = max_pages
+        scored = [p for p in page_stats if 'features' in p]
+        if self.toc_classifier is None or not scored:
+            return 0
+        probs = self.toc_classifier.predict_proba(np.vstack([p.pop('features') for p in scored]))
+        hits = 0
+        for stats, prob in zip(scored, probs):
+            stats['model_score'] = round(float(prob), 4)
+            if not stats['is_toc'] and prob >= self.toc_classifier.threshold:
+                stats['is_toc'] = True
+                stats['score'] = max(stats['score'], stats['model_score'])
+                hits += 1
+                logger.debug(f"第{stats['page'] + 1}页由分类器判定为目录页（概率{prob:.2f}）")
+        return hits
+    
+    def _write_triage(self, session: PDFDocumentSession,
+                      page_stats: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """由全量文字层扫描结果生成分诊清单，写入分诊目录供Step2和之后的重跑使用"""
+        try:
+            with _MUPDF_LOCK:
+                encrypted = bool(session.doc.is_encrypted)
+            triage = build_triage(session.pdf_path, ''.join(p['kind'] for p in page_stats),
+                                  [p['density'] for p in page_stats], session.content_hash, encrypted)
+            if self.sidecar_dir is None:
+                return triage
+            write_triage(triage, triage_path(session.pdf_path, self.sidecar_dir))
+            write_signatures(signatures_path(session.pdf_path, self.sidecar_dir), triage['sha256'],
+                             [p['signature'] for p in page_stats])
+            return triage
+        except Exception as e:
+            logger.warning(f"写出分诊清单失败: {e}")
+            return None
+    
+    def _write_derived_triage(self, triage: Optional[Dict[str, Any]], output_pdf: str, toc_pages: List[int]):
+        """为去目录PDF副本写出分诊清单（由原PDF的清单去掉目录页得到，同样写入分诊目录）"""
+        if triage is None or self.sidecar_dir is None:
+            return
+        try:
+            write_triage(derive_triage(triage, output_pdf, toc_pages), triage_path(output_pdf, self.sidecar_dir))
+        except Exception as e:
+            logger.warning(f"写出去目录PDF的分诊清单失败: {e}")
+    
+    def _prepare_path(self, pdf_path: str) -> Dict[str, Any]:
+        """打开PDF并执行prepare；失败时关闭已打开的会话"""
+        session = PDFDocumentSession(pdf_path)
+        try:
+            return self.prepare(session)
+        except Exception:
+            session.close()
+            raise
+    
+    def prefetch(self, pdf_path: str) -> Future:
+        """在后台线程中提前打开并准备下一个PDF（返回的Future交给process_pdf）"""
+        if self._prefetcher is None:
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-prefetch")
+        return self._prefetcher.submit(self._prepare_path, pdf_path)
     
-    def find_toc_pages(self, pdf_path: str) -> List[int]:
+    @staticmethod
+    def discard(prepared: Optional[Future]):
+        """丢弃未使用的预取结果，停止渲染线程并关闭文档"""
+        if prepared is None:
+            return
+        try:
+            plan = prepared.result()
+        except Exception:
+            return
+        if plan['pipeline'] is not None:
+            plan['pipeline'].close()
+        plan['session'].close()
+    
+    def find_toc_pages(self, source: Union[str, PDFDocumentSession],
+                       plan: Optional[Dict[str, Any]] = None) -> List[int]:
         """
         查找目录页（只查找第一个目录页）
         
+        两阶段扫描：先对全部页面做文字层评分，再只对评分窗口内
+        文字层为空或乱码的页面进行流水线OCR。
+        
         Args:
-            pdf_path: PDF文件路径
+            source: PDF文件路径或已打开的文档会话
+            plan: prepare()的结果（已在预取线程中准备好时传入）
             
         Returns:
             目录页页码列表（从0开始，只包含第一个找到的目录页）
         """
+        self.last_scan = {'pages_scanned': 0, 'ocr_pages': 0, 'text_pages': 0,
+                          'empty_pages': 0, 'garbled_pages': 0, 'mean_density': 0.0, 'classifier_hits': 0,
+                          'cascade': {'blank': 0, 'photo': 0, 'low_dpi': 0, 'high_dpi': 0}}
+        session = None
         try:
-            doc = fitz.open(pdf_path)
-            total_pages = len(doc)
-            check_pages = min(self.max_pages, total_pages)
+            session = plan['session'] if plan is not None else self._session(source)
+            if plan is None:
+                plan = self.prepare(session)
+            window, page_stats, triage = plan['window'], plan['page_stats'], plan['triage']
             
-            logger.info(f"开始检查PDF前{check_pages}页...")
+            self.last_scan['pages_scanned'] = len(page_stats)
+            self.last_scan['classifier_hits'] = plan['classifier_hits']
+            if triage is not None:
+                # 全文统计取自分诊清单（沿用清单时只扫描了评分窗口）
+                self.last_scan['text_pages'] = triage['text_pages']
+                self.last_scan['garbled_pages'] = triage['garbled_pages']
+                self.last_scan['empty_pages'] = triage['page_count'] - triage['text_pages'] - triage['garbled_pages']
+                self.last_scan['mean_density'] = triage['mean_density']
+                self.last_scan['parse_method'] = triage['parse_method']
+            else:
+                for status in ('text', 'empty', 'garbled'):
+                    self.last_scan[f'{status}_pages'] = sum(1 for p in page_stats if p['status'] == status)
+                if page_stats:
+                    self.last_scan['mean_density'] = round(
+                        sum(p['density'] for p in page_stats) / len(page_stats), 3)
             
-            for page_num in range(check_pages):
-                logger.info(f"检查第{page_num + 1}页...")
-                
-                # 1. 首先尝试文字层匹配
-                text = self.ocr.extract_text_from_page(doc, page_num)
-                if text:
-                    logger.debug(f"第{page_num + 1}页文本预览: {text[:200]}...")
-                
-                if self.toc_detector.is_toc_page(text):
-                    logger.info(f"通过文字层匹配找到目录页: 第{page_num + 1}页")
-                    doc.close()
-                    return [page_num]  # 找到第一个目录页就返回
-                
-                # 2. 如果文字层匹配失败，尝试OCR
-                page = doc.load_page(page_num)
-                ocr_text = self.ocr.ocr_page_image(page)
-                
-                if ocr_text and self.toc_detector.is_toc_page(ocr_text):
-                    logger.info(f"通过OCR匹配找到目录页: 第{page_num + 1}页")
-                    doc.close()
-                    return [page_num]  # 找到第一个目录页就返回
+            text_hit = plan['text_hit']
+            if text_hit is not None:
+                logger.info(f"通过文字层匹配找到目录页: 第{text_hit + 1}页")
+            
+            ocr_candidates = plan['candidates']
+            self.last_scan['ocr_pages'] = len(ocr_candidates)
+            
+            if ocr_candidates:
+                logger.info(f"对{len(ocr_candidates)}页无有效文字层的页面进行OCR: "
+                            f"{[n + 1 for n in ocr_candidates]}")
+                ocr_hit = self._ocr_cascade(session, plan['pipeline'], plan['cached'])
+                if ocr_hit is not None:
+                    logger.info(f"通过OCR匹配找到目录页: 第{ocr_hit + 1}页")
+                    session.keep_renders([ocr_hit])
+                    return [ocr_hit]  # 找到第一个目录页就返回
+            
+            session.keep_renders([])
+            if text_hit is not None:
+                return [text_hit]
             
-            doc.close()
-            logger.warning(f"在前{check_pages}页中未找到目录页")
+            logger.warning(f"在前{window}页中未找到目录页")
             return []
             
         except Exception as e:
             logger.error(f"查找目录页失败: {e}")
             return []
+        finally:
+            if plan is not None and plan['pipeline'] is not None:
+                plan['pipeline'].close()
+            if session is not None and session is not source:
+                session.close()
     
-    def extract_toc_images(self, pdf_path: str, toc_pages: List[int], output_dir: str) -> List[str]:
+    def _ocr_cascade(self, session: PDFDocumentSession, pipeline: RenderPipeline,
+                     cached: Dict[int, str]) -> Optional[int]:
+        """
+        分辨率级联OCR，返回第一个被判定为目录页的页码
+        
+        1. 渲染线程低分辨率灰度探测，跳过空白页和整页照片
+        2. 其余页面以LOW_OCR_DPI渲染入队，消费端按页序小批量OCR，
+           命中目录页后停止渲染和识别后续页面
+        3. 得分落在AMBIGUOUS_SCORE_RANGE的页面以HIGH_OCR_DPI重新OCR
+        
+        各级处理的页数累计到 self.last_scan['cascade']。
+        """
+        tiers = self.last_scan['cascade']
+        doc_hash = session.content_hash if self.ocr.cache is not None else None
+        
+        low, high = AMBIGUOUS_SCORE_RANGE
+        ambiguous = []
+        low_hit = None
+        try:
+            while low_hit is None:
+                batch = pipeline.next_batch(OCR_BATCH_SIZE)
+                if not batch:
+                    break
+                
+                # 第二级：低分辨率批量OCR（缓存命中的页面直接取文本）
+                texts = {n: cached[n] for n, kind, _ in batch if kind == 'cached'}
+                content = [n for n, kind, _ in batch if kind == 'content']
+                if content:
+                    images = [img for _, kind, img in batch if kind == 'content']
+                    texts.update(zip(content, self.ocr.recognize(doc_hash, content, LOW_OCR_DPI, images)))
+                    del images
+                
+                for page_num, kind, _ in batch:
+                    # 第一级：墨迹覆盖率检测已在渲染线程完成
+                    if kind in ('blank', 'photo'):
+                        tiers[kind] += 1
+                        continue
+                    if page_num not in texts:
+                        continue
+                    toc_score = self.toc_detector.score(texts[page_num])
+                    if not toc_score.is_toc and low <= toc_score.confidence <= high:
+                        ambiguous.append(page_num)
+                        continue
+                    tiers['low_dpi'] += 1
+                    if toc_score.is_toc:
+                        low_hit = page_num
+                        break
+                del batch
+        finally:
+            pipeline.close()
+        
+        # 第三级：只对低分辨率命中页之前的模糊页面高分辨率重识别
+        if ambiguous:
+            high_texts = self.ocr.ocr_session_pages(session, ambiguous, HIGH_OCR_DPI)
+            tiers['high_dpi'] += len(ambiguous)
+            for page_num, text in zip(ambiguous, high_texts):
+                if text and self.toc_detector.is_toc_page(text):
+                    return page_num
+        
+        return low_hit
+    
+    def extract_toc_images(self, source: Union[str, PDFDocumentSession], toc_pages: List[int],
+                           output_dir: str) -> List[str]:
         """
         提取目录页图像
         
+        优先使用会话中OCR阶段缓存的渲染结果（分辨率不低于TOC_IMAGE_DPI），
+        否则以3倍缩放重新渲染。
+        
         Args:
-            pdf_path: PDF文件路径
+            source: PDF文件路径或已打开的文档会话
             toc_pages: 目录页页码列表
             output_dir: 输出目录
             
         Returns:
             提取的图像文件路径列表
         """
+        session = None
         try:
             os.makedirs(output_dir, exist_ok=True)
-            doc = fitz.open(pdf_path)
+            session = self._session(source)
             
             image_paths = []
             
             for page_num in toc_pages:
-                page = doc.load_page(page_num)
-                
-                # 高分辨率渲染
-                mat = fitz.Matrix(3.0, 3.0)  # 3倍缩放
-                pix = page.get_pixmap(matrix=mat)
+                pix = session.cached_render(page_num, min_dpi=TOC_IMAGE_DPI)
+                if pix is None:
+                    # 高分辨率渲染（3倍缩放）
+                    pix = session.render(page_num, dpi=TOC_IMAGE_DPI)
                 
                 # 保存为JPG
                 image_path = os.path.join(output_dir, f"toc_page_{page_num + 1}.jpg")
-                pix.save(image_path)
+                with _MUPDF_LOCK:
+                    pix.save(image_path)
                 
                 image_paths.append(image_path)
                 logger.info(f"已提取目录页图像: {image_path}")
             
-            doc.close()
             return image_paths
             
         except Exception as e:
             logger.error(f"提取目录页图像失败: {e}")
             return []
+        finally:
+            if session is not None and session is not source:
+                session.close()
+    
+    def write_local_titles(self, session: PDFDocumentSession, page_num: int,
+                           image_path: str) -> Optional[Dict[str, Any]]:
+        """
+        解析文字层目录页，在目录页图像旁写出标题清单（toc_page_N_titles.json）
+        
+        Returns:
+            字典：path、confidence、entries；解析失败时返回None
+        """
+        try:
+            with _MUPDF_LOCK:
+                parsed = self.toc_parser.parse(session.doc.load_page(page_num))
+            if not parsed['titles']:
+                return None
+            path = titles_sidecar_path(image_path)
+            write_titles_sidecar(parsed, path, page_num + 1, os.path.abspath(session.pdf_path))
+            logger.info(f"已从文字层解析目录: {parsed['entries']}个条目，置信度{parsed['confidence']:.2f}")
+            return {'path': path, 'confidence': parsed['confidence'], 'entries': parsed['entries']}
+        except Exception as e:
+            logger.warning(f"解析文字层目录失败: {e}")
+            return None
+    
+    def write_heading_hints(self, session: PDFDocumentSession, toc_pages: List[int],
+                            triage: Optional[Dict[str, Any]], output_dir: str) -> str:
+        """
+        写出标题字号线索（<文件名>_headings.json），页码按去掉目录页后的顺序编号
+        
+        有分诊清单时只读取文字层页面（扫描页、乱码页没有可用的字号信息）。
+        
+        Returns:
+            清单路径；没有候选标题或失败时返回空字符串
+        """
+        try:
+            kinds = triage.get('pages') if triage else None
+            skip = set(toc_pages)
+            lines_by_page = {}
+            page_idx = 0
+            for n in range(session.page_count):
+                if n in skip:
+                    continue
+                if kinds is None or (n < len(kinds) and kinds[n] == 'T'):
+                    lines_by_page[page_idx] = session.page_lines(n)
+                page_idx += 1
+            hints = build_heading_hints(lines_by_page)
+            if not hints['pages']:
+                return ''
+            path = headings_sidecar_path(output_dir, Path(session.pdf_path).stem)
+            write_heading_hints(hints, path, os.path.abspath(session.pdf_path), toc_pages)
+            logger.info(f"已写出标题字号线索: {sum(len(h) for h in hints['pages'].values())}行，"
+                        f"字号级数{len(hints['sizes'])}")
+            return path
+        except Exception as e:
+            logger.warning(f"写出标题字号线索失败: {e}")
+            return ''
     
-    def remove_toc_pages(self, pdf_path: str, toc_pages: List[int], output_path: str) -> bool:
+    def remove_toc_pages(self, source: Union[str, PDFDocumentSession], toc_pages: List[int],
+                         output_path: str) -> bool:
         """
         从PDF中删除目录页
         
+        用select保留其余页面，并以garbage/deflate选项保存，清理被删页面不再引用的对象。
+        传入会话时直接在已打开的文档上删页，调用后该会话的文档内容已被修改。
+        
         Args:
-            pdf_path: 原PDF文件路径
+            source: 原PDF文件路径或已打开的文档会话
             toc_pages: 目录页页码列表
             output_path: 输出PDF路径
             
         Returns:
             是否成功
         """
+        session = None
         try:
-            doc = fitz.open(pdf_path)
-            
-            # 删除指定页面
-            for page_num in reversed(toc_pages):  # 从后往前删除
-                doc.delete_page(page_num)
+            session = self._session(source)
+            doc = session.doc
             
-            # 保存新PDF
-            doc.save(output_path)
-            doc.close()
+            with _MUPDF_LOCK:
+                # 保留目录页以外的页面
+                skip = set(toc_pages)
+                doc.select([n for n in range(len(doc)) if n not in skip])
+                
+                # 保存新PDF：garbage=2 去掉无引用对象并压缩xref，deflate压缩未压缩的流
+                doc.save(output_path, garbage=2, deflate=True)
             
             logger.info(f"已生成去目录PDF: {output_path}")
             return True
@@ -365,14 +1206,54 @@ class PDFProcessor:
         except Exception as e:
             logger.error(f"删除目录页失败: {e}")
             return False
+        finally:
+            if session is not None and session is not source:
+                session.close()
+    
+    def write_skip_sidecar(self, session: PDFDocumentSession, toc_pages: List[int],
+                           sidecar_path: str) -> bool:
+        """
+        写出跳过页清单（虚拟去目录视图）
+        
+        清单记录原PDF路径、内容哈希、总页数和需跳过的页码（从0开始），
+        Step2据此在内存中过滤页面，不需要磁盘上的PDF副本。
+        
+        Args:
+            session: 文档会话
+            toc_pages: 目录页页码列表
+            sidecar_path: 清单文件路径
+            
+        Returns:
+            是否成功
+        """
+        try:
+            sidecar = {
+                'source_pdf': os.path.abspath(session.pdf_path),
+                'sha256': session.content_hash,
+                'page_count': session.page_count,
+                'skip_pages': sorted(toc_pages),
+                'reason': 'toc'
+            }
+            with open(sidecar_path, 'w', encoding='utf-8') as f:
+                json.dump(sidecar, f, ensure_ascii=False, indent=2)
+            logger.info(f"已生成跳过页清单: {sidecar_path}")
+            return True
+        except Exception as e:
+            logger.error(f"写出跳过页清单失败: {e}")
+            return False
     
-    def process_pdf(self, pdf_path: str, output_dir: str) -> Dict[str, Any]:
+    def process_pdf(self, pdf_path: str, output_dir: str,
+                    prepared: Optional[Future] = None) -> Dict[str, Any]:
         """
         处理单个PDF文件
         
+        整个流程共用一个文档会话：PDF只打开一次，目录页的OCR渲染结果
+        直接用于导出目录页图像。
+        
         Args:
             pdf_path: PDF文件路径
             output_dir: 输出目录
+            prepared: prefetch(pdf_path)返回的Future（已预取时传入）
             
         Returns:
             处理结果字典
@@ -382,31 +1263,61 @@ class PDFProcessor:
             'toc_pages': [],
             'image_paths': [],
             'output_pdf': '',
-            'error': ''
+            'error': '',
+            'pages_scanned': 0,
+            'text_layer': {},
+            'sha256': '',
+            'skip_sidecar': '',
+            'titles_sidecar': '',
+            'titles_confidence': 0.0,
+            'headings_sidecar': ''
         }
         
         try:
-            # 1. 查找目录页
-            toc_pages = self.find_toc_pages(pdf_path)
-            
-            if not toc_pages:
-                result['error'] = '未找到目录页'
-                return result
-            
-            # 2. 提取目录页图像
-            image_paths = self.extract_toc_images(pdf_path, toc_pages, output_dir)
-            
-            # 3. 删除目录页并保存新PDF
-            pdf_name = Path(pdf_path).stem
-            output_pdf = os.path.join(output_dir, f"{pdf_name}_no_toc.pdf")
-            
-            if self.remove_toc_pages(pdf_path, toc_pages, output_pdf):
-                result['success'] = True
-                result['toc_pages'] = toc_pages
-                result['image_paths'] = image_paths
-                result['output_pdf'] = output_pdf
-            else:
-                result['error'] = '删除目录页失败'
+            plan = prepared.result() if prepared is not None else self._prepare_path(pdf_path)
+            with plan['session'] as session:
+                result['sha256'] = session.content_hash
+                
+                # 1. 查找目录页
+                toc_pages = self.find_toc_pages(session, plan)
+                result['pages_scanned'] = self.last_scan.get('pages_scanned', 0)
+                result['text_layer'] = dict(self.last_scan)
+                
+                if not toc_pages:
+                    result['error'] = '未找到目录页'
+                    return result
+                
+                # 2. 提取目录页图像；文字层命中的目录页同时解析出标题清单（删页前）
+                image_paths = self.extract_toc_images(session, toc_pages, output_dir)
+                if image_paths and toc_pages[0] == plan['text_hit']:
+                    titles = self.write_local_titles(session, toc_pages[0], image_paths[0])
+                    if titles is not None:
+                        result['titles_sidecar'] = titles['path']
+                        result['titles_confidence'] = titles['confidence']
+                result['headings_sidecar'] = self.write_heading_hints(session, toc_pages, plan['triage'], output_dir)
+                
+                # 3. 删除目录页：写出跳过页清单，或保存去目录PDF副本
+                pdf_name = Path(pdf_path).stem
+                if self.virtual_no_toc:
+                    sidecar_path = os.path.join(output_dir, f"{pdf_name}{SKIP_PAGES_SUFFIX}")
+                    if self.write_skip_sidecar(session, toc_pages, sidecar_path):
+                        result['success'] = True
+                        result['toc_pages'] = toc_pages
+                        result['image_paths'] = image_paths
+                        result['skip_sidecar'] = sidecar_path
+                    else:
+                        result['error'] = '写出跳过页清单失败'
+                    return result
+                
+                output_pdf = os.path.join(output_dir, f"{pdf_name}_no_toc.pdf")
+                if self.remove_toc_pages(session, toc_pages, output_pdf):
+                    result['success'] = True
+                    result['toc_pages'] = toc_pages
+                    result['image_paths'] = image_paths
+                    result['output_pdf'] = output_pdf
+                    self._write_derived_triage(plan['triage'], output_pdf, toc_pages)
+                else:
+                    result['error'] = '删除目录页失败'
             
         except Exception as e:
             result['error'] = str(e)
@@ -414,98 +1325,517 @@ class PDFProcessor:
         
         return result
 
-def main():
-    """主函数 - 硬编码循环处理"""
-    # 硬编码路径配置
-    input_dir = r"/Users/liucun/Desktop/目录页提取代码/USESG/downloaded_pdfs"  # 输入PDF目录
-    output_base_dir = r"/Users/liucun/Desktop/目录页提取代码/processed_pdfs"   # 输出基础目录
+# ==================== 批处理（支持多进程） ====================
+
+# 处理清单文件名（位于输出基础目录下）
+MANIFEST_NAME = "processing_manifest.jsonl"
+
+
+def config_fingerprint(max_pages: int, virtual_no_toc: bool = False,
+                       toc_classifier: Optional[TOCClassifier] = None) -> str:
+    """
+    影响处理结果的配置指纹
     
-    # 检查输入目录是否存在
-    if not os.path.exists(input_dir):
-        logger.error(f"输入目录不存在: {input_dir}")
+    配置（评分窗口、级联参数、目录检测规则、分类器模型）变化后，清单中的成功记录不再复用。
+    """
+    detector = TOCDetector()
+    config = {
+        'max_pages': max_pages,
+        'virtual_no_toc': virtual_no_toc,
+        'dpi': [PROBE_DPI, LOW_OCR_DPI, HIGH_OCR_DPI, TOC_IMAGE_DPI],
+        'ambiguous': list(AMBIGUOUS_SCORE_RANGE),
+        'ink': [BLANK_INK_RATIO, PHOTO_PAPER_RATIO, PHOTO_EDGE_RATIO],
+        'text_layer': [MIN_TEXT_LAYER_CHARS, MIN_VALID_CHAR_RATIO],
+        'triage': [TRIAGE_VERSION, BLANK_CONTENT_BYTES],
+        'toc_keywords': detector.toc_keywords,
+        'strong_keywords': detector.strong_keywords,
+        'chapter_keywords': detector.chapter_keywords,
+        'non_toc_keywords': detector.non_toc_keywords,
+        'item_patterns': detector.item_patterns,
+        'page_patterns': detector.page_patterns,
+        'classifier': toc_classifier.fingerprint if toc_classifier is not None else None,
+        'toc_parser': TOC_PARSER_VERSION,
+        'heading_hints': HEADING_HINTS_VERSION,
+    }
+    payload = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+# 每个工作进程持有一个常驻的PDFProcessor，避免重复加载PaddleOCR模型
+_worker_processor: Optional[PDFProcessor] = None
+# 工作进程启动耗时（进程启动到处理器就绪，不含模型加载）
+_worker_startup_time = 0.0
+# 分配给本工作进程的算子内线程数
+_worker_threads = 1
+
+# 多进程模式下每次派发给工作进程的PDF数；同组内处理当前PDF时预取下一个
+PREFETCH_GROUP_SIZE = 4
+
+
+def _init_worker(use_gpu: bool, max_pages: int, ocr_cache_dir: Optional[str] = None,
+                 ocr_cache_max_mb: int = 1024, pipelined: bool = True, virtual_no_toc: bool = False,
+                 toc_classifier_path: Optional[str] = None, threads: Optional[int] = None,
+                 sidecar_dir: Optional[str] = None):
+    """工作进程初始化：限定算子内线程数，创建常驻的处理器（OCR模型在首次需要时才加载）"""
+    global _worker_processor, _worker_startup_time, _worker_threads
+    _worker_threads = apply_thread_budget(threads or threads_per_worker(1))
+    ocr_cache = None
+    if ocr_cache_dir:
+        try:
+            # 每个进程各自打开SQLite连接，共享同一个缓存文件
+            ocr_cache = OCRCache(ocr_cache_dir, max_bytes=ocr_cache_max_mb * (1 << 20))
+        except Exception as e:
+            logger.error(f"打开OCR缓存失败，本进程不使用缓存: {e}")
+    _worker_processor = PDFProcessor(use_gpu=use_gpu, max_pages=max_pages, ocr_cache=ocr_cache,
+                                     pipelined=pipelined, virtual_no_toc=virtual_no_toc,
+                                     toc_classifier=load_classifier(toc_classifier_path),
+                                     cpu_threads=_worker_threads, sidecar_dir=sidecar_dir)
+    _worker_startup_time = time.time() - _PROCESS_START
+
+
+def _process_task(task: Tuple[str, str], prepared: Optional[Future] = None) -> Dict[str, Any]:
+    """
+    在工作进程中处理单个PDF
+    
+    Args:
+        task: (PDF路径, 输出目录)
+        prepared: 该PDF的预取结果（没有则现场准备）
+        
+    Returns:
+        process_pdf的结果字典，附加工作进程标识和耗时
+    """
+    pdf_path, pdf_output_dir = task
+    start_time = time.time()
+    meter = CPUMeter()
+    cache = _worker_processor.ocr.cache
+    cache_before = cache.stats() if cache is not None else None
+    
+    try:
+        os.makedirs(pdf_output_dir, exist_ok=True)
+        result = _worker_processor.process_pdf(pdf_path, pdf_output_dir, prepared)
+    except Exception as e:
+        result = {
+            'success': False,
+            'toc_pages': [],
+            'image_paths': [],
+            'output_pdf': '',
+            'error': str(e),
+            'pages_scanned': 0,
+            'text_layer': {}
+        }
+    
+    if cache is not None:
+        cache.flush()
+        cache_after = cache.stats()
+        result['ocr_cache'] = {k: cache_after[k] - cache_before[k] for k in cache_after}
+    result['pdf_path'] = pdf_path
+    result['worker'] = os.getpid()
+    result['elapsed'] = time.time() - start_time
+    result['cpu_seconds'] = meter.snapshot(_worker_threads)['cpu_seconds']
+    result['threads'] = _worker_threads
+    result['worker_startup'] = _worker_startup_time
+    result['model_load_time'] = _worker_processor.ocr.model_load_time
+    return result
+
+
+def _process_stream(tasks: List[Tuple[str, str]]):
+    """
+    在当前工作进程中依次处理一组PDF，逐个产出结果
+    
+    启用流水线时，处理当前PDF的同时在预取线程中打开下一个PDF、
+    扫描文字层并开始渲染其OCR候选页。
+    """
+    prefetched = None
+    try:
+        for i, task in enumerate(tasks):
+            current = prefetched
+            prefetched = None
+            if _worker_processor.pipelined and i + 1 < len(tasks):
+                prefetched = _worker_processor.prefetch(tasks[i + 1][0])
+            yield _process_task(task, current)
+    finally:
+        PDFProcessor.discard(prefetched)
+
+
+def _process_group(tasks: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """进程池任务：处理一组PDF（组内预取）"""
+    return list(_process_stream(tasks))
+
+
+def _iter_results(tasks: List[Tuple[str, str]], num_workers: int,
+                  use_gpu: bool, max_pages: int, ocr_cache_dir: Optional[str] = None,
+                  ocr_cache_max_mb: int = 1024, pipelined: bool = True, virtual_no_toc: bool = False,
+                  toc_classifier_path: Optional[str] = None, threads: Optional[int] = None,
+                  sidecar_dir: Optional[str] = None):
+    """
+    按完成顺序逐个产出处理结果
+    
+    num_workers <= 1 时在当前进程内顺序处理；否则启动进程池，
+    各工作进程从共享任务队列中按组（PREFETCH_GROUP_SIZE个PDF）拉取任务。
+    threads为每个工作进程的算子内线程数（由线程预算分配），sidecar_dir为分诊目录。
+    """
+    if num_workers <= 1:
+        _init_worker(use_gpu, max_pages, ocr_cache_dir, ocr_cache_max_mb, pipelined, virtual_no_toc,
+                     toc_classifier_path, threads, sidecar_dir)
+        yield from _process_stream(tasks)
         return
     
+    group_size = PREFETCH_GROUP_SIZE if pipelined else 1
+    groups = [tasks[i:i + group_size] for i in range(0, len(tasks), group_size)]
+    
+    # 线程数环境变量在启动进程池前设置：子进程导入numpy等库时即已生效
+    apply_thread_budget(threads or threads_per_worker(num_workers))
+    # 使用spawn避免在fork后的子进程中继承PaddleOCR/CUDA状态
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=num_workers,
+                  initializer=_init_worker,
+                  initargs=(use_gpu, max_pages, ocr_cache_dir, ocr_cache_max_mb,
+                            pipelined, virtual_no_toc, toc_classifier_path, threads, sidecar_dir)) as pool:
+        for results in pool.imap_unordered(_process_group, groups, chunksize=1):
+            yield from results
+
+
+def _summarize_workers(worker_stats: Dict[int, Dict[str, float]]) -> List[Dict[str, Any]]:
+    """汇总每个工作进程的吞吐量（页/秒）和CPU利用率（CPU时间 / (忙碌时间 * 分配线程数)）"""
+    summary = []
+    for worker_id, stats in sorted(worker_stats.items()):
+        busy = stats['busy_seconds']
+        summary.append({
+            'worker': worker_id,
+            'files': stats['files'],
+            'pages': stats['pages'],
+            'startup_seconds': round(stats['startup_seconds'], 2),
+            'model_load_seconds': round(stats['model_load_seconds'], 2),
+            'busy_seconds': round(busy, 2),
+            'pages_per_sec': round(stats['pages'] / busy, 3) if busy > 0 else 0.0,
+            'threads': stats['threads'],
+            'cpu_seconds': round(stats['cpu_seconds'], 2),
+            'utilization': utilization(stats['cpu_seconds'], busy, stats['threads'])
+        })
+    return summary
+
+
+def process_directory(input_dir: str, output_base_dir: str, num_workers: int = 1,
+                      use_gpu: bool = False, max_pages: int = 5,
+                      ocr_cache_dir: Optional[str] = None, ocr_cache_max_mb: int = 1024,
+                      resume: bool = True, pipelined: bool = True,
+                      virtual_no_toc: bool = False,
+                      toc_classifier_path: Optional[str] = DEFAULT_MODEL_PATH,
+                      cpu_budget_cores: Optional[int] = None) -> Dict[str, Any]:
+    """
+    批量处理目录下的所有PDF文件
+    
+    Args:
+        input_dir: 输入PDF目录
+        output_base_dir: 输出基础目录
+        num_workers: 工作进程数（<=1 时顺序处理）
+        use_gpu: 是否使用GPU
+        max_pages: 每个PDF最大检查页数
+        ocr_cache_dir: OCR结果缓存目录（None表示不缓存）；重复运行时
+            已识别过的页面（同一PDF内容、页码、DPI和模型版本）直接读取缓存
+        ocr_cache_max_mb: OCR缓存大小上限（MB），超出后按LRU淘汰
+        resume: 是否根据处理清单跳过内容与配置均未变化且已成功的PDF；
+            每个PDF处理完成后都会立即追加到清单，中断后重跑即可续跑
+        pipelined: 是否启用渲染/OCR流水线和下一个PDF的预取
+        virtual_no_toc: 为True时不复制去目录PDF，只写出跳过页清单供Step2过滤页面
+        toc_classifier_path: 目录页分类器模型路径（由toc_classifier.py训练）；
+            文件不存在或为None时只使用规则评分
+        cpu_budget_cores: 总核心预算（None时读取ESG_CPU_BUDGET环境变量，未设置则为全部可用核心）；
+            每个工作进程的OCR/数值库线程数为预算除以进程数，避免多进程超额订阅
+        
+    Returns:
+        批处理报告字典（同时写入processing_report.json）
+    """
     # 创建输出目录
     success_dir = os.path.join(output_base_dir, "success")
     failed_dir = os.path.join(output_base_dir, "failed")
     os.makedirs(success_dir, exist_ok=True)
     os.makedirs(failed_dir, exist_ok=True)
+    # 分诊清单和页面签名写在输出基础目录下，不写入输入目录
+    sidecar_dir = os.path.join(output_base_dir, TRIAGE_DIR_NAME)
+    os.makedirs(sidecar_dir, exist_ok=True)
     
-    # 创建处理器
-    processor = PDFProcessor(use_gpu=False, max_pages=5)  # 使用CPU模式，只检查前5页
+    # 获取所有PDF文件
+    pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
+    
+    if not pdf_files:
+        logger.warning(f"在目录 {input_dir} 中未找到PDF文件")
+        return {}
     
     # 统计信息
-    total_files = 0
     success_count = 0
-    failed_count = 0
     failed_files = []
+    file_results = []
+    worker_stats: Dict[int, Dict[str, float]] = {}
+    batch_start = time.time()
+    budget = cpu_budget(cpu_budget_cores)
+    threads = threads_per_worker(num_workers, budget)
+    logger.info(f"CPU预算: {budget}核，{max(num_workers, 1)}个工作进程，每进程{threads}线程")
     
-    # 获取所有PDF文件
-    pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
+    manifest = RunManifest(os.path.join(output_base_dir, MANIFEST_NAME))
+    toc_classifier = load_classifier(toc_classifier_path)
+    if toc_classifier is not None:
+        logger.info(f"已启用目录页分类器: {toc_classifier_path}（阈值{toc_classifier.threshold:.2f}）")
+    config_id = config_fingerprint(max_pages, virtual_no_toc, toc_classifier)
     
-    if not pdf_files:
-        logger.warning(f"在目录 {input_dir} 中未找到PDF文件")
-        return
+    pdf_paths = [os.path.join(input_dir, f) for f in pdf_files]
+    completed = {}
+    if resume:
+        for pdf_path in pdf_paths:
+            record = manifest.completed_record(pdf_path, config_id)
+            if record is not None:
+                completed[pdf_path] = record
+    
+    # 按内容哈希归并重复文件：每组只处理规范文件（已处理成功的优先）
+    index = IngestIndex(pdf_paths, manifest, preferred=completed, sidecar_dir=sidecar_dir)
+    try:
+        index.save(os.path.join(output_base_dir, INGEST_INDEX_NAME))
+    except OSError as e:
+        logger.warning(f"写出去重索引失败: {e}")
     
-    logger.info(f"找到 {len(pdf_files)} 个PDF文件，开始处理...")
+    # 为每个PDF创建独立的子文件夹；清单中已成功的PDF直接沿用记录
+    tasks = []
+    duplicates = []
+    for f, pdf_path in zip(pdf_files, pdf_paths):
+        record = completed.get(pdf_path)
+        if record is None:
+            if index.is_duplicate(pdf_path):
+                duplicates.append(pdf_path)
+            else:
+                tasks.append((pdf_path, os.path.join(success_dir, Path(f).stem)))
+            continue
+        success_count += 1
+        file_results.append({
+            'file': f,
+            'success': True,
+            'toc_pages': [p + 1 for p in record['toc_pages']],
+            'image_paths': record['image_paths'],
+            'output_pdf': record['output_pdf'],
+            'skip_sidecar': record.get('skip_sidecar', ''),
+            'titles_sidecar': record.get('titles_sidecar', ''),
+            'headings_sidecar': record.get('headings_sidecar', ''),
+            'error': '',
+            'pages_scanned': record.get('pages_scanned', 0),
+            'ocr_pages': 0,
+            'cascade': {},
+            'ocr_cache': {},
+            'elapsed': 0.0,
+            'worker': None,
+            'skipped': True
+        })
+    skipped_count = len(file_results)
     
-    # 循环处理每个PDF文件
-    for i, pdf_filename in enumerate(pdf_files, 1):
-        pdf_path = os.path.join(input_dir, pdf_filename)
-        logger.info(f"\n处理进度: {i}/{len(pdf_files)} - {pdf_filename}")
-        
-        total_files += 1
+    logger.info(f"找到 {len(pdf_files)} 个PDF文件，其中{skipped_count}个已在清单中成功处理，"
+                f"{len(duplicates)}个与其他文件内容相同，"
+                f"开始处理其余{len(tasks)}个（工作进程数: {max(num_workers, 1)}）...")
+    results_by_path = {}
+    
+    results_iter = _iter_results(tasks, num_workers, use_gpu, max_pages,
+                                 ocr_cache_dir, ocr_cache_max_mb, pipelined, virtual_no_toc,
+                                 toc_classifier_path if toc_classifier is not None else None,
+                                 threads, sidecar_dir) if tasks else []
+    for i, result in enumerate(results_iter, 1):
+        pdf_path = result['pdf_path']
+        pdf_filename = os.path.basename(pdf_path)
+        pdf_name = Path(pdf_filename).stem
+        logger.info(f"处理进度: {i}/{len(tasks)} - {pdf_filename}")
         
         try:
-            # 为每个PDF创建独立的子文件夹
-            pdf_name = Path(pdf_filename).stem
-            pdf_output_dir = os.path.join(success_dir, pdf_name)
-            os.makedirs(pdf_output_dir, exist_ok=True)
-            
-            # 处理PDF
-            result = processor.process_pdf(pdf_path, pdf_output_dir)
-            
-            if result['success']:
-                success_count += 1
-                logger.info(f"✅ 成功处理: {pdf_filename}")
-                logger.info(f"   目录页: {[p+1 for p in result['toc_pages']]}")
-                logger.info(f"   输出目录: {pdf_output_dir}")
-            else:
-                failed_count += 1
-                failed_files.append(pdf_filename)
-                logger.warning(f"❌ 处理失败: {pdf_filename} - {result['error']}")
-                
-                # 复制失败的文件到failed目录
+            manifest.append(pdf_path, config_id, result)
+        except Exception as e:
+            logger.error(f"写入处理清单失败: {pdf_filename} - {e}")
+        results_by_path[pdf_path] = result
+        
+        stats = worker_stats.setdefault(result['worker'], {
+            'files': 0, 'pages': 0, 'busy_seconds': 0.0,
+            'startup_seconds': 0.0, 'model_load_seconds': 0.0,
+            'cpu_seconds': 0.0, 'threads': result.get('threads', threads)
+        })
+        stats['startup_seconds'] = result.get('worker_startup', 0.0)
+        stats['model_load_seconds'] = max(stats['model_load_seconds'], result.get('model_load_time', 0.0))
+        stats['files'] += 1
+        stats['pages'] += result.get('pages_scanned', 0)
+        stats['busy_seconds'] += result['elapsed']
+        stats['cpu_seconds'] += result.get('cpu_seconds', 0.0)
+        
+        if result['success']:
+            success_count += 1
+            logger.info(f"✅ 成功处理: {pdf_filename}")
+            logger.info(f"   目录页: {[p+1 for p in result['toc_pages']]}")
+            logger.info(f"   输出目录: {os.path.join(success_dir, pdf_name)}")
+        else:
+            failed_files.append(pdf_filename)
+            logger.warning(f"❌ 处理失败: {pdf_filename} - {result['error']}")
+            
+            # 复制失败的文件到failed目录
+            try:
                 failed_pdf_dir = os.path.join(failed_dir, pdf_name)
                 os.makedirs(failed_pdf_dir, exist_ok=True)
-                import shutil
                 shutil.copy2(pdf_path, os.path.join(failed_pdf_dir, pdf_filename))
-                
+            except Exception as e:
+                logger.error(f"复制失败文件出错: {pdf_filename} - {e}")
+        
+        file_results.append({
+            'file': pdf_filename,
+            'success': result['success'],
+            'toc_pages': [p + 1 for p in result['toc_pages']],
+            'image_paths': result['image_paths'],
+            'output_pdf': result['output_pdf'],
+            'skip_sidecar': result.get('skip_sidecar', ''),
+            'titles_sidecar': result.get('titles_sidecar', ''),
+            'headings_sidecar': result.get('headings_sidecar', ''),
+            'error': result['error'],
+            'pages_scanned': result.get('pages_scanned', 0),
+            'ocr_pages': result.get('text_layer', {}).get('ocr_pages', 0),
+            'cascade': result.get('text_layer', {}).get('cascade', {}),
+            'classifier_hits': result.get('text_layer', {}).get('classifier_hits', 0),
+            'ocr_cache': result.get('ocr_cache', {}),
+            'elapsed': round(result['elapsed'], 2),
+            'worker': result['worker'],
+            'skipped': False
+        })
+    
+    # 重复文件：链接规范文件的输出
+    for pdf_path in duplicates:
+        pdf_filename = os.path.basename(pdf_path)
+        canonical = index.canonical_of(pdf_path)
+        canonical_result = results_by_path.get(canonical)
+        if canonical_result is None and canonical in completed:
+            canonical_result = dict(completed[canonical], success=True, error='')
+        
+        entry = {
+            'file': pdf_filename,
+            'success': False,
+            'toc_pages': [],
+            'image_paths': [],
+            'output_pdf': '',
+            'skip_sidecar': '',
+            'titles_sidecar': '',
+            'headings_sidecar': '',
+            'error': '',
+            'pages_scanned': 0,
+            'ocr_pages': 0,
+            'cascade': {},
+            'ocr_cache': {},
+            'elapsed': 0.0,
+            'worker': None,
+            'skipped': False,
+            'duplicate_of': os.path.basename(canonical)
+        }
+        try:
+            if canonical_result is None or not canonical_result['success']:
+                raise ValueError(f"内容相同的规范文件处理失败: {os.path.basename(canonical)}")
+            mapping = link_outputs(canonical, os.path.join(success_dir, Path(canonical).stem),
+                                   pdf_path, os.path.join(success_dir, Path(pdf_filename).stem))
+            result = duplicate_result(canonical_result, canonical, pdf_path, mapping)
+            manifest.append(pdf_path, config_id, result)
+            success_count += 1
+            entry.update(success=True, toc_pages=[p + 1 for p in result['toc_pages']],
+                         image_paths=result['image_paths'], output_pdf=result['output_pdf'],
+                         skip_sidecar=result.get('skip_sidecar', ''),
+                         titles_sidecar=result.get('titles_sidecar', ''),
+                         headings_sidecar=result.get('headings_sidecar', ''))
+            logger.info(f"🔗 {pdf_filename} 与 {os.path.basename(canonical)} 内容相同，已链接其输出")
         except Exception as e:
-            failed_count += 1
+            entry['error'] = str(e)
             failed_files.append(pdf_filename)
-            logger.error(f"❌ 处理异常: {pdf_filename} - {e}")
-            
-            # 复制异常的文件到failed目录
-            pdf_name = Path(pdf_filename).stem
-            failed_pdf_dir = os.path.join(failed_dir, pdf_name)
-            os.makedirs(failed_pdf_dir, exist_ok=True)
-            import shutil
-            shutil.copy2(pdf_path, os.path.join(failed_pdf_dir, pdf_filename))
+            logger.warning(f"❌ 重复文件处理失败: {pdf_filename} - {e}")
+            try:
+                failed_pdf_dir = os.path.join(failed_dir, Path(pdf_filename).stem)
+                os.makedirs(failed_pdf_dir, exist_ok=True)
+                shutil.copy2(pdf_path, os.path.join(failed_pdf_dir, pdf_filename))
+            except Exception as e:
+                logger.error(f"复制失败文件出错: {pdf_filename} - {e}")
+        file_results.append(entry)
+    
+    # 近似重复检测：基于全量文字层扫描时写出的页面签名
+    near_duplicates = {'reports': [], 'pages': {}}
+    try:
+        near_duplicates = find_near_duplicates(pdf_paths, sidecar_dir)
+        write_near_duplicates(near_duplicates, os.path.join(output_base_dir, NEAR_DUPLICATES_NAME))
+        for report in near_duplicates['reports']:
+            logger.info(f"近似重复: {report['a']} ~ {report['b']}，共享{report['shared_pages']}页"
+                        f"（{report['overlap']:.0%}）")
+    except Exception as e:
+        logger.warning(f"近似重复检测失败: {e}")
+    
+    total_files = len(pdf_files)
+    failed_count = len(failed_files)
+    wall_time = time.time() - batch_start
+    workers_summary = _summarize_workers(worker_stats)
+    cpu_seconds = sum(w['cpu_seconds'] for w in workers_summary)
+    
+    report = {
+        'processing_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'input_dir': input_dir,
+        'output_dir': output_base_dir,
+        'num_workers': max(num_workers, 1),
+        'total_files': total_files,
+        'success_count': success_count,
+        'failed_count': failed_count,
+        'skipped_count': skipped_count,
+        'duplicate_count': len(duplicates),
+        'near_duplicate_reports': len(near_duplicates['reports']),
+        'success_rate': round(success_count / total_files * 100, 1),
+        'wall_time_seconds': round(wall_time, 2),
+        'total_pages_scanned': sum(s['pages'] for s in workers_summary),
+        'total_ocr_pages': sum(r['ocr_pages'] for r in file_results),
+        'cascade': {tier: sum(r['cascade'].get(tier, 0) for r in file_results)
+                    for tier in ('blank', 'photo', 'low_dpi', 'high_dpi')},
+        'ocr_cache': {k: sum(r['ocr_cache'].get(k, 0) for r in file_results) for k in ('hits', 'misses')},
+        'classifier_hits': sum(r.get('classifier_hits', 0) for r in file_results),
+        'cpu_budget': {
+            'cores': budget,
+            'threads_per_worker': threads,
+            'cpu_seconds': round(cpu_seconds, 2),
+            'utilization': utilization(cpu_seconds, wall_time, budget)
+        },
+        'workers': workers_summary,
+        'failed_files': failed_files,
+        'results': file_results
+    }
     
     # 生成处理报告
     report_file = os.path.join(output_base_dir, "processing_report.txt")
+    json_report_file = os.path.join(output_base_dir, "processing_report.json")
     try:
+        with open(json_report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        
         with open(report_file, 'w', encoding='utf-8') as f:
             f.write("PDF目录页提取处理报告\n")
             f.write("=" * 50 + "\n")
-            f.write(f"处理时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"处理时间: {report['processing_time']}\n")
             f.write(f"输入目录: {input_dir}\n")
             f.write(f"输出目录: {output_base_dir}\n")
             f.write(f"总文件数: {total_files}\n")
             f.write(f"成功处理: {success_count}\n")
             f.write(f"处理失败: {failed_count}\n")
-            f.write(f"成功率: {success_count/total_files*100:.1f}%\n\n")
+            f.write(f"沿用清单记录（跳过）: {skipped_count}\n")
+            f.write(f"内容重复（链接规范文件输出）: {len(duplicates)}\n")
+            f.write(f"近似重复报告对: {len(near_duplicates['reports'])}\n")
+            f.write(f"成功率: {success_count/total_files*100:.1f}%\n")
+            f.write(f"总耗时: {wall_time:.1f}秒\n")
+            f.write(f"扫描页数: {report['total_pages_scanned']}（其中OCR {report['total_ocr_pages']}页）\n")
+            cascade = report['cascade']
+            f.write(f"OCR级联: 空白页跳过{cascade['blank']}, 照片页跳过{cascade['photo']}, "
+                    f"低分辨率完成{cascade['low_dpi']}, 高分辨率完成{cascade['high_dpi']}\n")
+            if toc_classifier is not None:
+                f.write(f"分类器补判目录页: {report['classifier_hits']}\n")
+            if ocr_cache_dir:
+                f.write(f"OCR缓存: 命中{report['ocr_cache']['hits']}, 未命中{report['ocr_cache']['misses']}"
+                        f"（{ocr_cache_dir}）\n")
+            f.write(f"CPU预算: {budget}核, 每进程{threads}线程, CPU时间{cpu_seconds:.1f}秒, "
+                    f"整体利用率{report['cpu_budget']['utilization']:.1%}\n")
+            f.write("\n")
+            
+            f.write("工作进程吞吐量:\n")
+            f.write("-" * 30 + "\n")
+            for w in workers_summary:
+                f.write(f"- 进程{w['worker']}: {w['files']}个文件, {w['pages']}页, "
+                        f"{w['pages_per_sec']:.2f}页/秒, 启动{w['startup_seconds']:.2f}秒, "
+                        f"模型加载{w['model_load_seconds']:.2f}秒, {w['threads']}线程利用率{w['utilization']:.1%}\n")
+            f.write("\n")
             
             if failed_files:
                 f.write("失败的文件列表:\n")
@@ -516,7 +1846,12 @@ def main():
             f.write(f"\n输出目录结构:\n")
             f.write(f"- {success_dir}/ - 成功处理的文件（每个PDF一个子文件夹）\n")
             f.write(f"- {failed_dir}/ - 处理失败的原PDF文件\n")
+            f.write(f"- {sidecar_dir}/ - 分诊清单（Step2据此选择解析模式）\n")
             f.write(f"- {report_file} - 本报告\n")
+            f.write(f"- {json_report_file} - JSON格式报告\n")
+            f.write(f"- {manifest.manifest_path} - 逐PDF处理清单（续跑依据）\n")
+            f.write(f"- {os.path.join(output_base_dir, INGEST_INDEX_NAME)} - 内容重复的PDF分组\n")
+            f.write(f"- {os.path.join(output_base_dir, NEAR_DUPLICATES_NAME)} - 近似重复的报告和页面\n")
         
         logger.info(f"📊 处理报告已生成: {report_file}")
         
@@ -530,7 +1865,17 @@ def main():
     print(f"总文件数: {total_files}")
     print(f"成功处理: {success_count}")
     print(f"处理失败: {failed_count}")
+    print(f"沿用清单记录（跳过）: {skipped_count}")
+    print(f"内容重复（链接规范文件输出）: {len(duplicates)}")
+    print(f"近似重复报告对: {len(near_duplicates['reports'])}")
     print(f"成功率: {success_count/total_files*100:.1f}%")
+    print(f"总耗时: {wall_time:.1f}秒")
+    print(f"CPU预算: {budget}核, 每进程{threads}线程, 整体利用率{report['cpu_budget']['utilization']:.1%}")
+    
+    print(f"\n工作进程吞吐量:")
+    for w in workers_summary:
+        print(f"  进程{w['worker']}: {w['files']}个文件, {w['pages_per_sec']:.2f}页/秒, "
+              f"启动{w['startup_seconds']:.2f}秒, 模型加载{w['model_load_seconds']:.2f}秒")
     
     print(f"\n输出目录结构:")
     print(f"✅ 成功文件: {success_dir}/")
@@ -543,6 +1888,32 @@ def main():
             print(f"  - {file}")
     
     print("="*50)
+    return report
+
+def main():
+    """主函数 - 硬编码循环处理"""
+    # 硬编码路径配置
+    input_dir = r"/Users/liucun/Desktop/目录页提取代码/USESG/downloaded_pdfs"  # 输入PDF目录
+    output_base_dir = r"/Users/liucun/Desktop/目录页提取代码/processed_pdfs"   # 输出基础目录
+    
+    # 工作进程数：1为顺序处理；>1时每个进程常驻一个PaddleOCR模型
+    num_workers = max(1, (os.cpu_count() or 2) - 1)
+    
+    # OCR结果缓存：调整检测规则后重跑时，已识别过的页面不再重复OCR
+    ocr_cache_dir = os.path.join(output_base_dir, "ocr_cache")
+    
+    # 虚拟去目录视图：只写跳过页清单，由Step2过滤页面（False时生成_no_toc.pdf副本）
+    virtual_no_toc = True
+    
+    # 检查输入目录是否存在
+    if not os.path.exists(input_dir):
+        logger.error(f"输入目录不存在: {input_dir}")
+        return
+    
+    # 使用CPU模式；文字层扫描成本很低，目录页评分窗口放宽到前15页
+    process_directory(input_dir, output_base_dir, num_workers=num_workers,
+                      use_gpu=False, max_pages=15, ocr_cache_dir=ocr_cache_dir,
+                      virtual_no_toc=virtual_no_toc)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
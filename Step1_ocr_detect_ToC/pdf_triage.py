@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF入库分诊
+对每个PDF做一次快速的PyMuPDF扫描，记录页数、文字层覆盖率、扫描页比例、
+加密/损坏状态和文件大小，写入分诊目录（Step1输出基础目录下的triage/）中的
+<文件名>_<路径哈希>_triage.json（按PDF的绝对路径区分，不写在下载目录中），
+逐页文本的MinHash签名写入同一目录的 <文件名>_<路径哈希>_minhash.npz（供近似重复检测使用）。
+Step1据此只对需要的页面OCR，Step2据此选择OCR/文本解析模式，不再各自重新判断。
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from ocr_cache import file_sha256
+from minhash import MINHASH_SUFFIX, minhash_signature, write_signatures, load_signatures
+
+logger = logging.getLogger(__name__)
+
+# 分诊目录名（位于输出基础目录下）和分诊清单后缀；Step2的triage_sidecar使用相同的约定
+TRIAGE_DIR_NAME = "triage"
+TRIAGE_SUFFIX = "_triage.json"
+TRIAGE_VERSION = 1
+
+# 文字层质量判定阈值
+MIN_TEXT_LAYER_CHARS = 20      # 有效字符少于此值视为无文字层
+MIN_VALID_CHAR_RATIO = 0.7     # 有效字符占比低于此值视为乱码文字层
+
+# 无文字层也无图片、内容流短于此值（字节）的页面视为空白页
+BLANK_CONTENT_BYTES = 256
+
+# 非空白页中扫描页和乱码页的占比超过此值时，整本按OCR模式解析
+OCR_PAGE_RATIO = 0.2
+
+# 每页的分诊类别：T 文字层正常、G 乱码文字层、S 扫描页（无文字层、有图片）、
+# V 矢量页（无文字层、无图片，但有绘制内容）、B 空白页
+PAGE_KINDS = {'T': 'text', 'G': 'garbled', 'S': 'scanned', 'V': 'vector', 'B': 'blank'}
+# 需要OCR才能得到文字的页面类别
+OCR_PAGE_KINDS = ('G', 'S', 'V')
+
+# 有效字符：CJK汉字/标点、全角字符、ASCII可打印字符、常见排版符号
+_VALID_CHAR_RE = re.compile(
+    r'[\u4e00-\u9fff\u3400-\u4dbf\u3000-\u303f\uff00-\uffef'
+    r'\u0020-\u007e\u2010-\u2027\u2030-\u205e\u00b7◎●■◆•○]'
+)
+
+
+def analyze_text_layer(text: str, page_area: float) -> Dict[str, Any]:
+    """
+    评估页面文字层质量
+
+    Args:
+        text: page.get_text() 的结果
+        page_area: 页面面积（平方点）
+
+    Returns:
+        字典：chars（非空白字符数）、valid_ratio（有效字符占比）、
+        density（每1000平方点的有效字符数）、status（text/empty/garbled）
+    """
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return {'chars': 0, 'valid_ratio': 0.0, 'density': 0.0, 'status': 'empty'}
+
+    valid = sum(1 for c in chars if _VALID_CHAR_RE.match(c))
+    valid_ratio = valid / len(chars)
+    density = valid / (page_area / 1000) if page_area > 0 else 0.0
+
+    if valid < MIN_TEXT_LAYER_CHARS:
+        status = 'empty'
+    elif valid_ratio < MIN_VALID_CHAR_RATIO:
+        status = 'garbled'
+    else:
+        status = 'text'
+
+    return {
+        'chars': len(chars),
+        'valid_ratio': round(valid_ratio, 3),
+        'density': round(density, 3),
+        'status': status
+    }
+
+
+def page_kind(page: fitz.Page, status: str) -> str:
+    """
+    页面分诊类别（见PAGE_KINDS）
+
+    Args:
+        page: 页面
+        status: analyze_text_layer给出的文字层状态
+    """
+    if status == 'text':
+        return 'T'
+    if status == 'garbled':
+        return 'G'
+    if page.get_images(full=False):
+        return 'S'
+    if len(page.read_contents()) >= BLANK_CONTENT_BYTES:
+        return 'V'
+    return 'B'
+
+
+def classify_page(page: fitz.Page) -> Dict[str, Any]:
+    """
+    提取页面文字层并分诊
+
+    Returns:
+        analyze_text_layer的统计字典，另含text（页面文本）、kind（分诊类别）
+        和页面尺寸width/height
+    """
+    text = page.get_text().strip()
+    stats = analyze_text_layer(text, abs(page.rect))
+    stats['text'] = text
+    stats['kind'] = page_kind(page, stats['status'])
+    stats['width'], stats['height'] = page.rect.width, page.rect.height
+    return stats
+
+
+def parse_method(kinds: str) -> str:
+    """根据逐页类别选择整本的解析模式：txt 或 ocr"""
+    content = [k for k in kinds if k != 'B']
+    if not content:
+        return 'ocr'
+    needs_ocr = sum(1 for k in content if k in OCR_PAGE_KINDS)
+    return 'ocr' if needs_ocr / len(content) > OCR_PAGE_RATIO else 'txt'
+
+
+def summarize_kinds(kinds: str, densities: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    汇总逐页类别
+
+    Args:
+        kinds: 逐页类别字符串
+        densities: 逐页文字密度（用于mean_density）
+    """
+    page_count = len(kinds)
+    counts = {name: kinds.count(code) for code, name in PAGE_KINDS.items()}
+    return {
+        'page_count': page_count,
+        'pages': kinds,
+        **{f'{name}_pages': count for name, count in counts.items()},
+        'text_coverage': round(counts['text'] / page_count, 3) if page_count else 0.0,
+        'scanned_ratio': round(counts['scanned'] / page_count, 3) if page_count else 0.0,
+        'mean_density': round(sum(densities) / len(densities), 3) if densities else 0.0,
+        'parse_method': parse_method(kinds)
+    }
+
+
+def sidecar_stem(pdf_path: str) -> str:
+    """分诊目录中的文件名前缀：PDF文件名 + 绝对路径哈希（不同目录下的同名PDF互不覆盖）"""
+    path = os.path.normcase(os.path.realpath(pdf_path))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]}"
+
+
+def triage_path(pdf_path: str, sidecar_dir: str) -> str:
+    """PDF在分诊目录中对应的分诊清单路径"""
+    return os.path.join(sidecar_dir, f"{sidecar_stem(pdf_path)}{TRIAGE_SUFFIX}")
+
+
+def signatures_path(pdf_path: str, sidecar_dir: str) -> str:
+    """PDF在分诊目录中对应的页面签名文件路径"""
+    return os.path.join(sidecar_dir, f"{sidecar_stem(pdf_path)}{MINHASH_SUFFIX}")
+
+
+def _file_info(pdf_path: str) -> Dict[str, Any]:
+    stat = os.stat(pdf_path)
+    return {
+        'source_pdf': os.path.abspath(pdf_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+
+def build_triage(pdf_path: str, kinds: str, densities: Optional[List[float]] = None,
+                 sha256: Optional[str] = None, encrypted: bool = False) -> Dict[str, Any]:
+    """由逐页类别构造分诊记录（Step1全量扫描文字层时顺带生成）"""
+    triage = {'version': TRIAGE_VERSION, 'status': 'ok', 'error': ''}
+    triage.update(_file_info(pdf_path))
+    triage['sha256'] = sha256 or file_sha256(pdf_path)
+    triage.update(summarize_kinds(kinds, densities))
+    triage['encrypted'] = encrypted
+    return triage
+
+
+def triage_pdf(pdf_path: str) -> Dict[str, Any]:
+    """
+    对PDF做一次快速扫描
+
+    Args:
+        pdf_path: PDF路径
+
+    Returns:
+        分诊记录：status（ok/encrypted/corrupt）、error、文件大小和哈希、
+        page_count、pages（逐页类别）、各类页数、text_coverage、scanned_ratio、
+        mean_density、parse_method（txt/ocr）
+    """
+    return _scan_pdf(pdf_path)[0]
+
+
+def _scan_pdf(pdf_path: str):
+    """扫描PDF，返回分诊记录和逐页MinHash签名（文字层正常的页面才有签名）"""
+    signatures = []
+    triage = {'version': TRIAGE_VERSION, 'status': 'ok', 'error': ''}
+    triage.update(_file_info(pdf_path))
+    triage['sha256'] = file_sha256(pdf_path)
+
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        triage.update(status='corrupt', error=str(e))
+        return triage, signatures
+
+    try:
+        if doc.needs_pass:
+            triage.update(status='encrypted', error='需要密码才能打开')
+            return triage, signatures
+
+        kinds, densities = [], []
+        for page in doc:
+            try:
+                stats = classify_page(page)
+            except Exception as e:
+                triage.update(status='corrupt', error=f"第{page.number + 1}页无法解析: {e}")
+                return triage, []
+            kinds.append(stats['kind'])
+            densities.append(stats['density'])
+            signatures.append(minhash_signature(stats['text']) if stats['kind'] == 'T' else None)
+        triage.update(summarize_kinds(''.join(kinds), densities))
+        # 可打开但有权限限制（如禁止复制）的PDF仍可处理，单独标记
+        triage['encrypted'] = bool(doc.is_encrypted or doc.metadata.get('encryption'))
+        return triage, signatures
+    finally:
+        doc.close()
+
+
+def write_triage(triage: Dict[str, Any], path: str):
+    """写出分诊清单"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(triage, f, ensure_ascii=False, indent=2)
+
+
+def load_triage(pdf_path: str, sidecar_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    读取PDF的分诊清单
+
+    清单不存在、版本不符或记录的文件大小/修改时间与PDF不一致时返回None。
+
+    Args:
+        pdf_path: PDF路径
+        sidecar_dir: 分诊目录
+    """
+    path = triage_path(pdf_path, sidecar_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            triage = json.load(f)
+        stat = os.stat(pdf_path)
+    except (OSError, ValueError):
+        return None
+    if triage.get('version') != TRIAGE_VERSION:
+        return None
+    if triage.get('size') != stat.st_size or triage.get('mtime_ns') != stat.st_mtime_ns:
+        return None
+    return triage
+
+
+def derive_triage(triage: Dict[str, Any], pdf_path: str, skip_pages: List[int]) -> Dict[str, Any]:
+    """去掉skip_pages后的PDF（如去目录副本）的分诊记录"""
+    skip = set(skip_pages)
+    kinds = ''.join(k for n, k in enumerate(triage['pages']) if n not in skip)
+    derived = build_triage(pdf_path, kinds, encrypted=triage.get('encrypted', False))
+    derived['mean_density'] = triage.get('mean_density', 0.0)
+    return derived
+
+
+def has_signatures(pdf_path: str, triage: Dict[str, Any], sidecar_dir: str) -> bool:
+    """分诊为ok的PDF是否已有与之对应的页面签名（加密/损坏的PDF不需要签名）"""
+    return (triage['status'] != 'ok'
+            or load_signatures(signatures_path(pdf_path, sidecar_dir), triage['sha256']) is not None)
+
+
+def ensure_triage(pdf_path: str, sidecar_dir: str) -> Dict[str, Any]:
+    """读取分诊目录中的分诊清单，不存在、已过期或缺少页面签名时重新扫描并写出"""
+    triage = load_triage(pdf_path, sidecar_dir)
+    if triage is None or not has_signatures(pdf_path, triage, sidecar_dir):
+        triage, signatures = _scan_pdf(pdf_path)
+        try:
+            os.makedirs(sidecar_dir, exist_ok=True)
+            write_triage(triage, triage_path(pdf_path, sidecar_dir))
+            if triage['status'] == 'ok':
+                write_signatures(signatures_path(pdf_path, sidecar_dir), triage['sha256'], signatures)
+        except OSError as e:
+            logger.warning(f"写出分诊清单失败: {e}")
+    return triage
+
+
+def triage_directory(input_dir: str, sidecar_dir: str) -> Dict[str, Any]:
+    """
+    为目录下的所有PDF生成分诊清单（已是最新的跳过）
+
+    Args:
+        input_dir: PDF目录（只读取）
+        sidecar_dir: 分诊目录，一般为Step1输出基础目录下的triage/
+
+    Returns:
+        汇总：total、scanned（本次扫描数）、各解析模式和异常状态的PDF数
+    """
+    summary = {'total': 0, 'scanned': 0, 'txt': 0, 'ocr': 0, 'encrypted': 0, 'corrupt': 0}
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith('.pdf'):
+            continue
+        pdf_path = os.path.join(input_dir, name)
+        summary['total'] += 1
+        triage = load_triage(pdf_path, sidecar_dir)
+        if triage is None or not has_signatures(pdf_path, triage, sidecar_dir):
+            summary['scanned'] += 1
+            triage = ensure_triage(pdf_path, sidecar_dir)
+        if triage['status'] != 'ok':
+            summary[triage['status']] += 1
+            logger.warning(f"{name}: {triage['status']} - {triage['error']}")
+        else:
+            summary[triage['parse_method']] += 1
+            logger.info(f"{name}: {triage['page_count']}页，文字层覆盖率{triage['text_coverage']:.0%}，"
+                        f"扫描页占比{triage['scanned_ratio']:.0%}，解析模式{triage['parse_method']}")
+    return summary
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else r"/Users/liucun/Desktop/目录页提取代码/USESG/downloaded_pdfs"
+    # 第二个参数为Step1的输出基础目录，分诊清单写在其下的triage/中
+    output_base_dir = sys.argv[2] if len(sys.argv) > 2 else r"/Users/liucun/Desktop/目录页提取代码/processed_pdfs"
+    sidecar_dir = os.path.join(output_base_dir, TRIAGE_DIR_NAME)
+    summary = triage_directory(input_dir, sidecar_dir)
+    print(f"共{summary['total']}个PDF，本次扫描{summary['scanned']}个：文本模式{summary['txt']}个，"
+          f"OCR模式{summary['ocr']}个，加密{summary['encrypted']}个，损坏{summary['corrupt']}个")
+    print(f"分诊清单目录: {sidecar_dir}")
+
+
+if __name__ == "__main__":
+    main()
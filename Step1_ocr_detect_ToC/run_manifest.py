@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理运行清单
+每处理完一个PDF就向JSONL清单追加一行（内容哈希、状态、目录页、输出路径），
+中断后重跑时跳过内容和配置均未变化且已成功的PDF
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ocr_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class RunManifest:
+    """追加写入的逐PDF处理清单（同一文件的多条记录以最后一条为准）"""
+
+    def __init__(self, manifest_path: str):
+        """
+        Args:
+            manifest_path: 清单文件路径（JSONL）
+        """
+        self.manifest_path = manifest_path
+        # 文件名 -> 最新记录
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        bad_lines = 0
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    self.records[record['file']] = record
+                except (ValueError, KeyError):
+                    # 中断时可能留下写了一半的最后一行
+                    bad_lines += 1
+        if bad_lines:
+            logger.warning(f"清单中有{bad_lines}行无法解析，已忽略: {self.manifest_path}")
+        logger.info(f"已加载处理清单: {len(self.records)}个文件记录")
+
+    def completed_record(self, pdf_path: str, config_id: str) -> Optional[Dict[str, Any]]:
+        """
+        返回该PDF在相同配置下已成功处理且输出仍在的记录（没有则返回None）
+
+        文件大小和修改时间与记录一致时直接认定内容未变；
+        否则重新计算内容哈希并与记录比较。
+        """
+        record = self.records.get(os.path.basename(pdf_path))
+        if not record or record.get('status') != 'success' or record.get('config') != config_id:
+            return None
+        if not os.path.exists(record.get('output_pdf') or record.get('skip_sidecar') or ''):
+            return None
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        if stat.st_size == record.get('size') and stat.st_mtime_ns == record.get('mtime_ns'):
+            return record
+        if stat.st_size == record.get('size') and file_sha256(pdf_path) == record.get('sha256'):
+            return record
+        return None
+
+    def append(self, pdf_path: str, config_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        追加一条处理记录并立即落盘
+
+        Args:
+            pdf_path: PDF路径
+            config_id: 配置指纹
+            result: 处理结果字典
+
+        Returns:
+            写入的记录
+        """
+        try:
+            stat = os.stat(pdf_path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime_ns = None, None
+
+        sha256 = result.get('sha256')
+        if not sha256:
+            try:
+                sha256 = file_sha256(pdf_path)
+            except OSError:
+                sha256 = ''
+
+        record = {
+            'file': os.path.basename(pdf_path),
+            'sha256': sha256,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'config': config_id,
+            'status': 'success' if result['success'] else 'failed',
+            'toc_pages': result['toc_pages'],
+            'image_paths': result['image_paths'],
+            'output_pdf': result['output_pdf'],
+            'skip_sidecar': result.get('skip_sidecar', ''),
+            'titles_sidecar': result.get('titles_sidecar', ''),
+            'titles_confidence': result.get('titles_confidence', 0.0),
+            'headings_sidecar': result.get('headings_sidecar', ''),
+            'duplicate_of': result.get('duplicate_of', ''),
+            'error': result['error'],
+            'pages_scanned': result.get('pages_scanned', 0),
+            'elapsed': round(result.get('elapsed', 0.0), 2),
+            'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[record['file']] = record
+        return record
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复检测测试
+校验MinHash签名和LSH分桶对近似重复页面的召回、对无关页面的区分、超大分桶的跳过，
+以及由分诊目录中的签名文件得到的报告级结果
+"""
+
+import os
+import random
+
+import fitz  # PyMuPDF
+import numpy as np
+import pytest
+
+from minhash import NUM_PERM, load_signatures, minhash_signature, signature_similarity, write_signatures
+from near_duplicates import LSHIndex, PAGE_SIMILARITY, find_near_duplicates
+from pdf_triage import signatures_path, triage_directory
+
+WORDS = ("emissions energy water waste governance board audit risk climate carbon supply chain "
+         "employees safety training community diversity ethics compliance disclosure target "
+         "scope renewable biodiversity packaging recycling investment stakeholder materiality").split()
+
+
+def random_page(rng, words=220):
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 99)) for _ in range(words))
+
+
+def edit_page(rng, text, edits=3):
+    """改动少量单词，模拟更换页眉、修正数字后的重发版本"""
+    tokens = text.split()
+    for _ in range(edits):
+        tokens[rng.randrange(len(tokens))] = rng.choice(WORDS) + str(rng.randint(0, 99))
+    return " ".join(tokens)
+
+
+def test_short_page_has_no_signature():
+    assert minhash_signature("目录") is None
+    assert minhash_signature(" \n ") is None
+
+
+def test_signature_is_deterministic():
+    text = random_page(random.Random(1))
+    sig = minhash_signature(text)
+    assert sig.shape == (NUM_PERM,) and sig.dtype == np.uint32
+    assert np.array_equal(sig, minhash_signature(text))
+    # 空白和大小写不影响签名
+    assert np.array_equal(sig, minhash_signature(text.upper().replace(" ", "\n ")))
+
+
+def test_lsh_recall_on_near_duplicates():
+    rng = random.Random(7)
+    originals = [random_page(rng) for _ in range(40)]
+    edited = [edit_page(rng, text) for text in originals]
+
+    index = LSHIndex()
+    for n, text in enumerate(originals):
+        index.add(('a', n), minhash_signature(text))
+    for n, text in enumerate(edited):
+        index.add(('b', n), minhash_signature(text))
+    pairs = index.candidate_pairs()
+
+    found = sum((('a', n), ('b', n)) in pairs for n in range(len(originals)))
+    assert found == len(originals)
+    # 无关页面之间估计相似度很低，几乎不成为候选
+    unrelated = [p for p in pairs if p[0][1] != p[1][1]]
+    assert len(unrelated) <= len(originals)
+    for n in range(len(originals)):
+        assert signature_similarity(minhash_signature(originals[n]),
+                                    minhash_signature(edited[n])) >= PAGE_SIMILARITY
+
+
+def test_oversized_bucket_is_skipped():
+    signature = minhash_signature(random_page(random.Random(3)))
+    index = LSHIndex(max_bucket_size=10)
+    for n in range(11):
+        index.add(n, signature)
+    assert index.candidate_pairs() == set()
+    assert index.skipped_buckets == index.bands
+
+    index = LSHIndex(max_bucket_size=10)
+    for n in range(10):
+        index.add(n, signature)
+    # 同一对在所有段中相遇，只保留一次
+    assert len(index.candidate_pairs()) == 10 * 9 // 2
+    assert index.skipped_buckets == 0
+
+
+def test_signature_file_round_trip(tmp_path):
+    rng = random.Random(5)
+    signatures = [minhash_signature(random_page(rng)), None, minhash_signature(random_page(rng))]
+    path = str(tmp_path / "x_minhash.npz")
+    write_signatures(path, "abc", signatures)
+    loaded = load_signatures(path, "abc")
+    assert sorted(loaded) == [0, 2]
+    assert np.array_equal(loaded[2], signatures[2])
+    assert load_signatures(path, "other") is None
+    assert load_signatures(str(tmp_path / "missing.npz"), "abc") is None
+
+
+def _write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+
+@pytest.fixture
+def report_dir(tmp_path):
+    rng = random.Random(11)
+    shared = [random_page(rng, 150) for _ in range(4)]
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    _write_pdf(input_dir / "report.pdf", shared)
+    # 更换封面、删去最后一页的重发版本
+    _write_pdf(input_dir / "report_v2.pdf", [random_page(rng, 150)] + [edit_page(rng, t, 2) for t in shared[:3]])
+    _write_pdf(input_dir / "other.pdf", [random_page(rng, 150) for _ in range(3)])
+    return input_dir, tmp_path / "output" / "triage"
+
+
+def test_find_near_duplicate_reports(report_dir):
+    input_dir, sidecar_dir = report_dir
+    summary = triage_directory(str(input_dir), str(sidecar_dir))
+    assert summary['txt'] == 3
+    # 签名写在分诊目录，不写在输入目录
+    assert sorted(p.name for p in input_dir.iterdir()) == ["other.pdf", "report.pdf", "report_v2.pdf"]
+    assert os.path.exists(signatures_path(str(input_dir / "report.pdf"), str(sidecar_dir)))
+
+    pdf_paths = [str(input_dir / name) for name in ("report.pdf", "report_v2.pdf", "other.pdf")]
+    result = find_near_duplicates(pdf_paths, str(sidecar_dir))
+    assert result['documents'] == 3
+    assert [{r['a'], r['b']} for r in result['reports']] == [{"report.pdf", "report_v2.pdf"}]
+    assert result['reports'][0]['shared_pages'] == 3
+    assert result['pages']['report_v2.pdf']['1'][:2] == ["report.pdf", 0]
+    assert "other.pdf" not in result['pages']
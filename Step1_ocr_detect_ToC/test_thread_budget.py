@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU线程预算测试
+校验预算来源的优先级、按工作进程平均分配和线程数环境变量
+"""
+
+import os
+
+import pytest
+
+import thread_budget
+from thread_budget import (CPU_BUDGET_ENV, THREAD_ENV_VARS, apply_thread_budget, cpu_budget,
+                           threads_per_worker, utilization)
+
+
+def test_budget_priority(monkeypatch):
+    monkeypatch.setenv(CPU_BUDGET_ENV, "6")
+    assert cpu_budget(3) == 3
+    assert cpu_budget() == 6
+    monkeypatch.setenv(CPU_BUDGET_ENV, "abc")
+    assert cpu_budget() == thread_budget.available_cores()
+    monkeypatch.delenv(CPU_BUDGET_ENV)
+    assert cpu_budget() == thread_budget.available_cores()
+
+
+@pytest.mark.parametrize("workers, budget, expected", [(4, 16, 4), (3, 8, 2), (8, 4, 1), (0, 4, 4)])
+def test_threads_per_worker(workers, budget, expected):
+    assert threads_per_worker(workers, budget) == expected
+
+
+def test_apply_thread_budget_sets_env(monkeypatch):
+    for name in THREAD_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+    assert apply_thread_budget(0) == 1
+    assert apply_thread_budget(3) == 3
+    assert all(os.environ[name] == "3" for name in THREAD_ENV_VARS)
+
+
+def test_utilization():
+    assert utilization(4.0, 2.0, 2) == 1.0
+    assert utilization(1.0, 2.0, 2) == 0.25
+    assert utilization(1.0, 0.0, 2) == 0.0
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文字层目录解析测试
+用PyMuPDF生成版式已知的目录页，校验解析出的标题层级、印刷页码（page键）和置信度
+"""
+
+import json
+
+import fitz  # PyMuPDF
+import pytest
+
+from optimized_ocr import TOCDetector
+from toc_parser import TOC_PARSER_VERSION, TOCTextParser, titles_sidecar_path, write_titles_sidecar
+
+
+@pytest.fixture(scope="module")
+def parser():
+    detector = TOCDetector()
+    return TOCTextParser(detector.item_patterns, detector.page_patterns)
+
+
+@pytest.fixture
+def page():
+    doc = fitz.open()
+    yield doc.new_page()
+    doc.close()
+
+
+def test_levels_from_font_size(parser, page):
+    page.insert_text((72, 60), "CONTENTS", fontsize=20, fontname="hebo")
+    rows = [(1, "About this Report", 3), (2, "Reporting Scope", 4), (2, "Stakeholder Engagement", 6),
+            (1, "Environment", 10), (2, "Climate Change", 12), (1, "Governance", 20)]
+    y = 100
+    for level, title, number in rows:
+        page.insert_text((72, y), title, fontsize=14 if level == 1 else 10, fontname="hebo" if level == 1 else "helv")
+        # 页码单独成段，并入同一行的标题
+        page.insert_text((480, y), str(number), fontsize=10)
+        y += 24
+
+    parsed = parser.parse(page)
+    assert parsed['entries'] == 6
+    assert parsed['titles'] == [
+        {"title": "About this Report", "page": 3, "subtitles": [
+            {"title": "Reporting Scope", "page": 4},
+            {"title": "Stakeholder Engagement", "page": 6}]},
+        {"title": "Environment", "page": 10, "subtitles": [{"title": "Climate Change", "page": 12}]},
+        {"title": "Governance", "page": 20},
+    ]
+    assert parsed['confidence'] >= 0.8
+
+
+def test_levels_from_indent_with_leaders(parser, page):
+    rows = [(1, "关于本报告", 3), (2, "报告范围", 4), (3, "数据来源", 5), (1, "环境", 10), (2, "应对气候变化", 12)]
+    y = 100
+    for level, title, number in rows:
+        page.insert_text((72 + 20 * (level - 1), y), f"{title} ........ {number}", fontsize=11, fontname="china-s")
+        y += 22
+
+    parsed = parser.parse(page)
+    assert parsed['titles'] == [
+        {"title": "关于本报告", "page": 3, "subtitles": [
+            {"title": "报告范围", "page": 4, "subtitles": ["数据来源"]}]},
+        {"title": "环境", "page": 10, "subtitles": [{"title": "应对气候变化", "page": 12}]},
+    ]
+
+
+def test_leading_page_numbers_and_missing_numbers(parser, page):
+    y = 100
+    for text in ("03 关于我们", "08 可持续发展战略", "15 环境绩效", "附录"):
+        page.insert_text((72, y), text, fontsize=12, fontname="china-s")
+        y += 24
+
+    titles = parser.parse(page)['titles']
+    assert [t['title'] for t in titles] == ["关于我们", "可持续发展战略", "环境绩效", "附录"]
+    assert [t.get('page') for t in titles] == [3, 8, 15, None]
+    # 未识别页码时不写page键
+    assert 'page' not in titles[-1]
+
+
+def test_bilingual_entries_keep_chinese(parser, page):
+    y = 100
+    for cn, en, number in (("公司治理", "Corporate Governance", 5), ("环境保护", "Environmental Protection", 12),
+                           ("社会责任", "Social Responsibility", 20)):
+        page.insert_text((72, y), cn, fontsize=12, fontname="china-s")
+        page.insert_text((480, y), str(number), fontsize=12)
+        page.insert_text((72, y + 14), en, fontsize=8)
+        y += 36
+
+    parsed = parser.parse(page)
+    assert [t['title'] for t in parsed['titles']] == ["公司治理", "环境保护", "社会责任"]
+    assert [t['page'] for t in parsed['titles']] == [5, 12, 20]
+
+
+def test_two_columns_read_left_then_right(parser, page):
+    y = 100
+    for left, right in ((("Overview", 2), ("Social", 30)), (("Strategy", 8), ("Governance", 41)),
+                        (("Environment", 15), ("Appendix", 55))):
+        page.insert_text((50, y), f"{left[0]} {left[1]}", fontsize=12)
+        page.insert_text((320, y), f"{right[0]} {right[1]}", fontsize=12)
+        y += 24
+
+    titles = parser.parse(page)['titles']
+    assert [t['title'] for t in titles] == ["Overview", "Strategy", "Environment", "Social", "Governance", "Appendix"]
+    assert [t['page'] for t in titles] == [2, 8, 15, 30, 41, 55]
+
+
+def test_prose_page_has_low_confidence(parser, page):
+    page.insert_textbox(fitz.Rect(72, 72, 520, 700),
+                        "The company continued to strengthen its environmental management system during "
+                        "the reporting period, with particular attention to energy efficiency and emissions "
+                        "reduction across all operating sites. " * 6, fontsize=10)
+    parsed = parser.parse(page)
+    assert parsed['confidence'] < 0.5
+
+
+def test_empty_page(parser, page):
+    assert parser.parse(page) == {'titles': [], 'confidence': 0.0, 'entries': 0}
+
+
+def test_titles_sidecar(parser, page, tmp_path):
+    y = 100
+    for title, number in (("Introduction", 1), ("Environment", 9), ("Social", 17)):
+        page.insert_text((72, y), f"{title} .......... {number}", fontsize=12)
+        y += 24
+    parsed = parser.parse(page)
+
+    path = titles_sidecar_path(str(tmp_path / "toc_page_2.jpg"))
+    assert path.endswith("toc_page_2_titles.json")
+    write_titles_sidecar(parsed, path, 2, "report.pdf")
+    with open(path, encoding='utf-8') as f:
+        payload = json.load(f)
+    assert payload['version'] == TOC_PARSER_VERSION == 2
+    assert payload['source'] == 'text_layer' and payload['toc_page'] == 2
+    assert payload['confidence'] == parsed['confidence']
+    assert [(t['title'], t['page']) for t in payload['titles']] == [("Introduction", 1), ("Environment", 9),
+                                                                    ("Social", 17)]
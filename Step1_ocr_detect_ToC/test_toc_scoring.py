@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录页评分引擎测试
+以benchmark_toc_scoring中保留的原逐行多正则实现为参照，校验评分引擎的判定结果与之一致
+"""
+
+import pytest
+
+from benchmark_toc_scoring import LegacyTOCDetector, synthetic_pages
+from optimized_ocr import TOCDetector
+from toc_scoring import KeywordAutomaton
+
+# 手写的边界情况：空白行、全角/特殊字符、关键词重叠、非目录关键词、行首空白等
+EDGE_CASES = [
+    "",
+    "   \n\n  \t",
+    "目录",
+    "CONTENTS",
+    "Table of Contents\n1 Introduction 3\n2 Governance 9",
+    "1. 公司概况 ........ 3\n2. 环境保护 ........ 12\n3. 社会责任 ........ 25\n4. 公司治理 ........ 40",
+    "1 公司概况 3\n2 环境保护 12\n3 社会责任 25\n4 公司治理 40\n5 附录 52",
+    "  1.1 董事会  ......5\n  1.2 风险管理  ......8\n  2.1 排放 ......11\n  2.2 能源......14",
+    "本年度报告期内公司业绩良好\n1. 营业收入 3\n2. 净利润 5\n3. 现金流 7\n4. 资产 9\n5. 负债 11",
+    "第一章 总则\n第二章 环境\n第三章 社会\n第四章 治理\n第五节 附錄\n参考文献",
+    "Chapter 1\nSection 2\nPart 3\nAppendix\nReferences\nchaptersection",
+    "İstanbul 1. Giriş 3\n2. Yönetim 5\n3. Çevre 7\n4. Sosyal 9",
+    "1-2 3-4 5-6\n7.8 9.10\n11-12\n13.14\n15-16\n17.18\n19-20\n21.22",
+    "…………\n……… 5\n......\n.... 9\n... 11",
+    "环境 社会 治理\n员工 排放 能源\n供应链 社区",
+]
+
+
+@pytest.fixture(scope="module")
+def detectors():
+    detector = TOCDetector()
+    return detector, LegacyTOCDetector(detector)
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_cases_match_legacy(detectors, text):
+    detector, legacy = detectors
+    assert detector.is_toc_page(text) == legacy.is_toc_page(text)
+
+
+def test_synthetic_pages_match_legacy(detectors):
+    detector, legacy = detectors
+    pages = synthetic_pages(500, seed=7)
+    mismatches = [i for i, text in enumerate(pages) if detector.is_toc_page(text) != legacy.is_toc_page(text)]
+    assert mismatches == []
+    # 合成页面中两类判定都应出现，否则对比没有意义
+    verdicts = {legacy.is_toc_page(text) for text in pages}
+    assert verdicts == {True, False}
+
+
+def test_confidence_range(detectors):
+    detector, _ = detectors
+    for text in EDGE_CASES + synthetic_pages(100, seed=3):
+        score = detector.score(text)
+        assert 0.0 <= score.confidence <= 1.0
+        if not text.strip():
+            assert not score.is_toc and score.confidence == 0.0
+
+
+def test_keyword_automaton_reports_overlapping_keywords():
+    automaton = KeywordAutomaton({'a': ['contents', 'table of contents'], 'b': ['tents']})
+    hits = automaton.scan("table of contents")
+    categories = set().union(*(cats for _, cats in hits))
+    assert categories == {'a', 'b'}
+    assert hits[0][0] == 0
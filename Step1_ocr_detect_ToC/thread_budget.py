@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU线程预算
+PaddleOCR、magic_pdf使用的torch、Tesseract默认都按全部核心创建线程池，多个工作进程同时运行时
+会严重超额订阅。按总核心预算为每个工作进程分配固定的算子内线程数：在库加载前通过环境变量
+（OMP/MKL/OpenBLAS，Tesseract读取OMP_THREAD_LIMIT）生效，torch已导入时同时调用set_num_threads；
+并按进程CPU时间统计实际利用率。
+本模块只在Step1目录保存一份（各阶段是独立目录，没有共同的包）：Step2的run_parallel_layout.py
+和预处理模块的processors.py把Step1目录加入sys.path后导入。
+"""
+
+import os
+import sys
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 总核心预算的环境变量（未设置时使用本进程可用的全部核心）
+CPU_BUDGET_ENV = "ESG_CPU_BUDGET"
+# 各数值库和Tesseract读取的线程数环境变量
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'OMP_THREAD_LIMIT',
+)
+
+
+def available_cores() -> int:
+    """本进程可用的核心数（考虑CPU亲和性）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def cpu_budget(budget: Optional[int] = None) -> int:
+    """总核心预算：显式指定 > 环境变量ESG_CPU_BUDGET > 可用核心数"""
+    if budget:
+        return max(1, int(budget))
+    try:
+        value = int(os.environ.get(CPU_BUDGET_ENV, 0))
+    except ValueError:
+        logger.warning(f"{CPU_BUDGET_ENV}不是整数，使用全部可用核心")
+        value = 0
+    return value if value > 0 else available_cores()
+
+
+def threads_per_worker(num_workers: int, budget: Optional[int] = None) -> int:
+    """每个工作进程的算子内线程数（总预算平均分配，至少1个）"""
+    return max(1, cpu_budget(budget) // max(num_workers, 1))
+
+
+def apply_thread_budget(threads: int) -> int:
+    """
+    在当前进程中限制算子内线程数
+
+    环境变量只对之后加载的库生效（子进程继承），因此应在导入模型库之前调用；
+    torch、OpenCV已导入时直接设置其线程数。
+
+    Returns:
+        实际设置的线程数
+    """
+    threads = max(1, int(threads))
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(threads)
+    cv2 = sys.modules.get('cv2')
+    if cv2 is not None:
+        cv2.setNumThreads(threads)
+    return threads
+
+
+def process_cpu_seconds() -> float:
+    """当前进程累计的CPU时间（含已结束的子进程，如Tesseract）"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class CPUMeter:
+    """统计一段时间内本进程的CPU时间和利用率"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._cpu_start = process_cpu_seconds()
+
+    def snapshot(self, threads: int) -> Dict[str, float]:
+        """
+        Args:
+            threads: 分配给本进程的线程数（利用率的分母）
+
+        Returns:
+            字典：wall_seconds、cpu_seconds、utilization（CPU时间 / (墙钟时间 * 线程数)）
+        """
+        wall = time.time() - self.started
+        cpu = process_cpu_seconds() - self._cpu_start
+        return {
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round(cpu, 3),
+            'utilization': utilization(cpu, wall, threads)
+        }
+
+
+def utilization(cpu_seconds: float, wall_seconds: float, cores: int) -> float:
+    """CPU利用率：CPU时间 / (墙钟时间 * 核心数)"""
+    if wall_seconds <= 0 or cores <= 0:
+        return 0.0
+    return round(cpu_seconds / (wall_seconds * cores), 3)
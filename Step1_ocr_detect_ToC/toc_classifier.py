@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量目录页分类器（可选）
+基于文字层和页面几何特征的逻辑回归，只依赖NumPy。规则评分漏判的目录页
+（版式特殊、页码单独成行等）可由分类器补判，减少评分窗口内的OCR回退。
+
+训练样本为JSONL，每行一个PDF：{"pdf": "路径", "toc_pages": [3]}（页码从1开始，
+可选 "pages" 指定评分窗口，默认15页），窗口内其余有文字层的页面作为负样本：
+
+    python toc_classifier.py train labels.jsonl --output toc_classifier.json
+    python toc_classifier.py evaluate labels.jsonl --model toc_classifier.json
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import hashlib
+import argparse
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from toc_scoring import TOCScore
+
+logger = logging.getLogger(__name__)
+
+# 默认模型文件（与本模块同目录）；不存在时只使用规则评分
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "toc_classifier.json")
+MODEL_VERSION = 1
+
+# 训练样本默认评分窗口
+DEFAULT_LABEL_PAGES = 15
+
+FEATURE_NAMES = (
+    'log_lines',            # 非空行数（对数）
+    'indicator_density',    # 规则特征分 / 行数
+    'page_number_ratio',    # 引导符+页码结尾的行占比
+    'item_ratio',           # 目录项编号格式的行占比
+    'keyword_strong',       # 命中强目录关键词
+    'keyword_weak',         # 命中弱目录关键词
+    'excluded',             # 含非目录内容关键词
+    'rule_confidence',      # 规则评分置信度
+    'number_line_ratio',    # 只有页码的行占比（右对齐页码被抽成单独的行）
+    'trailing_number_ratio',  # 以页码结尾的行占比（不要求引导符）
+    'ascending_numbers',    # 页码序列中非递减的相邻对占比
+    'short_line_ratio',     # 短行（不超过20个字符）占比
+    'mean_line_length',     # 平均行长（/50，上限4）
+    'log_density',          # 文字密度（对数）
+    'aspect_ratio',         # 页面宽高比（跨页排版的目录多为横版）
+    'log_page',             # 页码（对数，目录页一般靠前）
+)
+
+_LINE_RE = re.compile(r'[^\n]*\S[^\n]*')
+_NUMBER_LINE_RE = re.compile(r'^\s*(\d{1,3})\s*$')
+_TRAILING_NUMBER_RE = re.compile(r'\D[\s.·…_-]*(\d{1,3})\s*$')
+
+
+def page_features(text: str, score: TOCScore, stats: Dict[str, Any], page_num: int) -> np.ndarray:
+    """
+    单页特征向量（顺序见FEATURE_NAMES）
+
+    Args:
+        text: 页面文本（文字层或OCR结果）
+        score: 规则评分结果
+        stats: 文字层统计（density，及可选的width/height）
+        page_num: 页码（从0开始）
+    """
+    lines = _LINE_RE.findall(text)
+    n = max(len(lines), 1)
+
+    numbers = []
+    number_lines = trailing_lines = 0
+    for line in lines:
+        m = _NUMBER_LINE_RE.match(line)
+        if m:
+            number_lines += 1
+            numbers.append(int(m.group(1)))
+            continue
+        m = _TRAILING_NUMBER_RE.search(line)
+        if m:
+            trailing_lines += 1
+            numbers.append(int(m.group(1)))
+    ascending = 0.0
+    if len(numbers) >= 3:
+        ascending = sum(1 for a, b in zip(numbers, numbers[1:]) if b >= a) / (len(numbers) - 1)
+
+    width, height = stats.get('width', 0.0), stats.get('height', 0.0)
+    return np.array([
+        math.log1p(score.lines),
+        score.indicators / n,
+        score.page_number_lines / n,
+        score.item_lines / n,
+        float(score.keyword == 'strong'),
+        float(score.keyword == 'weak'),
+        float(score.excluded),
+        score.confidence,
+        number_lines / n,
+        (number_lines + trailing_lines) / n,
+        ascending,
+        sum(1 for line in lines if len(line.strip()) <= 20) / n,
+        min(4.0, sum(len(line.strip()) for line in lines) / n / 50),
+        math.log1p(stats.get('density', 0.0)),
+        width / height if height else 0.0,
+        math.log1p(page_num),
+    ], dtype=np.float64)
+
+
+class TOCClassifier:
+    """标准化特征上的逻辑回归（NumPy实现，牛顿法训练）"""
+
+    def __init__(self, weights: np.ndarray, bias: float, mean: np.ndarray, std: np.ndarray,
+                 threshold: float = 0.5, meta: Optional[Dict[str, Any]] = None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.threshold = float(threshold)
+        self.meta = meta or {}
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        一次计算多页的目录页概率
+
+        Args:
+            features: (页数, 特征数) 矩阵
+
+        Returns:
+            长度为页数的概率数组
+        """
+        features = np.atleast_2d(features)
+        if features.shape[0] == 0:
+            return np.zeros(0)
+        logits = ((features - self.mean) / self.std) @ self.weights + self.bias
+        return 1.0 / (1.0 + np.exp(-np.clip(logits, -30, 30)))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self.predict_proba(features) >= self.threshold
+
+    @classmethod
+    def fit(cls, features: np.ndarray, labels: np.ndarray, l2: float = 1.0,
+            iterations: int = 50) -> 'TOCClassifier':
+        """
+        训练（类别加权，使正负样本总权重相等；阈值取训练集F1最高处）
+
+        Args:
+            features: (样本数, 特征数) 矩阵
+            labels: 0/1标签
+            l2: L2正则系数
+            iterations: 牛顿迭代上限
+        """
+        labels = np.asarray(labels, dtype=np.float64)
+        positives = labels.sum()
+        if positives == 0 or positives == len(labels):
+            raise ValueError("训练样本需同时包含目录页和非目录页")
+
+        mean = features.mean(axis=0)
+        std = features.std(axis=0)
+        std[std < 1e-9] = 1.0
+        x = np.hstack([(features - mean) / std, np.ones((len(features), 1))])
+        sample_weight = np.where(labels > 0, len(labels) / (2 * positives),
+                                 len(labels) / (2 * (len(labels) - positives)))
+        penalty = np.full(x.shape[1], l2)
+        penalty[-1] = 0.0  # 偏置不做正则
+
+        beta = np.zeros(x.shape[1])
+        for _ in range(iterations):
+            p = 1.0 / (1.0 + np.exp(-np.clip(x @ beta, -30, 30)))
+            gradient = x.T @ (sample_weight * (p - labels)) + penalty * beta
+            hessian = (x * (sample_weight * p * (1 - p))[:, None]).T @ x + np.diag(penalty + 1e-9)
+            step = np.linalg.solve(hessian, gradient)
+            beta -= step
+            if np.abs(step).max() < 1e-6:
+                break
+
+        model = cls(beta[:-1], beta[-1], mean, std)
+        probs = model.predict_proba(features)
+        model.threshold = _best_threshold(probs, labels)
+        model.meta = {'samples': int(len(labels)), 'positives': int(positives), 'l2': l2}
+        return model
+
+    @property
+    def fingerprint(self) -> str:
+        """模型参数指纹（写入处理配置指纹，模型更新后清单记录不再复用）"""
+        payload = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': MODEL_VERSION,
+            'features': list(FEATURE_NAMES),
+            'weights': [round(float(w), 6) for w in self.weights],
+            'bias': round(self.bias, 6),
+            'mean': [round(float(m), 6) for m in self.mean],
+            'std': [round(float(s), 6) for s in self.std],
+            'threshold': round(self.threshold, 4),
+            'meta': self.meta
+        }
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'TOCClassifier':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != MODEL_VERSION or data.get('features') != list(FEATURE_NAMES):
+            raise ValueError(f"模型文件版本或特征与当前代码不一致: {path}")
+        return cls(data['weights'], data['bias'], data['mean'], data['std'],
+                   data.get('threshold', 0.5), data.get('meta'))
+
+
+def load_classifier(path: Optional[str] = DEFAULT_MODEL_PATH) -> Optional[TOCClassifier]:
+    """读取模型；路径为空或文件不存在时返回None（只使用规则评分）"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return TOCClassifier.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"加载目录页分类器失败，只使用规则评分: {e}")
+        return None
+
+
+def _best_threshold(probs: np.ndarray, labels: np.ndarray) -> float:
+    """F1最高的判定阈值（F1相同时取最接近0.5的）"""
+    best, best_f1 = 0.5, -1.0
+    for threshold in np.linspace(0.2, 0.9, 71):
+        predicted = probs >= threshold
+        tp = np.count_nonzero(predicted & (labels > 0))
+        precision = tp / max(np.count_nonzero(predicted), 1)
+        recall = tp / max(np.count_nonzero(labels > 0), 1)
+        f1 = 2 * precision * recall / (precision + recall) if tp else 0.0
+        if f1 > best_f1 or (f1 == best_f1 and abs(threshold - 0.5) < abs(best - 0.5)):
+            best, best_f1 = float(threshold), f1
+    return best
+
+
+# ==================== 训练样本 ====================
+
+def _load_labels(path: str) -> List[Dict[str, Any]]:
+    samples = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            if 'pdf' not in sample:
+                raise ValueError(f"第{line_no}行缺少pdf字段")
+            samples.append(sample)
+    return samples
+
+
+def extract_samples(label_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Tuple[str, int]]]:
+    """
+    从标注的PDF中提取特征
+
+    Returns:
+        (特征矩阵, 标签, 规则判定, (PDF, 页码)列表)；只包含有文字层的页面
+    """
+    import fitz
+    from optimized_ocr import TOCDetector
+    from pdf_triage import classify_page
+
+    detector = TOCDetector()
+    base_dir = os.path.dirname(os.path.abspath(label_path))
+    rows, labels, rule_hits, keys = [], [], [], []
+    for sample in _load_labels(label_path):
+        pdf_path = sample['pdf'] if os.path.isabs(sample['pdf']) else os.path.join(base_dir, sample['pdf'])
+        toc_pages = {p - 1 for p in sample.get('toc_pages', [])}
+        try:
+            doc = fitz.open(pdf_path)
+        except Exception as e:
+            logger.warning(f"无法打开，跳过: {pdf_path} - {e}")
+            continue
+        try:
+            for page_num in range(min(sample.get('pages', DEFAULT_LABEL_PAGES), doc.page_count)):
+                stats = classify_page(doc.load_page(page_num))
+                if stats['kind'] not in ('T', 'G'):
+                    continue
+                score = detector.score(stats['text'])
+                rows.append(page_features(stats['text'], score, stats, page_num))
+                labels.append(int(page_num in toc_pages))
+                rule_hits.append(score.is_toc)
+                keys.append((pdf_path, page_num))
+        finally:
+            doc.close()
+
+    if not rows:
+        return np.zeros((0, len(FEATURE_NAMES))), np.zeros(0), np.zeros(0, dtype=bool), keys
+    return np.vstack(rows), np.array(labels), np.array(rule_hits), keys
+
+
+def _metrics(predicted: np.ndarray, labels: np.ndarray, keys: Sequence[Tuple[str, int]]) -> Dict[str, Any]:
+    """页级精确率/召回率，以及评分窗口内没有任何命中（需OCR回退）的PDF数"""
+    positive = labels > 0
+    tp = int(np.count_nonzero(predicted & positive))
+    hit_docs = {keys[i][0] for i in np.flatnonzero(predicted)}
+    return {
+        'precision': round(tp / max(np.count_nonzero(predicted), 1), 3),
+        'recall': round(tp / max(np.count_nonzero(positive), 1), 3),
+        'missed_toc_pages': int(np.count_nonzero(positive & ~predicted)),
+        'fallback_pdfs': len({key[0] for key in keys} - hit_docs)
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="目录页分类器训练与评估")
+    sub = parser.add_subparsers(dest='command', required=True)
+    train = sub.add_parser('train', help="在标注样本上训练")
+    train.add_argument('labels', help="标注JSONL")
+    train.add_argument('--output', default=DEFAULT_MODEL_PATH, help="模型输出路径")
+    train.add_argument('--l2', type=float, default=1.0, help="L2正则系数")
+    evaluate = sub.add_parser('evaluate', help="对比规则评分与分类器")
+    evaluate.add_argument('labels', help="标注JSONL")
+    evaluate.add_argument('--model', default=DEFAULT_MODEL_PATH, help="模型路径")
+    args = parser.parse_args()
+
+    features, labels, rule_hits, keys = extract_samples(args.labels)
+    print(f"样本页数: {len(labels)}（目录页{int(labels.sum())}），PDF数: {len({k[0] for k in keys})}")
+
+    if args.command == 'train':
+        model = TOCClassifier.fit(features, labels, l2=args.l2)
+        model.save(args.output)
+        print(f"模型已保存: {args.output}（判定阈值{model.threshold:.2f}）")
+    else:
+        model = TOCClassifier.load(args.model)
+
+    model_hits = model.predict(features)
+    for name, predicted in (('规则评分', rule_hits), ('分类器', model_hits), ('规则或分类器', rule_hits | model_hits)):
+        m = _metrics(predicted, labels, keys)
+        print(f"{name}: 精确率{m['precision']:.3f}, 召回率{m['recall']:.3f}, "
+              f"漏判目录页{m['missed_toc_pages']}, 需OCR回退的PDF {m['fallback_pdfs']}")
+    if args.command == 'evaluate' and model.meta:
+        print(f"模型训练样本: {model.meta}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
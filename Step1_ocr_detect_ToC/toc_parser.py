@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文字层目录解析
+目录页由文字层命中时，直接用 page.get_text("dict") 的字号、加粗和缩进，
+结合目录项编号模式和页码模式解析出层级标题，写出与VLM提取结果格式相同的标题结构
+（toc_page_N_titles.json，含置信度）。置信度足够高时，结构增强阶段不再调用VLM。
+一、二级条目同时记录目录中印刷的页码（page），对齐阶段据此估计印刷页码与page_idx的偏移并限定搜索范围。
+"""
+
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 标题清单后缀：与目录页图像同名（toc_page_N.jpg -> toc_page_N_titles.json）
+TITLES_SUFFIX = "_titles.json"
+TOC_PARSER_VERSION = 2
+
+# 最多解析的标题层级（titles.json最多三级）
+MAX_LEVELS = 3
+# 同一行判定：两段文字基线的纵向距离（点）
+SAME_ROW_TOLERANCE = 3.0
+# 缩进分组粒度（点）
+INDENT_BUCKET = 8.0
+# 两个目录项的起始横坐标相差超过页面宽度的此比例时视为分栏
+COLUMN_GAP_RATIO = 0.25
+
+# 目录标题行（“目录”“CONTENTS”等）不作为条目
+_HEADING_RE = re.compile(r'^\s*(目\s*录|目\s*錄|目\s*次|contents?|table\s+of\s+contents)\s*$', re.I)
+_NUMBER_ONLY_RE = re.compile(r'^\s*[Pp]?\.?\s*(\d{1,3})\s*$')
+# 行首页码（如“03 关于本报告”）和不带引导符的行尾页码
+_LEADING_NUMBER_RE = re.compile(r'^\s*(\d{1,3})\s+(?=\D)')
+_TRAILING_NUMBER_RE = re.compile(r'(?<=\D)[\s.·…_-]*(\d{1,3})\s*$')
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+# 按编号推断层级：1.1.1 -> 3，1.1 -> 2，（一） -> 2
+_NUMBERING_LEVELS = [
+    (re.compile(r'^\s*\d+\.\d+\.\d+'), 3),
+    (re.compile(r'^\s*\d+\.\d+'), 2),
+    (re.compile(r'^\s*[（(][一二三四五六七八九十]+[）)]'), 2),
+]
+
+
+def titles_sidecar_path(image_path: str) -> str:
+    """目录页图像对应的标题清单路径"""
+    root, _ = os.path.splitext(image_path)
+    return f"{root}{TITLES_SUFFIX}"
+
+
+class TOCTextParser:
+    """基于文字层版式的目录解析器"""
+
+    def __init__(self, item_patterns: List[str], page_patterns: List[str]):
+        """
+        Args:
+            item_patterns: 目录项编号模式（TOCDetector.item_patterns）
+            page_patterns: 页码模式（TOCDetector.page_patterns，以$结尾）
+        """
+        self._item_res = [re.compile(p) for p in item_patterns]
+        self._page_res = [re.compile(r'[\s]*' + p.rstrip('$') + r'\s*$') for p in page_patterns]
+
+    # ---------- 版面 ----------
+
+    @staticmethod
+    def _segments(page) -> List[Dict[str, Any]]:
+        """文字行：文本、左边界、基线、最大字号、是否加粗"""
+        segments = []
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                spans = [s for s in line["spans"] if s["text"].strip()]
+                if not spans:
+                    continue
+                text = ''.join(s["text"] for s in spans).strip()
+                segments.append({
+                    'text': text,
+                    'x0': min(s["bbox"][0] for s in spans),
+                    'y': max(s["bbox"][3] for s in spans),
+                    'size': max(s["size"] for s in spans),
+                    'bold': any(s["flags"] & 16 or 'bold' in s["font"].lower() for s in spans),
+                })
+        return segments
+
+    def _split_page_number(self, text: str) -> Tuple[str, Optional[int]]:
+        """拆出标题和页码（引导符+页码、行尾页码或行首页码）"""
+        for page_re in self._page_res:
+            m = page_re.search(text)
+            if m:
+                number = re.search(r'(\d+)\s*$', m.group())
+                return text[:m.start()].rstrip(' .·…'), int(number.group(1))
+        m = _TRAILING_NUMBER_RE.search(text)
+        if m and re.search(r'[A-Za-z\u4e00-\u9fff]', text[:m.start()]):
+            return text[:m.start()].rstrip(' .·…_-'), int(m.group(1))
+        m = _LEADING_NUMBER_RE.match(text)
+        if m:
+            return text[m.end():].strip(), int(m.group(1))
+        return text.strip(), None
+
+    def _entries(self, page) -> List[Dict[str, Any]]:
+        """
+        目录条目：同一行的单独页码并入相邻标题，按分栏、从上到下排列
+
+        Returns:
+            条目列表：title、page_no、x0、y、size、bold
+        """
+        segments = self._segments(page)
+        segments.sort(key=lambda s: (round(s['y'] / SAME_ROW_TOLERANCE), s['x0']))
+
+        rows: List[List[Dict[str, Any]]] = []
+        for seg in segments:
+            if rows and abs(rows[-1][0]['y'] - seg['y']) <= SAME_ROW_TOLERANCE:
+                rows[-1].append(seg)
+            else:
+                rows.append([seg])
+
+        entries = []
+        for row in rows:
+            row.sort(key=lambda s: s['x0'])
+            row_entries = []
+            pending_number = None
+            for seg in row:
+                number = _NUMBER_ONLY_RE.match(seg['text'])
+                if number:
+                    # 单独的页码：优先补给左侧尚无页码的标题，否则留给右侧的标题（行首页码）
+                    if row_entries and row_entries[-1]['page_no'] is None:
+                        row_entries[-1]['page_no'] = int(number.group(1))
+                    else:
+                        pending_number = int(number.group(1))
+                    continue
+                if _HEADING_RE.match(seg['text']):
+                    continue
+                title, page_no = self._split_page_number(seg['text'])
+                if not title:
+                    continue
+                if page_no is None and pending_number is not None:
+                    page_no = pending_number
+                pending_number = None
+                row_entries.append(dict(seg, title=title, page_no=page_no))
+            entries.extend(row_entries)
+
+        # 分栏：条目起始横坐标出现大的跳跃时，先左栏后右栏
+        width = page.rect.width or 1.0
+        xs = sorted({round(e['x0']) for e in entries})
+        boundaries = [b for a, b in zip(xs, xs[1:]) if b - a > width * COLUMN_GAP_RATIO]
+        for entry in entries:
+            entry['column'] = sum(1 for b in boundaries if entry['x0'] >= b)
+        entries.sort(key=lambda e: (e['column'], e['y'], e['x0']))
+        return entries
+
+    # ---------- 层级 ----------
+
+    def _assign_levels(self, entries: List[Dict[str, Any]]):
+        """按字号和加粗（样式单一时按缩进，再按编号）为条目分配层级1~MAX_LEVELS"""
+        styles = sorted({(round(e['size'] * 2) / 2, e['bold']) for e in entries}, key=lambda s: (-s[0], not s[1]))
+        if len(styles) > 1:
+            rank = {style: i for i, style in enumerate(styles)}
+            for e in entries:
+                e['level'] = rank[(round(e['size'] * 2) / 2, e['bold'])] + 1
+        else:
+            # 缩进相对于所在分栏的最左条目
+            column_left = {}
+            for e in entries:
+                column_left[e['column']] = min(column_left.get(e['column'], e['x0']), e['x0'])
+            indents = sorted({int((e['x0'] - column_left[e['column']]) // INDENT_BUCKET) for e in entries})
+            rank = {indent: i for i, indent in enumerate(indents)}
+            for e in entries:
+                e['level'] = rank[int((e['x0'] - column_left[e['column']]) // INDENT_BUCKET)] + 1
+            if len(indents) == 1:
+                for e in entries:
+                    e['level'] = next((level for pattern, level in _NUMBERING_LEVELS
+                                       if pattern.match(e['title'])), 1)
+        for e in entries:
+            e['level'] = min(e['level'], MAX_LEVELS)
+
+    @staticmethod
+    def _build_tree(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """构造titles.json结构：一、二级为{"title", "page", "subtitles"}（page为印刷页码，未识别时省略），三级为字符串"""
+        titles: List[Dict[str, Any]] = []
+        current_h1 = current_h2 = None
+        for e in entries:
+            level = e['level']
+            node = {"title": e['title']}
+            if e['page_no'] is not None:
+                node["page"] = e['page_no']
+            if level == 1 or current_h1 is None:
+                current_h1 = node
+                titles.append(current_h1)
+                current_h2 = None
+            elif level == 2 or current_h2 is None:
+                current_h2 = node
+                current_h1.setdefault("subtitles", []).append(current_h2)
+            else:
+                current_h2.setdefault("subtitles", []).append(e['title'])
+        return titles
+
+    # ---------- 置信度 ----------
+
+    def _confidence(self, entries: List[Dict[str, Any]], text_lines: int) -> float:
+        """
+        解析置信度：有页码的条目占比、页码递增程度、条目数、标题长度、版式线索
+        """
+        if len(entries) < 3:
+            return 0.0
+        numbers = [e['page_no'] for e in entries if e['page_no'] is not None]
+        numbered = len(numbers) / len(entries)
+        ascending = (sum(1 for a, b in zip(numbers, numbers[1:]) if b >= a) / (len(numbers) - 1)
+                     if len(numbers) > 1 else 0.0)
+        count = min(1.0, len(entries) / 6)
+        mean_length = sum(len(e['title']) for e in entries) / len(entries)
+        concise = 1.0 if mean_length <= 25 else max(0.0, 1 - (mean_length - 25) / 25)
+        # 条目之外的文字行（说明文字、页眉页脚）越多越不可靠
+        coverage = min(1.0, len(entries) / max(text_lines, 1))
+        structured = 1.0 if numbered >= 0.5 or any(p.match(e['title']) for e in entries for p in self._item_res) else 0.5
+
+        confidence = (0.3 * numbered + 0.25 * ascending + 0.15 * count + 0.15 * concise
+                      + 0.15 * coverage) * structured
+        return round(confidence, 3)
+
+    # ---------- 入口 ----------
+
+    def parse(self, page) -> Dict[str, Any]:
+        """
+        解析目录页
+
+        Args:
+            page: fitz页面
+
+        Returns:
+            字典：titles（与titles.json格式一致）、confidence（0~1）、entries（条目数）
+        """
+        entries = self._entries(page)
+        # 中英对照的目录中，英文译名单独成行，中文条目为主时去掉纯英文条目
+        if sum(1 for e in entries if _CJK_RE.search(e['title'])) > len(entries) / 2:
+            entries = [e for e in entries if _CJK_RE.search(e['title'])]
+        if not entries:
+            return {'titles': [], 'confidence': 0.0, 'entries': 0}
+
+        self._assign_levels(entries)
+        text_lines = len([line for line in page.get_text().splitlines() if line.strip()])
+        return {
+            'titles': self._build_tree(entries),
+            'confidence': self._confidence(entries, text_lines),
+            'entries': len(entries)
+        }
+
+
+def write_titles_sidecar(parsed: Dict[str, Any], path: str, toc_page: int, source_pdf: str):
+    """写出标题清单（toc_page为从1开始的页码）"""
+    payload = {
+        'version': TOC_PARSER_VERSION,
+        'source': 'text_layer',
+        'source_pdf': source_pdf,
+        'toc_page': toc_page,
+        'confidence': parsed['confidence'],
+        'titles': parsed['titles']
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
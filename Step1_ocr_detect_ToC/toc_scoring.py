@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录页评分引擎
+预编译的逐行特征正则加关键词自动机，对整页文本做少量C层扫描完成评分，并给出0~1的置信度
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    多关键词匹配自动机（Aho-Corasick风格）
+
+    关键词先构建为字典树，再编译为一个正则表达式，每个位置取最长匹配，
+    并把子串关键词的类别并入，从而一次从左到右扫描即可报告所有
+    （包括重叠的）关键词出现；位置间的跳跃在正则引擎（C层）内完成。
+    """
+
+    def __init__(self, keyword_groups: Dict[str, Iterable[str]]):
+        """
+        Args:
+            keyword_groups: 类别名 -> 关键词列表（关键词按小写匹配）
+        """
+        categories: Dict[str, Set[str]] = {}
+        for category, keywords in keyword_groups.items():
+            for keyword in keywords:
+                categories.setdefault(keyword.lower(), set()).add(category)
+
+        # 每个位置只报告最长的关键词，因此把其子串关键词的类别并入
+        self._categories: Dict[str, frozenset] = {}
+        for keyword in categories:
+            merged = set()
+            for other, other_cats in categories.items():
+                if other in keyword:
+                    merged |= other_cats
+            self._categories[keyword] = frozenset(merged)
+
+        trie: Dict = {}
+        for keyword in categories:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = True
+
+        self._pattern = re.compile(self._compile_trie(trie)) if trie else None
+
+    @classmethod
+    def _compile_trie(cls, node: Dict) -> str:
+        """把字典树编译为正则：子节点在前、终止在后，保证每个位置取最长匹配"""
+        alternatives = [re.escape(ch) + cls._compile_trie(child)
+                        for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        if '' in node:
+            return f'(?:{body})?'
+        return body
+
+    def scan(self, text_lower: str) -> List[Tuple[int, frozenset]]:
+        """
+        扫描已转为小写的文本
+
+        Returns:
+            (起始位置, 命中的类别集合) 列表
+        """
+        hits = []
+        if self._pattern is None:
+            return hits
+
+        # 每次从上一个命中的下一个字符继续，保证重叠的关键词也能被报告
+        search = self._pattern.search
+        m = search(text_lower)
+        while m is not None:
+            hits.append((m.start(), self._categories[m.group()]))
+            m = search(text_lower, m.start() + 1)
+        return hits
+
+
+@dataclass
+class TOCScore:
+    """单页目录评分结果"""
+
+    is_toc: bool = False             # 与原有规则一致的目录页判定
+    confidence: float = 0.0          # 0~1的目录页置信度
+    keyword: str = ''                # 命中的目录关键词类别（strong/weak/''）
+    excluded: bool = False           # 是否包含非目录内容关键词
+    lines: int = 0                   # 非空行数
+    indicators: int = 0              # 目录特征分数
+    page_number_lines: int = 0       # 以引导符+页码结尾的行数
+    item_lines: int = 0              # 目录项编号格式的行数
+
+
+class TOCScoringEngine:
+    """
+    预编译的目录页评分引擎
+
+    每个逐行特征编译为一个多行模式正则，对整页文本各做一次扫描，
+    命中位置再按行归属去重；关键词由KeywordAutomaton一次扫描全文得到。
+    """
+
+    # 逐行特征 -> (正则, 特征分, 前置子串)；\s 统一替换为不跨行的 [^\S\n]，
+    # ^/$ 两侧允许空白，等价于原先对strip()后的单行匹配。
+    # 页面中不含任何前置子串时直接跳过该特征的正则扫描
+    LINE_FEATURES = {
+        'numbered': (r'^\s*\d+\.?\s+[A-Za-z\u4e00-\u9fff]', 2, None),
+        'leader_page': (r'\.{3,}\s*\d+\s*$', 2, ('...',)),
+        'leader': (r'\.{3,}|…{3,}', 1, ('...', '…')),
+        'num_range': (r'\d+[.-]\d+', 1, None),
+        'toc_line': (r'^\s*\d+\s+[A-Za-z\u4e00-\u9fff].*\s\d+\s*$', 2, None),
+    }
+    CHAPTER_WEIGHT = 1
+
+    def __init__(self, toc_keywords: Dict[str, List[str]], chapter_keywords: List[str],
+                 non_toc_keywords: List[str], strong_keywords: List[str],
+                 item_patterns: List[str], page_patterns: List[str]):
+        """
+        Args:
+            toc_keywords: 目录关键词（按语言分组），出现即判定为目录页
+            chapter_keywords: 章节关键词，按行计分
+            non_toc_keywords: 非目录内容关键词
+            strong_keywords: toc_keywords中可信度高的关键词（如“目录”“contents”）
+            item_patterns: 目录项编号模式（以^开头的单行正则）
+            page_patterns: 页码模式（以$结尾的单行正则）
+        """
+        all_toc = [k for words in toc_keywords.values() for k in words]
+        strong = {k.lower() for k in strong_keywords}
+        self.automaton = KeywordAutomaton({
+            'toc_strong': [k for k in all_toc if k.lower() in strong],
+            'toc_weak': [k for k in all_toc if k.lower() not in strong],
+            'chapter': chapter_keywords,
+            'non_toc': non_toc_keywords,
+        })
+
+        self._content_re = re.compile(r'^[^\S\n]*\S', re.M)
+        self._features = [(self._compile_line(p), w, guard) for p, w, guard in self.LINE_FEATURES.values()]
+        self._item_re = self._compile_line('|'.join(f'(?:{p})' for p in item_patterns))
+        self._page_re = self._compile_line(
+            '(?:' + '|'.join(p.rstrip('$') for p in page_patterns) + r')\s*$')
+        # 页码模式均以至少两个点号开头时，可用子串'..'快速排除
+        self._page_guard = '..' if all(re.match(r'\\\.\{[2-9]', p) for p in page_patterns) else None
+
+    @staticmethod
+    def _compile_line(pattern: str) -> re.Pattern:
+        """编译单行正则：空白匹配不跨行，^/$ 按行匹配"""
+        return re.compile(pattern.replace(r'\s', r'[^\S\n]'), re.M)
+
+    @staticmethod
+    def _count_lines(pattern: re.Pattern, text: str, line_starts: List[int]) -> int:
+        """统计至少有一处匹配的行数"""
+        return len({bisect_right(line_starts, m.start()) for m in pattern.finditer(text)})
+
+    def score(self, text: str) -> TOCScore:
+        """
+        对页面文本评分
+
+        Args:
+            text: 页面文本
+
+        Returns:
+            TOCScore
+        """
+        result = TOCScore()
+        if not text:
+            return result
+
+        result.lines = len(self._content_re.findall(text))
+        if result.lines == 0:
+            return result
+
+        line_starts = [0]
+        line_starts += [m.end() for m in re.finditer('\n', text)]
+
+        # 1. 逐行特征：每个特征对整页做一次扫描
+        for pattern, weight, guard in self._features:
+            if guard and not any(g in text for g in guard):
+                continue
+            result.indicators += weight * self._count_lines(pattern, text, line_starts)
+        if self._page_guard is None or self._page_guard in text:
+            result.page_number_lines = self._count_lines(self._page_re, text, line_starts)
+        result.item_lines = self._count_lines(self._item_re, text, line_starts)
+
+        # 2. 关键词（一次扫描全文），章节关键词按所在行去重计分
+        text_lower = text.lower()
+        if len(text_lower) != len(text):
+            # 个别字符（如'İ'）转小写后长度变化，需按小写文本重新定位行首
+            lower_starts = [0] + [m.end() for m in re.finditer('\n', text_lower)]
+        else:
+            lower_starts = line_starts
+
+        hit_categories: Set[str] = set()
+        chapter_lines = set()
+        for pos, categories in self.automaton.scan(text_lower):
+            hit_categories |= categories
+            if 'chapter' in categories:
+                chapter_lines.add(bisect_right(lower_starts, pos))
+        result.indicators += self.CHAPTER_WEIGHT * len(chapter_lines)
+
+        if 'toc_strong' in hit_categories:
+            result.keyword = 'strong'
+        elif 'toc_weak' in hit_categories:
+            result.keyword = 'weak'
+        result.excluded = 'non_toc' in hit_categories
+
+        result.is_toc = bool(result.keyword) or self._structural_decision(result)
+        result.confidence = self._confidence(result)
+        return result
+
+    @staticmethod
+    def _structural_decision(result: TOCScore) -> bool:
+        """原有的基于特征密度的目录页判定规则"""
+        if result.excluded or result.lines == 0:
+            return False
+        density = result.indicators / result.lines
+        return (density > 0.5 and result.indicators >= 5) or result.indicators >= 8
+
+    @staticmethod
+    def _confidence(result: TOCScore) -> float:
+        """按独立证据的noisy-OR组合置信度"""
+        if result.lines == 0:
+            return 0.0
+
+        evidence = [
+            {'strong': 0.6, 'weak': 0.2}.get(result.keyword, 0.0),
+            0.7 * min(1.0, result.page_number_lines / 3),
+            0.4 * min(1.0, result.item_lines / 5),
+            0.5 * min(1.0, result.indicators / result.lines),
+            0.3 if result.indicators >= 8 else 0.0,
+        ]
+
+        miss = 1.0
+        for e in evidence:
+            miss *= 1.0 - e
+        confidence = 1.0 - miss
+
+        if result.excluded and result.keyword != 'strong':
+            confidence *= 0.5
+        return round(confidence, 4)
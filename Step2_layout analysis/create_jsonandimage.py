@@ -1,144 +1,586 @@
-#用于只创建json和图片，不生成md
-
-import os
-import json
-from pathlib import Path
-import traceback
-
-from magic_pdf.data.data_reader_writer import FileBasedDataWriter, FileBasedDataReader
-from magic_pdf.data.dataset import PymuDocDataset
-from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
-from magic_pdf.config.enums import SupportedPdfParseMethod
-
-def process_pdf(pdf_file_path, output_base_dir="E:\ESGdata\md_jpg"):
-    """
-    处理PDF文件并生成JSON和图片输出
-    
-    Args:
-        pdf_file_path (str): PDF文件的路径
-        output_base_dir (str): 输出文件的基础目录
-        
-    Returns:
-        dict: 包含处理结果的字典，包括：
-            - model_inference_result: 模型推理结果
-            - content_list: 内容列表JSON
-            - output_files: 输出文件路径字典
-    """
-    try:
-        # 使用Path对象处理路径
-        pdf_path = Path(pdf_file_path)
-        pdf_dir_name = pdf_path.parent.name
-        
-        # 设置输出目录
-        local_md_dir = str(pdf_path.parent)  # JSON文件保存在PDF同目录
-        local_image_dir = str(Path(output_base_dir) / "md_jpg" / pdf_dir_name)  # 图片保存在指定目录
-        
-        # 获取文件名（不含扩展名）
-        name_without_suff = pdf_path.stem
-        
-        # 创建输出目录
-        os.makedirs(local_image_dir, exist_ok=True)
-        
-        # 初始化数据写入器
-        image_writer, md_writer = FileBasedDataWriter(local_image_dir), FileBasedDataWriter(local_md_dir)
-        
-        # 读取PDF文件
-        reader1 = FileBasedDataReader("")
-        pdf_bytes = reader1.read(str(pdf_path))
-        
-        # 创建数据集实例
-        ds = PymuDocDataset(pdf_bytes)
-        
-        # 根据PDF类型进行推理
-        if ds.classify() == SupportedPdfParseMethod.OCR:
-            infer_result = ds.apply(doc_analyze, ocr=True)
-            pipe_result = infer_result.pipe_ocr_mode(image_writer)
-        else:
-            infer_result = ds.apply(doc_analyze, ocr=False)
-            pipe_result = infer_result.pipe_txt_mode(image_writer)
-        
-        # 获取结果
-        model_inference_result = infer_result.get_infer_res()
-        
-        # 生成内容列表JSON
-        image_dir = str(os.path.basename(local_image_dir))
-        content_list = pipe_result.get_content_list(image_dir)
-        
-        # 设置JSON文件路径
-        json_file_path = str(pdf_path.parent / f"{name_without_suff}.json")
-        
-        # 保存JSON文件
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            json.dump(content_list, f, ensure_ascii=False, indent=4)
-        
-        # 注释掉MD生成部分
-        # md_content = pipe_result.get_markdown(os.path.basename(local_image_dir))
-        # pipe_result.dump_md(md_writer, f"{name_without_suff}.md", os.path.basename(local_image_dir))
-        
-        # 返回处理结果
-        return {
-            "model_inference_result": model_inference_result,
-            "content_list": content_list,
-            "output_files": {
-                "json": json_file_path,
-                "images_dir": local_image_dir
-            }
-        }
-    except Exception as e:
-        print(f"处理PDF时发生错误: {str(e)}")
-        print(f"错误详情: {traceback.format_exc()}")
-        raise
-
-def process_all_pdfs(base_dir="E:\ESGdata\success"):
-    """
-    处理指定目录下所有文件夹中的PDF文件
-    
-    Args:
-        base_dir (str): 包含PDF文件的根目录
-    """
-    base_path = Path(base_dir)
-    i = 0
-    success_count = 0
-    error_count = 0
-    
-    # 遍历目录下的所有文件夹
-    for folder_name in os.listdir(base_path):
-        folder_path = base_path / folder_name
-        
-        # 确保是目录
-        if not folder_path.is_dir():
-            continue  
-        
-        # 查找目录中的PDF文件
-        for file_name in os.listdir(folder_path):
-            if file_name.lower().endswith('.pdf'):
-                pdf_path = folder_path / file_name
-                try:
-                    i += 1
-                    print(f"正在处理第{i}个文件: {pdf_path}")
-                    result = process_pdf(str(pdf_path))
-                    print(f"处理完成: {pdf_path}")
-                    print(f"JSON文件已保存到: {result['output_files']['json']}")
-                    print(f"图片目录: {result['output_files']['images_dir']}")
-                    success_count += 1
-                    print("-" * 50)
-         
-                except Exception as e:
-                    error_count += 1
-                    print(f"处理第{i}个文件时出错")
-                    print(f"处理文件 {pdf_path} 时出错: {str(e)}")
-                    print(f"错误详情: {traceback.format_exc()}")
-                    print("继续处理下一个文件...")
-                    print("-" * 50)
-                    continue
-        
-        # 处理完一个文件夹后显示统计信息
-        print(f"当前统计: 成功 {success_count} 个，失败 {error_count} 个")
-        print("=" * 50)
-
-if __name__ == "__main__":
-    # 处理所有PDF文件
-    process_all_pdfs()
-
-
-
+#用于只创建json和图片，不生成md
+
+import os
+import json
+import hashlib
+from pathlib import Path
+import traceback
+
+import fitz  # PyMuPDF（magic_pdf的依赖）
+
+from magic_pdf.data.data_reader_writer import FileBasedDataReader
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
+from magic_pdf.config.enums import SupportedPdfParseMethod
+
+from image_store import ContentAddressedImageWriter, ReportImageWriter
+from layout_cache import page_fingerprint, layout_cache_namespace, LayoutCache
+from triage_sidecar import load_triage, check_triage, triage_ocr_mode, default_triage_dir
+
+# Step1虚拟“去目录”视图的跳过页清单后缀（与Step1的SKIP_PAGES_SUFFIX一致）
+SKIP_PAGES_SUFFIX = "_skip_pages.json"
+# 内容列表输出格式：json（缩进排版，默认）、compact（单行紧凑JSON）、
+# jsonl（每页一行，每行是该页条目组成的数组）
+CONTENT_LIST_FORMATS = ('json', 'compact', 'jsonl')
+
+
+def load_skip_sidecar(sidecar_path):
+    """
+    读取Step1写出的跳过页清单
+    
+    Args:
+        sidecar_path (str): 清单文件路径
+        
+    Returns:
+        dict: 包含 source_pdf、sha256、page_count、skip_pages 的字典
+    """
+    with open(sidecar_path, 'r', encoding='utf-8') as f:
+        sidecar = json.load(f)
+    for key in ('source_pdf', 'skip_pages'):
+        if key not in sidecar:
+            raise ValueError(f"跳过页清单缺少字段 {key}: {sidecar_path}")
+    return sidecar
+
+
+def filter_pdf_pages(pdf_bytes, skip_pages):
+    """
+    在内存中去掉指定页面，返回新的PDF字节（不写磁盘副本）
+    
+    Args:
+        pdf_bytes (bytes): 原PDF内容
+        skip_pages (list): 需跳过的页码（从0开始）
+        
+    Returns:
+        bytes: 过滤后的PDF内容
+    """
+    skip = set(skip_pages)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        doc.select([n for n in range(len(doc)) if n not in skip])
+        return doc.tobytes(garbage=2, deflate=True)
+
+def _page_runs(pages):
+    """把升序页码列表拆成连续区间 [(起始页, 结束页)]（均包含）"""
+    runs = []
+    for n in pages:
+        if runs and runs[-1][1] == n - 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return [tuple(run) for run in runs]
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """分块计算文件内容的SHA-256（不把整个文件读入内存）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_pdf_window(pdf_file_path, start_page, end_page=None, skip_pages=None, expected_sha256=None):
+    """
+    只读取PDF中的一个页码区间，返回新的PDF字节
+    
+    页码区间按去掉跳过页后的页序计算（与load_pdf_bytes的结果一致）。原PDF按路径打开，
+    PyMuPDF按需读取页面，区间内的页面按连续段用insert_pdf复制到新文档，
+    不在内存中保留整本PDF或过滤后的整本副本。
+    
+    Args:
+        pdf_file_path (str): PDF文件的路径
+        start_page (int): 起始页（过滤后的页序，从0开始，包含）
+        end_page (int): 结束页（不包含），None时到最后一页
+        skip_pages (list): 需跳过的页码（原PDF页序）
+        expected_sha256 (str): 原PDF应有的内容哈希，不一致时报错（页码清单已失效）
+        
+    Returns:
+        bytes: 只含该区间页面的PDF内容
+    """
+    if expected_sha256 and file_sha256(pdf_file_path) != expected_sha256:
+        raise ValueError(f"PDF内容与跳过页清单记录的哈希不一致: {pdf_file_path}")
+    
+    skip = set(skip_pages or [])
+    with fitz.open(str(pdf_file_path)) as src:
+        kept = [n for n in range(len(src)) if n not in skip]
+        window = kept[start_page:end_page]
+        with fitz.open() as doc:
+            for first, last in _page_runs(window):
+                doc.insert_pdf(src, from_page=first, to_page=last)
+            return doc.tobytes(garbage=2, deflate=True)
+
+
+def load_pdf_bytes(pdf_file_path, skip_pages=None, expected_sha256=None):
+    """
+    读取PDF，校验内容哈希并按跳过页过滤
+    
+    Args:
+        pdf_file_path (str): PDF文件的路径
+        skip_pages (list): 需跳过的页码（从0开始）
+        expected_sha256 (str): 原PDF应有的内容哈希，不一致时报错（页码清单已失效）
+        
+    Returns:
+        bytes: 过滤后的PDF内容
+    """
+    reader = FileBasedDataReader("")
+    pdf_bytes = reader.read(str(pdf_file_path))
+    
+    if expected_sha256 and hashlib.sha256(pdf_bytes).hexdigest() != expected_sha256:
+        raise ValueError(f"PDF内容与跳过页清单记录的哈希不一致: {pdf_file_path}")
+    
+    # 页面过滤（虚拟去目录视图）：在内存中去掉跳过的页面
+    if skip_pages:
+        pdf_bytes = filter_pdf_pages(pdf_bytes, skip_pages)
+    return pdf_bytes
+
+
+def is_ocr_pdf(pdf_bytes):
+    """判断PDF是否需要OCR模式解析"""
+    return PymuDocDataset(pdf_bytes).classify() == SupportedPdfParseMethod.OCR
+
+
+def analyze_pdf_bytes(pdf_bytes, image_writer, image_dir, ocr=None):
+    """
+    对PDF内容做版面分析
+    
+    图片写入器因同名冲突给裁剪图片改名时，内容列表中的img_path随之改为新文件名。
+    
+    Args:
+        pdf_bytes (bytes): PDF内容
+        image_writer: 图片写入器
+        image_dir (str): 内容列表中图片路径的目录前缀
+        ocr (bool): 是否使用OCR模式，None时按PDF类型自动判断
+        
+    Returns:
+        tuple: (推理结果, 内容列表)
+    """
+    # 创建数据集实例
+    ds = PymuDocDataset(pdf_bytes)
+    if ocr is None:
+        ocr = ds.classify() == SupportedPdfParseMethod.OCR
+    
+    # 根据PDF类型进行推理
+    if ocr:
+        infer_result = ds.apply(doc_analyze, ocr=True)
+        pipe_result = infer_result.pipe_ocr_mode(image_writer)
+    else:
+        infer_result = ds.apply(doc_analyze, ocr=False)
+        pipe_result = infer_result.pipe_txt_mode(image_writer)
+    
+    content_list = pipe_result.get_content_list(image_dir)
+    if isinstance(image_writer, ReportImageWriter):
+        image_writer.rename_image_paths(content_list)
+    return infer_result, content_list
+
+
+def analyze_pdf_cached(pdf_bytes, image_writer, image_dir, local_image_dir, layout_cache, ocr=None):
+    """
+    逐页复用缓存的版面分析
+    
+    按页面内容指纹查询缓存，只把未命中的页面组成新PDF做版面分析，
+    分析结果按页写入缓存后与命中的页面按页序拼接。去掉目录页的PDF、
+    上游小改动后的重跑都只分析内容变化的页面。跨页段落合并只在
+    同一次分析的页面之间进行。未命中页组成的子PDF从第0页重新编号，
+    其图片与命中页恢复的图片同名时不会互相覆盖，后写入的一方改按内容哈希命名。
+    
+    Args:
+        pdf_bytes (bytes): PDF内容
+        image_writer: 图片写入器
+        image_dir (str): 内容列表中图片路径的目录前缀
+        local_image_dir (str): 图片目录
+        layout_cache (LayoutCache): 版面缓存
+        ocr (bool): 是否使用OCR模式，None时按整本PDF类型判断（解析模式是缓存键的一部分）
+        
+    Returns:
+        tuple: (推理结果（全部命中时为None）, 内容列表)
+    """
+    if ocr is None:
+        ocr = is_ocr_pdf(pdf_bytes)
+    namespace = layout_cache_namespace(ocr)
+    
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_count = len(doc)
+        memo = {}
+        keys = [LayoutCache.make_key(page_fingerprint(doc, n, memo), namespace) for n in range(page_count)]
+    
+    pages = {}
+    for n, key in enumerate(keys):
+        items = layout_cache.get(key, n, image_dir, local_image_dir)
+        if items is not None:
+            pages[n] = items
+    missing = [n for n in range(page_count) if n not in pages]
+    
+    infer_result = None
+    if missing:
+        if len(missing) < page_count:
+            print(f"版面缓存命中 {len(pages)}/{page_count} 页，分析其余 {len(missing)} 页")
+            pdf_bytes = filter_pdf_pages(pdf_bytes, sorted(pages))
+        infer_result, content_list = analyze_pdf_bytes(pdf_bytes, image_writer, image_dir, ocr=ocr)
+        
+        analyzed = {n: [] for n in missing}
+        for item in content_list:
+            # 子PDF中的第i页对应原第missing[i]页
+            analyzed[missing[item['page_idx']]].append(dict(item, page_idx=missing[item['page_idx']]))
+        for n, items in analyzed.items():
+            layout_cache.put(keys[n], items, local_image_dir)
+        pages.update(analyzed)
+    
+    return infer_result, [item for n in range(page_count) for item in pages[n]]
+
+
+def offset_page_idx(content_list, start_page):
+    """把分片内从0开始的page_idx加上分片起始页，返回新的内容列表"""
+    if not start_page:
+        return content_list
+    return [dict(item, page_idx=item['page_idx'] + start_page) if 'page_idx' in item else item
+            for item in content_list]
+
+
+def merge_content_lists(parts):
+    """
+    合并按页码区间分片分析的内容列表
+    
+    各分片的page_idx从0开始编号，合并时加上分片的起始页。
+    各分片的图片写入同一目录，magic_pdf按分片内页码命名的图片可能同名，分析时同名冲突的图片
+    已改按内容哈希命名（见ReportImageWriter），分片内容列表中的img_path已是最终文件名。
+    
+    Args:
+        parts (list): (起始页, 内容列表) 列表
+        
+    Returns:
+        list: 合并后的内容列表
+    """
+    merged = []
+    for start_page, content_list in sorted(parts, key=lambda part: part[0]):
+        merged.extend(offset_page_idx(content_list, start_page))
+    return merged
+
+
+def iter_page_groups(content_list):
+    """按page_idx把相邻条目分组，依次产出每页的条目列表"""
+    page, items = None, []
+    for item in content_list:
+        page_idx = item.get('page_idx')
+        if items and page_idx != page:
+            yield items
+            items = []
+        page = page_idx
+        items.append(item)
+    if items:
+        yield items
+
+
+class ContentListWriter:
+    """
+    逐页写出内容列表
+    
+    compact和jsonl格式每写一页即追加到文件，不在内存中保留已写出的页；
+    json格式保持原有的缩进排版，在结束时整体写出。内容先写入临时文件，
+    全部页完成后再替换为正式文件，中途失败不会留下不完整的JSON。
+    """
+
+    def __init__(self, json_file_path, output_format='json'):
+        """
+        Args:
+            json_file_path (str): 内容列表文件路径
+            output_format (str): 输出格式，见CONTENT_LIST_FORMATS
+        """
+        if output_format not in CONTENT_LIST_FORMATS:
+            raise ValueError(f"不支持的内容列表格式: {output_format}")
+        self.json_file_path = str(json_file_path)
+        self.output_format = output_format
+        self.tmp_path = f"{self.json_file_path}.tmp"
+        self.items_written = 0
+        self._buffer = []
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def write_page(self, items):
+        """写出一页的条目（页须按顺序写入）"""
+        if self.output_format == 'json':
+            self._buffer.extend(items)
+        elif self.output_format == 'jsonl':
+            self._file.write(json.dumps(items, ensure_ascii=False, separators=(',', ':')) + "\n")
+        else:
+            for i, item in enumerate(items):
+                self._file.write(',' if self.items_written + i else '[')
+                self._file.write(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+        self.items_written += len(items)
+        self._file.flush()
+
+    def close(self):
+        """完成写出并替换为正式文件"""
+        if self.output_format == 'json':
+            json.dump(self._buffer, self._file, ensure_ascii=False, indent=4)
+            self._buffer = []
+        elif self.output_format == 'compact':
+            self._file.write(']' if self.items_written else '[]')
+        self._file.close()
+        os.replace(self.tmp_path, self.json_file_path)
+
+    def abort(self):
+        """放弃写出，删除临时文件"""
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_content_list(content_list, json_file_path, output_format='json'):
+    """保存内容列表（格式见CONTENT_LIST_FORMATS）"""
+    with ContentListWriter(json_file_path, output_format) as writer:
+        for items in iter_page_groups(content_list):
+            writer.write_page(items)
+
+
+def make_image_writer(local_image_dir, dedup_images=True):
+    """
+    图片写入器：沿用magic_pdf的文件名，同名冲突时按内容哈希命名；dedup_images为True时另按内容去重（硬链接到共享存储目录）
+    """
+    if dedup_images:
+        return ContentAddressedImageWriter(local_image_dir)
+    return ReportImageWriter(local_image_dir)
+
+
+def image_writer_stats(image_writer):
+    """去重写入器的统计信息，普通写入器返回None"""
+    return image_writer.stats() if isinstance(image_writer, ContentAddressedImageWriter) else None
+
+
+def _output_paths(pdf_file_path, output_base_dir, output_dir=None, output_name=None):
+    """返回 (JSON目录, 图片目录, JSON文件名)；JSON目录默认为PDF所在目录"""
+    pdf_path = Path(pdf_file_path)
+    json_dir = Path(output_dir) if output_dir else pdf_path.parent
+    local_image_dir = str(Path(output_base_dir) / "md_jpg" / json_dir.name)  # 图片保存在指定目录
+    return json_dir, local_image_dir, output_name or pdf_path.stem
+
+
+def process_pdf(pdf_file_path, output_base_dir="E:\ESGdata\md_jpg", skip_pages=None,
+                output_dir=None, output_name=None, expected_sha256=None, output_format='json',
+                dedup_images=True, layout_cache=None, triage_dir=None):
+    """
+    处理PDF文件并生成JSON和图片输出
+    
+    Args:
+        pdf_file_path (str): PDF文件的路径
+        output_base_dir (str): 输出文件的基础目录
+        skip_pages (list): 版面分析前过滤掉的页码（从0开始），如Step1识别出的目录页
+        output_dir (str): JSON输出目录，默认为PDF所在目录
+        output_name (str): JSON文件名（不含扩展名），默认为PDF文件名
+        expected_sha256 (str): 原PDF应有的内容哈希，不一致时报错（页码清单已失效）
+        output_format (str): 内容列表输出格式（json/compact/jsonl）
+        dedup_images (bool): 是否按内容哈希去重保存裁剪图片
+        layout_cache (LayoutCache): 逐页版面缓存，None时整本分析
+        triage_dir (str): Step1的分诊目录，None时不读取分诊清单（由magic_pdf判断解析模式）
+        
+    Returns:
+        dict: 包含处理结果的字典，包括：
+            - model_inference_result: 模型推理结果（使用版面缓存时只含未命中的页面）
+            - content_list: 内容列表JSON
+            - output_files: 输出文件路径字典
+            - image_stats: 图片去重统计（未去重时为None）
+    """
+    try:
+        # 设置输出目录和文件名（不含扩展名）
+        json_dir, local_image_dir, name_without_suff = _output_paths(
+            pdf_file_path, output_base_dir, output_dir, output_name)
+        
+        # 创建输出目录
+        os.makedirs(local_image_dir, exist_ok=True)
+        
+        # 初始化数据写入器
+        image_writer = make_image_writer(local_image_dir, dedup_images)
+        
+        # 有分诊清单时按清单选择解析模式，不再重新分类
+        triage = load_triage(pdf_file_path, triage_dir)
+        check_triage(triage, pdf_file_path)
+        ocr = triage_ocr_mode(triage, skip_pages)
+        
+        # 读取PDF文件
+        pdf_bytes = load_pdf_bytes(pdf_file_path, skip_pages, expected_sha256)
+        
+        # 版面分析并生成内容列表JSON
+        image_dir = str(os.path.basename(local_image_dir))
+        if layout_cache is not None:
+            infer_result, content_list = analyze_pdf_cached(
+                pdf_bytes, image_writer, image_dir, local_image_dir, layout_cache, ocr=ocr)
+        else:
+            infer_result, content_list = analyze_pdf_bytes(pdf_bytes, image_writer, image_dir, ocr=ocr)
+        
+        # 获取结果
+        model_inference_result = infer_result.get_infer_res() if infer_result is not None else None
+        
+        # 设置JSON文件路径并保存
+        json_file_path = str(json_dir / f"{name_without_suff}.json")
+        write_content_list(content_list, json_file_path, output_format)
+        
+        # 注释掉MD生成部分
+        # md_content = pipe_result.get_markdown(os.path.basename(local_image_dir))
+        # pipe_result.dump_md(md_writer, f"{name_without_suff}.md", os.path.basename(local_image_dir))
+        
+        # 返回处理结果
+        return {
+            "model_inference_result": model_inference_result,
+            "content_list": content_list,
+            "output_files": {
+                "json": json_file_path,
+                "images_dir": local_image_dir
+            },
+            "image_stats": image_writer_stats(image_writer)
+        }
+    except Exception as e:
+        print(f"处理PDF时发生错误: {str(e)}")
+        print(f"错误详情: {traceback.format_exc()}")
+        raise
+
+def process_pdf_shard(pdf_file_path, output_base_dir, start_page, end_page, ocr,
+                      skip_pages=None, output_dir=None, expected_sha256=None, dedup_images=True,
+                      layout_cache=None, triage_dir=None):
+    """
+    对PDF的一个页码区间做版面分析（大文件分片处理）
+    
+    页码区间按跳过页过滤后的页序计算，只读取该区间的页面（见load_pdf_window）；
+    图片写入与整本处理时相同的目录，
+    与其他分片的图片同名时改按内容哈希命名，不会互相覆盖。
+    
+    Args:
+        pdf_file_path (str): PDF文件的路径
+        output_base_dir (str): 输出文件的基础目录
+        start_page (int): 起始页（包含）
+        end_page (int): 结束页（不包含）
+        ocr (bool): 是否使用OCR模式（整本统一判断，避免各分片模式不一致）；
+            None时按分诊清单判断
+        skip_pages (list): 需跳过的页码
+        output_dir (str): JSON输出目录（决定图片子目录名）
+        expected_sha256 (str): 原PDF应有的内容哈希
+        dedup_images (bool): 是否按内容哈希去重保存裁剪图片
+        layout_cache (LayoutCache): 逐页版面缓存，None时整段分析
+        triage_dir (str): Step1的分诊目录（ocr为None时使用）
+        
+    Returns:
+        tuple: (该区间的内容列表（page_idx从0开始，由offset_page_idx加上起始页）, 图片去重统计)
+    """
+    _, local_image_dir, _ = _output_paths(pdf_file_path, output_base_dir, output_dir)
+    os.makedirs(local_image_dir, exist_ok=True)
+    image_writer = make_image_writer(local_image_dir, dedup_images)
+    
+    if ocr is None:
+        ocr = triage_ocr_mode(load_triage(pdf_file_path, triage_dir), skip_pages)
+    
+    shard_bytes = load_pdf_window(pdf_file_path, start_page, end_page, skip_pages, expected_sha256)
+    
+    image_dir = str(os.path.basename(local_image_dir))
+    if layout_cache is not None:
+        _, content_list = analyze_pdf_cached(
+            shard_bytes, image_writer, image_dir, local_image_dir, layout_cache, ocr=ocr)
+    else:
+        _, content_list = analyze_pdf_bytes(shard_bytes, image_writer, image_dir, ocr=ocr)
+    return content_list, image_writer_stats(image_writer)
+
+def process_virtual_pdf(sidecar_path, output_base_dir="E:\ESGdata\md_jpg", output_format='json',
+                        dedup_images=True, layout_cache=None, triage_dir=None):
+    """
+    按Step1的跳过页清单处理原PDF（不需要_no_toc.pdf副本）
+    
+    输出与处理_no_toc.pdf副本时一致：JSON写在清单所在目录，
+    文件名为 <原文件名>_no_toc.json，page_idx按过滤后的页序编号。
+    
+    Args:
+        sidecar_path (str): 跳过页清单路径
+        output_base_dir (str): 输出文件的基础目录
+        output_format (str): 内容列表输出格式（json/compact/jsonl）
+        dedup_images (bool): 是否按内容哈希去重保存裁剪图片
+        layout_cache (LayoutCache): 逐页版面缓存
+        triage_dir (str): Step1的分诊目录
+        
+    Returns:
+        dict: 同process_pdf
+    """
+    sidecar = load_skip_sidecar(sidecar_path)
+    source_pdf = sidecar['source_pdf']
+    return process_pdf(
+        source_pdf,
+        output_base_dir,
+        skip_pages=sidecar['skip_pages'],
+        output_dir=str(Path(sidecar_path).parent),
+        output_name=f"{Path(source_pdf).stem}_no_toc",
+        expected_sha256=sidecar.get('sha256'),
+        output_format=output_format,
+        dedup_images=dedup_images,
+        layout_cache=layout_cache,
+        triage_dir=triage_dir
+    )
+
+def process_all_pdfs(base_dir="E:\ESGdata\success", layout_cache_dir=None, triage_dir=None):
+    """
+    处理指定目录下所有文件夹中的PDF文件
+    
+    文件夹中的跳过页清单（*_skip_pages.json）按虚拟去目录视图处理原PDF。
+    
+    Args:
+        base_dir (str): 包含PDF文件的根目录
+        layout_cache_dir (str): 逐页版面缓存目录，None时不使用缓存
+        triage_dir (str): Step1的分诊目录，默认为base_dir同级的triage/
+    """
+    base_path = Path(base_dir)
+    triage_dir = triage_dir or default_triage_dir(base_dir)
+    layout_cache = LayoutCache(layout_cache_dir) if layout_cache_dir else None
+    i = 0
+    success_count = 0
+    error_count = 0
+    
+    # 遍历目录下的所有文件夹
+    for folder_name in os.listdir(base_path):
+        folder_path = base_path / folder_name
+        
+        # 确保是目录
+        if not folder_path.is_dir():
+            continue  
+        
+        # 查找目录中的PDF文件和跳过页清单
+        for file_name in os.listdir(folder_path):
+            is_sidecar = file_name.endswith(SKIP_PAGES_SUFFIX)
+            if file_name.lower().endswith('.pdf') or is_sidecar:
+                pdf_path = folder_path / file_name
+                try:
+                    i += 1
+                    print(f"正在处理第{i}个文件: {pdf_path}")
+                    if is_sidecar:
+                        result = process_virtual_pdf(str(pdf_path), layout_cache=layout_cache, triage_dir=triage_dir)
+                    else:
+                        result = process_pdf(str(pdf_path), layout_cache=layout_cache, triage_dir=triage_dir)
+                    print(f"处理完成: {pdf_path}")
+                    print(f"JSON文件已保存到: {result['output_files']['json']}")
+                    print(f"图片目录: {result['output_files']['images_dir']}")
+                    if result['image_stats']:
+                        print(f"图片去重: {result['image_stats']['duplicates']}/{result['image_stats']['images']} "
+                              f"张与已有图片重复，节省 {result['image_stats']['mb_saved']} MB")
+                    success_count += 1
+                    print("-" * 50)
+         
+                except Exception as e:
+                    error_count += 1
+                    print(f"处理第{i}个文件时出错")
+                    print(f"处理文件 {pdf_path} 时出错: {str(e)}")
+                    print(f"错误详情: {traceback.format_exc()}")
+                    print("继续处理下一个文件...")
+                    print("-" * 50)
+                    continue
+        
+        # 处理完一个文件夹后显示统计信息
+        print(f"当前统计: 成功 {success_count} 个，失败 {error_count} 个")
+        print("=" * 50)
+
+if __name__ == "__main__":
+    # 处理所有PDF文件
+    process_all_pdfs()
+
+
+
@@ -0,0 +1,284 @@
+#内容寻址的图片存储：版面分析裁剪出的图片按内容哈希只存一份，各报告图片目录中的文件（沿用magic_pdf的文件名）以硬链接指向它
+
+import os
+import errno
+import shutil
+import hashlib
+import threading
+
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+
+# 存储目录名：位于各报告图片目录的同级（同一文件系统，才能建立硬链接）
+IMAGE_STORE_DIR_NAME = ".image_store"
+
+
+def image_store_dir(local_image_dir):
+    """报告图片目录对应的共享存储目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(local_image_dir)), IMAGE_STORE_DIR_NAME)
+
+
+# 建立硬链接失败时退回为复制的错误：跨文件系统、文件系统不支持或不允许硬链接、链接数达到上限
+_LINK_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS}
+
+
+def _tmp_path(path):
+    """同目录下的临时文件名（同一分片进程中的线程、不同工作进程互不冲突）"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _same_content(path_a, path_b):
+    """两个路径是否为同一文件或内容相同（任一不存在时为False）"""
+    try:
+        if os.path.samefile(path_a, path_b):
+            return True
+        if os.path.getsize(path_a) != os.path.getsize(path_b):
+            return False
+        with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+            while True:
+                chunk_a, chunk_b = a.read(1 << 20), b.read(1 << 20)
+                if chunk_a != chunk_b:
+                    return False
+                if not chunk_a:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+def _copy_atomic(src_path, target_path):
+    """经临时文件复制后原子替换（同一内容可能被多个分片同时写入）"""
+    tmp_path = _tmp_path(target_path)
+    try:
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _link_or_copy(blob_path, target_path, replace=False):
+    """
+    在target_path建立指向blob_path的硬链接，文件系统不支持硬链接时复制
+
+    同一报告的多个分片可能同时链接同一张图片（重复的logo、徽章）：链接时目标已存在且是同一文件
+    或内容相同，视为成功，检查与链接之间不留竞争窗口。目标已是另一内容时，replace为False则保留
+    原文件并返回False（由调用方改名），为True时经临时链接原子替换。
+
+    Returns:
+        bool: target_path是否已是blob_path的内容
+    """
+    try:
+        os.link(blob_path, target_path)
+        return True
+    except FileExistsError:
+        if _same_content(blob_path, target_path):
+            return True
+        if not replace:
+            return False
+        tmp_path = _tmp_path(target_path)
+        try:
+            os.link(blob_path, tmp_path)
+            os.replace(tmp_path, target_path)
+            return True
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if e.errno not in _LINK_FALLBACK_ERRNOS:
+                raise
+    except OSError as e:
+        if e.errno not in _LINK_FALLBACK_ERRNOS:
+            raise
+    if os.path.exists(target_path):
+        if _same_content(blob_path, target_path):
+            return True
+        if not replace:
+            return False
+    _copy_atomic(blob_path, target_path)
+    return True
+
+
+def _place(blob_path, target_path):
+    """
+    把内容放到target_path；同名文件已是另一张图片时改按内容哈希命名放在同一目录
+
+    Returns:
+        str: 实际使用的路径
+    """
+    if _link_or_copy(blob_path, target_path):
+        return target_path
+    content_path = os.path.join(os.path.dirname(target_path),
+                                content_image_name(_file_sha256(blob_path), target_path))
+    # 按内容命名的文件只可能是同一内容，已存在的不同内容视为损坏，直接替换
+    _link_or_copy(blob_path, content_path, replace=True)
+    return content_path
+
+
+def content_image_name(digest, path):
+    """按内容哈希命名的图片文件名（扩展名沿用原文件名，转为小写）"""
+    return f"{digest}{os.path.splitext(path)[1].lower()}"
+
+
+def _file_sha256(path):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_image_file(image_path, store_dir):
+    """
+    把已有图片文件存入共享存储目录
+
+    Returns:
+        str: 存储目录内的相对路径（按内容哈希命名）
+    """
+    digest = _file_sha256(image_path)
+    blob_name = f"{digest[:2]}/{content_image_name(digest, image_path)}"
+    blob_path = os.path.join(store_dir, blob_name)
+    if not os.path.exists(blob_path):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        _copy_atomic(image_path, blob_path)
+    return blob_name
+
+
+def link_stored_image(blob_name, target_path, store_dir):
+    """
+    从共享存储目录恢复图片到target_path（硬链接，不支持时复制）
+
+    target_path已是另一张图片时（如按其他页码编号的分析留下的同名文件），改按内容哈希命名恢复。
+
+    Returns:
+        str: 实际恢复到的路径；存储中没有该图片时返回None
+    """
+    blob_path = os.path.join(store_dir, blob_name)
+    if not os.path.exists(blob_path):
+        return None
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    return _place(blob_path, target_path)
+
+
+def _write_atomic(path, data):
+    """先写临时文件再原子替换（多个工作进程可能同时写入同一内容）"""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ReportImageWriter(FileBasedDataWriter):
+    """
+    不覆盖已有图片的写入器
+
+    图片沿用magic_pdf给出的文件名（所分析PDF内的页码 + 裁剪区域的哈希），内容列表中的img_path不变。
+    大文件分片、版面缓存未命中页组成的子PDF都从第0页重新编号，写入同一报告图片目录时，
+    不同页面上位置相同的图片会同名：写入时若同名文件已是另一张图片，不覆盖它，
+    改按内容SHA-256命名（同名即同内容），并记录magic_pdf文件名到新文件名的映射，
+    每次分析结束后由rename_image_paths改写内容列表中对应的img_path。
+    """
+
+    def __init__(self, parent_dir):
+        """
+        Args:
+            parent_dir (str): 报告图片目录
+        """
+        super().__init__(parent_dir)
+        self.parent_dir = parent_dir
+        # 因同名冲突改名的图片：magic_pdf给出的文件名 -> 按内容命名的文件名（仅当前这次分析）
+        self.renamed = {}
+
+    def write(self, path, data):
+        target_path = path
+        if not os.path.isabs(target_path) and self.parent_dir:
+            target_path = os.path.join(self.parent_dir, target_path)
+        if os.path.dirname(target_path):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+        digest = hashlib.sha256(data).hexdigest()
+        source_path = self._source(digest, path, data, target_path)
+        try:
+            placed = _place(source_path, target_path)
+        finally:
+            self._release(source_path)
+        if placed != target_path:
+            self.renamed[os.path.basename(path)] = os.path.basename(placed)
+
+    def _source(self, digest, path, data, target_path):
+        """保存图片内容的文件：写在目标目录下的临时文件（同一文件系统，可硬链接到目标）"""
+        tmp_path = _tmp_path(target_path)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        return tmp_path
+
+    def _release(self, source_path):
+        if os.path.exists(source_path):
+            os.remove(source_path)
+
+    def rename_image_paths(self, content_list):
+        """
+        把内容列表中因同名冲突改名的图片的img_path改为新文件名（就地修改），并清空本次分析的映射
+
+        Args:
+            content_list (list): 本次分析得到的内容列表
+
+        Returns:
+            list: 同一内容列表
+        """
+        for item in content_list:
+            img_path = item.get('img_path')
+            if not img_path:
+                continue
+            name = os.path.basename(img_path)
+            if name in self.renamed:
+                item['img_path'] = img_path[:len(img_path) - len(name)] + self.renamed[name]
+        self.renamed = {}
+        return content_list
+
+
+class ContentAddressedImageWriter(ReportImageWriter):
+    """
+    按内容哈希去重的图片写入器
+
+    内容按SHA-256存入共享存储目录，报告目录中的文件（文件名规则见ReportImageWriter）是指向它的硬链接。
+    重复出现在各页、各报告中的logo、认证徽章、页眉装饰只占一份磁盘空间和inode，
+    后续逐图片处理的阶段可按inode识别重复图片。硬链接共享内容，图片不应被原地修改。
+    """
+
+    def __init__(self, parent_dir, store_dir=None):
+        """
+        Args:
+            parent_dir (str): 报告图片目录
+            store_dir (str): 共享存储目录，默认为报告图片目录同级的.image_store
+        """
+        super().__init__(parent_dir)
+        self.store_dir = store_dir or image_store_dir(parent_dir)
+        self.images_written = 0
+        self.duplicates = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+
+    def _source(self, digest, path, data, target_path):
+        """共享存储中的内容文件（不存在时写入）"""
+        blob_path = os.path.join(self.store_dir, digest[:2], content_image_name(digest, path))
+        self.images_written += 1
+        if os.path.exists(blob_path):
+            self.duplicates += 1
+            self.bytes_saved += len(data)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            _write_atomic(blob_path, data)
+            self.bytes_written += len(data)
+        return blob_path
+
+    def _release(self, source_path):
+        pass
+
+    def stats(self):
+        """去重统计：写入图片数、重复数、去重率、节省的空间"""
+        return {
+            'images': self.images_written,
+            'duplicates': self.duplicates,
+            'dedup_ratio': round(self.duplicates / self.images_written, 4) if self.images_written else 0.0,
+            'mb_written': round(self.bytes_written / (1 << 20), 2),
+            'mb_saved': round(self.bytes_saved / (1 << 20), 2)
+        }
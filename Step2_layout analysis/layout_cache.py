@@ -0,0 +1,201 @@
+#逐页版面分析结果缓存：以页面内容流和资源的哈希为键，内容未变的页面直接复用上次的分析结果
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+
+from image_store import store_image_file, link_stored_image, image_store_dir
+
+# 对象引用，如 "12 0 R"
+_REF_PATTERN = re.compile(r'(\d+) \d+ R')
+# 指回页面树/所属页面的引用不参与哈希（否则会把整本文档卷入）
+_BACKREF_PATTERN = re.compile(r'/(?:Parent|P)\s*\d+ \d+ R')
+# 流对象的编码参数：重新保存时可能被压缩，哈希解码后的内容，不计这些键
+_STREAM_ENCODING_PATTERN = re.compile(r'/(?:Length|DL)\s*\d+(?: \d+ R)?|/Filter\s*(?:/\w+|\[[^\]]*\])|'
+                                      r'/DecodeParms\s*(?:<<[^<>]*>>|\[[^\]]*\]|null)')
+
+
+def _hash_source(doc, source, memo, active):
+    """哈希一段PDF对象源码，其中的间接引用替换为被引用对象的哈希"""
+    digest = hashlib.sha256()
+    parts = _REF_PATTERN.split(_BACKREF_PATTERN.sub('', source))
+    for i, part in enumerate(parts):
+        if i % 2:
+            digest.update(_hash_xref(doc, int(part), memo, active).encode())
+        else:
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def _hash_xref(doc, xref, memo, active):
+    """递归哈希一个间接对象（含解码后的流内容），与对象编号无关"""
+    if xref in memo:
+        return memo[xref]
+    if xref in active:
+        return 'cycle'
+    active.add(xref)
+    try:
+        is_stream = doc.xref_is_stream(xref)
+        source = doc.xref_object(xref, compressed=True)
+        if is_stream:
+            source = _STREAM_ENCODING_PATTERN.sub('', source)
+        digest = hashlib.sha256(_hash_source(doc, source, memo, active).encode())
+        if is_stream:
+            digest.update(doc.xref_stream(xref) or b'')
+        memo[xref] = digest.hexdigest()
+    except Exception:
+        # 损坏的对象按编号区分，只会导致缓存未命中
+        memo[xref] = f"unreadable:{xref}"
+    finally:
+        active.discard(xref)
+    return memo[xref]
+
+
+def page_fingerprint(doc, page_num, memo=None):
+    """
+    页面内容指纹
+
+    由页面尺寸/旋转、解码后的内容流和（含继承的）资源字典递归计算，
+    与对象编号无关：去掉目录页后重新保存的PDF中，未改动页面的指纹与原PDF一致。
+
+    Args:
+        doc: fitz文档
+        page_num (int): 页码（从0开始）
+        memo (dict): 同一文档内共享的对象哈希缓存（字体、图片等常被多页引用）
+
+    Returns:
+        str: 十六进制SHA-256
+    """
+    memo = {} if memo is None else memo
+    page = doc[page_num]
+    digest = hashlib.sha256()
+    digest.update(f"{tuple(page.mediabox)}|{tuple(page.cropbox)}|{page.rotation}".encode())
+    digest.update(page.read_contents())
+
+    # 资源可能继承自页面树上的父节点
+    xref = page.xref
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != 'null':
+            digest.update(_hash_source(doc, value, memo, set()).encode())
+            break
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == 'xref' else 0
+    return digest.hexdigest()
+
+
+def layout_cache_namespace(ocr):
+    """缓存命名空间：magic_pdf版本和解析模式（OCR/文本），任一变化时原有结果不再命中"""
+    try:
+        from importlib.metadata import version
+        magic_pdf_version = version('magic-pdf')
+    except Exception:
+        magic_pdf_version = 'unknown'
+    return f"magic_pdf-{magic_pdf_version}|{'ocr' if ocr else 'txt'}"
+
+
+class LayoutCache:
+    """基于SQLite的逐页版面分析结果缓存，多个工作进程可共享同一缓存目录"""
+
+    DB_NAME = "layout_cache.sqlite3"
+
+    def __init__(self, cache_dir):
+        """
+        Args:
+            cache_dir (str): 缓存目录
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, self.DB_NAME)
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(self.db_path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY,"
+            " items TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(fingerprint, namespace):
+        return f"{fingerprint}:{namespace}"
+
+    def get(self, key, page_idx, image_dir, local_image_dir):
+        """
+        读取一页的缓存结果并恢复其图片
+
+        图片按写入缓存时的文件名恢复；旧结果可能来自按其他页码编号的分析，
+        该文件名已是另一张图片时改按内容哈希命名（与ReportImageWriter的规则一致）。
+
+        Args:
+            key (str): 缓存键
+            page_idx (int): 该页在当前内容列表中的page_idx
+            image_dir (str): 内容列表中图片路径的目录前缀
+            local_image_dir (str): 图片目录（从共享存储链接图片到此处）
+
+        Returns:
+            list: 该页的条目；未命中（或其图片已不在存储中）时返回None
+        """
+        try:
+            row = self._conn.execute("SELECT items FROM pages WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取版面缓存失败: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+
+        store_dir = image_store_dir(local_image_dir)
+        items = []
+        for item in json.loads(row[0]):
+            item = dict(item, page_idx=page_idx)
+            blob_name = item.pop('img_blob', None)
+            if blob_name:
+                restored = link_stored_image(blob_name, os.path.join(local_image_dir, item['img_path']), store_dir)
+                if restored is None:
+                    self.misses += 1
+                    return None
+                item['img_path'] = f"{image_dir}/{os.path.basename(restored)}"
+            items.append(item)
+        self.hits += 1
+        return items
+
+    def put(self, key, items, local_image_dir):
+        """
+        写入一页的分析结果，其中引用的图片存入共享存储
+
+        Args:
+            key (str): 缓存键
+            items (list): 该页的条目
+            local_image_dir (str): 图片所在目录
+        """
+        store_dir = image_store_dir(local_image_dir)
+        stored = []
+        try:
+            for item in items:
+                item = {k: v for k, v in item.items() if k != 'page_idx'}
+                if item.get('img_path'):
+                    image_name = os.path.basename(item['img_path'])
+                    item['img_blob'] = store_image_file(os.path.join(local_image_dir, image_name), store_dir)
+                    item['img_path'] = image_name
+                stored.append(item)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (key, items, created) VALUES (?, ?, ?)",
+                (key, json.dumps(stored, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ 写入版面缓存失败: {e}")
+
+    def stats(self):
+        """命中统计"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self._conn.close()
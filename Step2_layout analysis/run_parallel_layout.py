@@ -0,0 +1,587 @@
+#用于多进程批量版面分析：每个工作进程常驻magic_pdf模型，大文件优先调度并按页码区间分片，可断点续跑
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import traceback
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+
+import fitz  # PyMuPDF（magic_pdf的依赖）
+
+from triage_sidecar import default_triage_dir, load_triage, triage_ocr_mode, triage_page_count
+
+# 线程预算模块与Step1共用（位于Step1目录）；spawn的工作进程重新导入本模块时同样生效
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Step1_ocr_detect_ToC"))
+from thread_budget import CPUMeter, apply_thread_budget, cpu_budget, threads_per_worker, utilization
+
+# 跳过页清单后缀（与Step1的SKIP_PAGES_SUFFIX一致）
+SKIP_PAGES_SUFFIX = "_skip_pages.json"
+# 源文件戳：与内容列表JSON同名，记录生成该JSON的源PDF哈希（不以.json结尾，避免被当作内容列表）
+SOURCE_STAMP_SUFFIX = ".source"
+# 逐PDF耗时日志（位于输入根目录）
+TIMING_LOG_NAME = "step2_timing.jsonl"
+
+# 分片配置：页数超过阈值的PDF按固定页数切分为多个区间分别分析，
+# 每个分片只读取本区间的页面（load_pdf_window），工作进程同一时刻只持有一个区间的页面和推理结果；
+# 没有按内存上限自动调整区间大小，峰值内存由shard_pages控制
+SHARD_THRESHOLD = 120
+SHARD_PAGES = 40
+
+try:
+    import resource  # 仅Unix可用，用于记录进程峰值内存
+except ImportError:
+    resource = None
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def discover_jobs(base_dir, triage_dir=None):
+    """
+    扫描根目录下各文件夹中的PDF和跳过页清单，生成任务列表
+
+    Args:
+        base_dir (str): 包含PDF文件夹的根目录
+        triage_dir (str): Step1的分诊目录（None时不读取分诊清单）
+
+    Returns:
+        list: 任务字典列表，包含 path、kind（pdf/sidecar）、source_pdf、skip_pages、
+            sha256（清单中记录的源哈希，PDF任务为None）、json_path、pages、
+            ocr（分诊清单给出的解析模式，没有清单时为None）、size
+    """
+    jobs = []
+    for folder in sorted(Path(base_dir).iterdir()):
+        if not folder.is_dir():
+            continue
+        for file_path in sorted(folder.iterdir()):
+            name = file_path.name
+            try:
+                if name.endswith(SKIP_PAGES_SUFFIX):
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        sidecar = json.load(f)
+                    source_pdf = sidecar['source_pdf']
+                    skip_pages = sorted(sidecar.get('skip_pages', []))
+                    json_path = folder / f"{Path(source_pdf).stem}_no_toc.json"
+                    job = {'kind': 'sidecar', 'sha256': sidecar.get('sha256')}
+                elif name.lower().endswith('.pdf'):
+                    source_pdf = str(file_path)
+                    skip_pages = []
+                    json_path = folder / f"{file_path.stem}.json"
+                    job = {'kind': 'pdf', 'sha256': None}
+                else:
+                    continue
+
+                # 有分诊清单时直接取页数；分诊为加密或损坏的PDF不派发
+                triage = load_triage(source_pdf, triage_dir)
+                if triage is not None and triage.get('status', 'ok') != 'ok':
+                    print(f"⏭️ 分诊结果为{triage['status']}，跳过: {file_path}")
+                    continue
+                pages = triage_page_count(triage, skip_pages)
+                if pages is None:
+                    with fitz.open(source_pdf) as doc:
+                        total_pages = len(doc)
+                    pages = total_pages - len(set(skip_pages) & set(range(total_pages)))
+                job.update({
+                    'path': str(file_path),
+                    'source_pdf': source_pdf,
+                    'skip_pages': skip_pages,
+                    'json_path': str(json_path),
+                    'pages': pages,
+                    'ocr': triage_ocr_mode(triage, skip_pages),
+                    'size': os.path.getsize(source_pdf)
+                })
+                jobs.append(job)
+            except Exception as e:
+                print(f"❌ 无法读取 {file_path}: {e}")
+    return jobs
+
+
+def _stamp_path(json_path):
+    return f"{json_path}{SOURCE_STAMP_SUFFIX}"
+
+
+def source_fingerprint(job, stamp=None):
+    """
+    源PDF内容哈希
+
+    清单任务直接使用Step1记录的哈希；PDF任务在文件大小和修改时间
+    与源文件戳一致时沿用其中的哈希，否则重新计算。
+    """
+    if job['sha256']:
+        return job['sha256']
+    stat = os.stat(job['source_pdf'])
+    if stamp and stamp.get('size') == stat.st_size and stamp.get('mtime_ns') == stat.st_mtime_ns:
+        return stamp.get('sha256')
+    return file_sha256(job['source_pdf'])
+
+
+def is_up_to_date(job, output_format='json'):
+    """内容列表JSON已存在，且源文件戳中的源哈希、跳过页和输出格式与当前一致"""
+    if not os.path.exists(job['json_path']):
+        return False
+    try:
+        with open(_stamp_path(job['json_path']), 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if stamp.get('skip_pages', []) != job['skip_pages']:
+        return False
+    if stamp.get('output_format', 'json') != output_format:
+        return False
+    return stamp.get('sha256') == source_fingerprint(job, stamp)
+
+
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不可用时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def plan_tasks(jobs, shard_threshold=SHARD_THRESHOLD, shard_pages=SHARD_PAGES):
+    """
+    把任务拆分为工作进程的执行单元
+
+    页数超过shard_threshold的PDF按shard_pages页切分为多个分片，
+    其余PDF整本处理。分片沿用所属任务的调度顺序（大文件优先）。
+
+    Returns:
+        list: 执行单元字典：job（任务下标）、start、end（分片页码区间，整本处理时为None）
+    """
+    tasks = []
+    for job_id, job in enumerate(jobs):
+        if shard_pages > 0 and job['pages'] > shard_threshold:
+            for start in range(0, job['pages'], shard_pages):
+                tasks.append({'job': job_id, 'start': start, 'end': min(start + shard_pages, job['pages'])})
+        else:
+            tasks.append({'job': job_id, 'start': None, 'end': None})
+    return tasks
+
+
+def write_source_stamp(job, output_format='json'):
+    """内容列表生成后写入源文件戳"""
+    stat = os.stat(job['source_pdf'])
+    stamp = {
+        'source_pdf': job['source_pdf'],
+        'sha256': source_fingerprint(job),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'skip_pages': job['skip_pages'],
+        'output_format': output_format,
+        'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(_stamp_path(job['json_path']), 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, ensure_ascii=False, indent=2)
+
+
+# ==================== 工作进程 ====================
+
+# 工作进程的输出基础目录和逐页版面缓存
+_worker_output_base_dir = None
+_worker_layout_cache = None
+# 分配给本工作进程的算子内线程数
+_worker_threads = 1
+
+
+def _init_worker(output_base_dir, layout_cache_dir=None, threads=None):
+    """
+    工作进程初始化：限定算子内线程数，导入magic_pdf，打开版面缓存
+
+    magic_pdf的模型在进程内首次doc_analyze时加载并缓存（单例），
+    工作进程常驻，因此每个进程只加载一次模型。
+    线程数环境变量须在导入torch之前设置；导入后再设置一次torch自身的线程数。
+    """
+    global _worker_output_base_dir, _worker_layout_cache, _worker_threads
+    _worker_output_base_dir = output_base_dir
+    _worker_threads = apply_thread_budget(threads or threads_per_worker(1))
+    import create_jsonandimage  # noqa: F401  提前导入magic_pdf，避免计入第一个PDF的耗时
+    apply_thread_budget(_worker_threads)
+    if layout_cache_dir:
+        from layout_cache import LayoutCache
+        _worker_layout_cache = LayoutCache(layout_cache_dir)
+
+
+def _run_task(task):
+    """
+    在工作进程中执行一个单元，返回耗时记录
+
+    整本处理时直接写出内容列表JSON（不回传内容列表）；
+    分片处理时回传该区间的内容列表，由主进程合并。
+    """
+    from create_jsonandimage import process_pdf, process_virtual_pdf, process_pdf_shard
+
+    job = task['job_data']
+    start_time = time.time()
+    meter = CPUMeter()
+    record = {
+        'job': task['job'],
+        'start': task['start'],
+        'end': task['end'],
+        'worker': os.getpid(),
+        'success': False,
+        'error': '',
+        'image_stats': None
+    }
+    cache_before = _worker_layout_cache.stats() if _worker_layout_cache else None
+    try:
+        if task['start'] is not None:
+            record['content_list'], record['image_stats'] = process_pdf_shard(
+                job['source_pdf'], _worker_output_base_dir, task['start'], task['end'], task['ocr'],
+                skip_pages=job['skip_pages'], output_dir=str(Path(job['json_path']).parent),
+                expected_sha256=job['sha256'], dedup_images=task['dedup_images'],
+                layout_cache=_worker_layout_cache, triage_dir=task['triage_dir'])
+        elif job['kind'] == 'sidecar':
+            result = process_virtual_pdf(job['path'], _worker_output_base_dir, task['output_format'],
+                                         task['dedup_images'], _worker_layout_cache, task['triage_dir'])
+            record['image_stats'] = result['image_stats']
+        else:
+            result = process_pdf(job['path'], _worker_output_base_dir, output_format=task['output_format'],
+                                 dedup_images=task['dedup_images'], layout_cache=_worker_layout_cache,
+                                 triage_dir=task['triage_dir'])
+            record['image_stats'] = result['image_stats']
+        record['success'] = True
+    except Exception as e:
+        record['error'] = str(e)
+        record['traceback'] = traceback.format_exc()
+
+    if cache_before is not None:
+        cache_after = _worker_layout_cache.stats()
+        record['layout_cache'] = {k: cache_after[k] - cache_before[k] for k in cache_after}
+    record['started'] = start_time
+    record['finished'] = time.time()
+    record['cpu_seconds'] = meter.snapshot(_worker_threads)['cpu_seconds']
+    record['threads'] = _worker_threads
+    record['peak_rss_mb'] = _peak_rss_mb()
+    return record
+
+
+def _iter_records(tasks, num_workers, output_base_dir, layout_cache_dir=None, threads=None):
+    """
+    按完成顺序产出执行记录；num_workers <= 1 时在当前进程内顺序处理
+
+    threads为每个工作进程的算子内线程数（由线程预算分配）
+    """
+    if num_workers <= 1:
+        _init_worker(output_base_dir, layout_cache_dir, threads)
+        for task in tasks:
+            yield _run_task(task)
+        return
+
+    # 线程数环境变量在启动进程池前设置，子进程继承
+    apply_thread_budget(threads or threads_per_worker(num_workers))
+    # 使用spawn避免子进程继承父进程的CUDA/模型状态
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=num_workers, initializer=_init_worker,
+                  initargs=(output_base_dir, layout_cache_dir, threads)) as pool:
+        for record in pool.imap_unordered(_run_task, tasks, chunksize=1):
+            yield record
+
+
+def _classify_sharded_jobs(jobs, tasks):
+    """
+    分片任务整本统一判断是否需要OCR模式
+
+    有分诊清单时直接使用清单给出的模式（discover_jobs已按跳过页汇总），不读取PDF；
+    只有没有清单的分片任务才在主进程中判断一次，各分片沿用同一结果。
+    """
+    sharded = {task['job'] for task in tasks if task['start'] is not None and jobs[task['job']]['ocr'] is None}
+    modes = {task['job']: jobs[task['job']]['ocr'] for task in tasks if jobs[task['job']]['ocr'] is not None}
+    if not sharded:
+        return modes
+    from create_jsonandimage import load_pdf_window, is_ocr_pdf
+
+    for job_id in sharded:
+        job = jobs[job_id]
+        try:
+            # 内容哈希由各分片校验
+            modes[job_id] = is_ocr_pdf(load_pdf_window(job['source_pdf'], 0, None, job['skip_pages']))
+        except Exception as e:
+            print(f"⚠️ 无法判断PDF类型，各分片自行判断: {job['path']} - {e}")
+            modes[job_id] = None
+    return modes
+
+
+def _stream_shard(state, job, record, output_format):
+    """
+    分片完成后按页序写出内容列表
+
+    分片完成顺序不定：先完成的靠后分片暂存，等前面的分片到齐后依次写出，
+    写出后即释放该分片的内容列表。任一分片失败后不再写出。
+
+    Args:
+        state (dict): 该任务的分片写出状态（writer、next_start、ready、failed）
+        job (dict): 任务
+        record (dict): 分片的执行记录
+        output_format (str): 内容列表输出格式
+    """
+    if state.get('failed'):
+        return
+    if not record['success']:
+        state['failed'] = True
+        return
+    from create_jsonandimage import ContentListWriter, offset_page_idx, iter_page_groups
+
+    try:
+        if 'writer' not in state:
+            state.update(writer=ContentListWriter(job['json_path'], output_format), next_start=0, ready={})
+        state['ready'][record['start']] = record
+        while state['next_start'] in state['ready']:
+            shard = state['ready'].pop(state['next_start'])
+            for items in iter_page_groups(offset_page_idx(shard.pop('content_list'), shard['start'])):
+                state['writer'].write_page(items)
+            state['next_start'] = shard['end']
+    except Exception as e:
+        state['failed'] = True
+        record['success'] = False
+        record['error'] = str(e)
+        record['traceback'] = traceback.format_exc()
+
+
+def _sum_image_stats(stats_list):
+    """累加图片去重统计（忽略未去重的None）"""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return None
+    images = sum(stats['images'] for stats in stats_list)
+    duplicates = sum(stats['duplicates'] for stats in stats_list)
+    return {
+        'images': images,
+        'duplicates': duplicates,
+        'dedup_ratio': round(duplicates / images, 4) if images else 0.0,
+        'mb_written': round(sum(stats['mb_written'] for stats in stats_list), 2),
+        'mb_saved': round(sum(stats['mb_saved'] for stats in stats_list), 2)
+    }
+
+
+def _sum_cache_stats(stats_list):
+    """累加版面缓存命中统计（未使用缓存时为None）"""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return None
+    return {key: sum(stats[key] for stats in stats_list) for key in ('hits', 'misses')}
+
+
+def _finish_job(job, records, shard_state=None, output_format='json'):
+    """
+    汇总一个任务的全部执行记录；分片任务在此完成内容列表文件
+
+    Returns:
+        dict: 逐PDF耗时日志记录
+    """
+    started = min(r['started'] for r in records)
+    elapsed = max(r['finished'] for r in records) - started
+    cpu_seconds = sum(r.get('cpu_seconds', 0.0) for r in records)
+    busy = sum(r['finished'] - r['started'] for r in records)
+    failed = [r for r in records if not r['success']]
+    writer = (shard_state or {}).get('writer')
+    log_record = {
+        'file': job['path'],
+        'json': job['json_path'],
+        'pages': job['pages'],
+        'shards': len(records) if records[0]['start'] is not None else 0,
+        'workers': sorted({r['worker'] for r in records}),
+        'success': not failed,
+        'error': '; '.join(r['error'] for r in failed),
+        'elapsed': round(elapsed, 2),
+        'pages_per_sec': round(job['pages'] / elapsed, 3) if elapsed > 0 else 0.0,
+        'cpu_seconds': round(cpu_seconds, 2),
+        'utilization': utilization(cpu_seconds, busy, records[0].get('threads', 1)),
+        'peak_rss_mb': max((r['peak_rss_mb'] for r in records if r['peak_rss_mb'] is not None), default=None),
+        'image_stats': _sum_image_stats(r['image_stats'] for r in records),
+        'layout_cache': _sum_cache_stats(r.get('layout_cache') for r in records),
+        'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if failed:
+        if writer:
+            writer.abort()
+        log_record['traceback'] = failed[0].get('traceback', '')
+        return log_record
+
+    try:
+        if writer:
+            writer.close()
+        write_source_stamp(job, output_format)
+    except Exception as e:
+        if writer:
+            writer.abort()
+        log_record['success'] = False
+        log_record['error'] = str(e)
+        log_record['traceback'] = traceback.format_exc()
+    return log_record
+
+
+def run_all(base_dir="E:\\ESGdata\\success", output_base_dir="E:\\ESGdata\\md_jpg",
+            num_workers=2, force=False, shard_threshold=SHARD_THRESHOLD, shard_pages=SHARD_PAGES,
+            output_format='json', dedup_images=True, layout_cache_dir=None, cpu_budget_cores=None,
+            triage_dir=None):
+    """
+    多进程处理根目录下所有文件夹中的PDF和跳过页清单
+
+    Args:
+        base_dir (str): 包含PDF文件夹的根目录
+        output_base_dir (str): 图片输出的基础目录
+        num_workers (int): 工作进程数（<=1 时顺序处理）
+        force (bool): 为True时忽略已有结果全部重新处理
+        shard_threshold (int): 页数超过此值的PDF分片处理
+        shard_pages (int): 每个分片的页数（<=0 时不分片）；单个工作进程的峰值内存
+            随分片页数增长，内存紧张时调小
+        output_format (str): 内容列表输出格式：json（缩进）、compact（单行紧凑）、
+            jsonl（每页一行）；分片任务的各页在分片完成后按页序追加写出
+        dedup_images (bool): 裁剪图片是否按内容哈希去重（重复图片硬链接到共享存储）
+        layout_cache_dir (str): 逐页版面缓存目录，内容未变的页面直接复用上次结果；None时不使用缓存
+        cpu_budget_cores (int): 总核心预算（None时读取ESG_CPU_BUDGET，未设置则为全部可用核心）；
+            每个工作进程的torch/OMP/MKL线程数为预算除以进程数
+        triage_dir (str): Step1的分诊目录，默认为base_dir同级的triage/（Step1输出基础目录下）
+
+    Returns:
+        dict: 运行汇总
+    """
+    triage_dir = triage_dir or default_triage_dir(base_dir)
+    jobs = discover_jobs(base_dir, triage_dir)
+    pending = [job for job in jobs if force or not is_up_to_date(job, output_format)]
+    skipped = len(jobs) - len(pending)
+
+    # 页数多的先处理，避免大文件落在最后拖长整体耗时
+    pending.sort(key=lambda job: (job['pages'], job['size']), reverse=True)
+
+    tasks = plan_tasks(pending, shard_threshold, shard_pages)
+    ocr_modes = _classify_sharded_jobs(pending, tasks)
+    for task in tasks:
+        task['job_data'] = pending[task['job']]
+        task['ocr'] = ocr_modes.get(task['job'])
+        task['output_format'] = output_format
+        task['dedup_images'] = dedup_images
+        task['triage_dir'] = triage_dir
+
+    budget = cpu_budget(cpu_budget_cores)
+    threads = threads_per_worker(num_workers, budget)
+    print(f"发现 {len(jobs)} 个任务，其中 {skipped} 个已是最新，待处理 {len(pending)} 个"
+          f"（共 {len(tasks)} 个执行单元，工作进程数: {max(num_workers, 1)}）")
+    print(f"CPU预算: {budget}核，每个工作进程 {threads} 线程")
+
+    timing_log = os.path.join(base_dir, TIMING_LOG_NAME)
+    success_count = 0
+    failed = []
+    total_pages = 0
+    batch_start = time.time()
+
+    units_left = {}
+    for task in tasks:
+        units_left[task['job']] = units_left.get(task['job'], 0) + 1
+    job_records = {}
+    shard_states = {}
+    image_stats = []
+    cache_stats = []
+    cpu_seconds = 0.0
+    i = 0
+
+    for unit in _iter_records(tasks, num_workers, output_base_dir, layout_cache_dir, threads):
+        job_id = unit['job']
+        job_records.setdefault(job_id, []).append(unit)
+        if unit['start'] is not None:
+            _stream_shard(shard_states.setdefault(job_id, {}), pending[job_id], unit, output_format)
+        units_left[job_id] -= 1
+        if units_left[job_id] > 0:
+            continue
+
+        # 该PDF的全部分片都已完成
+        i += 1
+        record = _finish_job(pending[job_id], job_records.pop(job_id),
+                             shard_states.pop(job_id, None), output_format)
+        cpu_seconds += record['cpu_seconds']
+        with open(timing_log, 'a', encoding='utf-8') as f:
+            log_record = {k: v for k, v in record.items() if k != 'traceback'}
+            f.write(json.dumps(log_record, ensure_ascii=False) + "\n")
+
+        if record['success']:
+            success_count += 1
+            total_pages += record['pages']
+            image_stats.append(record['image_stats'])
+            cache_stats.append(record['layout_cache'])
+            print(f"[{i}/{len(pending)}] ✅ {record['file']} - {record['pages']}页, "
+                  f"{record['elapsed']:.1f}秒, {record['pages_per_sec']:.2f}页/秒")
+        else:
+            failed.append(record['file'])
+            print(f"[{i}/{len(pending)}] ❌ {record['file']} - {record['error']}")
+            print(f"错误详情: {record.get('traceback', '')}")
+
+    wall_time = time.time() - batch_start
+    summary = {
+        'total': len(jobs),
+        'skipped': skipped,
+        'success': success_count,
+        'failed': failed,
+        'pages': total_pages,
+        'image_stats': _sum_image_stats(image_stats),
+        'layout_cache': _sum_cache_stats(cache_stats),
+        'wall_time_seconds': round(wall_time, 2),
+        'pages_per_sec': round(total_pages / wall_time, 3) if wall_time > 0 else 0.0,
+        'cpu_budget': {
+            'cores': budget,
+            'threads_per_worker': threads,
+            'cpu_seconds': round(cpu_seconds, 2),
+            'utilization': utilization(cpu_seconds, wall_time, budget)
+        }
+    }
+
+    print("=" * 50)
+    print(f"完成: 成功 {success_count} 个，失败 {len(failed)} 个，跳过 {skipped} 个")
+    print(f"总页数 {total_pages}，总耗时 {wall_time:.1f}秒，整体 {summary['pages_per_sec']:.2f}页/秒")
+    print(f"CPU预算 {budget}核（每进程 {threads} 线程），CPU时间 {cpu_seconds:.1f}秒，"
+          f"利用率 {summary['cpu_budget']['utilization']:.1%}")
+    if summary['image_stats']:
+        print(f"图片去重: {summary['image_stats']['duplicates']}/{summary['image_stats']['images']} 张重复，"
+              f"去重率 {summary['image_stats']['dedup_ratio']:.1%}，节省 {summary['image_stats']['mb_saved']} MB")
+    if summary['layout_cache']:
+        print(f"版面缓存: 命中 {summary['layout_cache']['hits']} 页，"
+              f"分析 {summary['layout_cache']['misses']} 页")
+    print(f"耗时日志: {timing_log}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程批量版面分析（生成JSON和图片）")
+    parser.add_argument('--base-dir', default="E:\\ESGdata\\success", help="包含PDF文件夹的根目录")
+    parser.add_argument('--output-dir', default="E:\\ESGdata\\md_jpg", help="图片输出的基础目录")
+    parser.add_argument('--workers', type=int, default=2, help="工作进程数（每个进程各加载一份模型）")
+    parser.add_argument('--force', action='store_true', help="忽略已有结果全部重新处理")
+    parser.add_argument('--shard-threshold', type=int, default=SHARD_THRESHOLD, help="页数超过此值的PDF分片处理")
+    parser.add_argument('--shard-pages', type=int, default=SHARD_PAGES,
+                        help="每个分片的页数（<=0 不分片）；内存紧张时调小")
+    parser.add_argument('--output-format', choices=['json', 'compact', 'jsonl'], default='json',
+                        help="内容列表格式：json（缩进）、compact（单行紧凑）、jsonl（每页一行）")
+    parser.add_argument('--no-image-dedup', action='store_true',
+                        help="不按内容哈希去重，每张裁剪图片单独保存")
+    parser.add_argument('--layout-cache-dir', default=None,
+                        help="逐页版面缓存目录（默认为输出目录下的layout_cache）")
+    parser.add_argument('--no-layout-cache', action='store_true', help="不使用逐页版面缓存")
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                        help="总核心预算（默认读取ESG_CPU_BUDGET，未设置时为全部可用核心），按工作进程数平均分配线程")
+    parser.add_argument('--triage-dir', default=None,
+                        help="Step1的分诊目录（默认为根目录同级的triage，即Step1输出基础目录下）")
+    args = parser.parse_args()
+
+    layout_cache_dir = None
+    if not args.no_layout_cache:
+        layout_cache_dir = args.layout_cache_dir or os.path.join(args.output_dir, "layout_cache")
+
+    run_all(args.base_dir, args.output_dir, args.workers, args.force,
+            args.shard_threshold, args.shard_pages, args.output_format, not args.no_image_dedup,
+            layout_cache_dir, args.cpu_budget, args.triage_dir)
+
+
+if __name__ == "__main__":
+    main()
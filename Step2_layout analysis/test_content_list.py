@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容列表写出测试
+校验三种输出格式经预处理模块的load_content_list读回后与原内容列表一致（含空页、只有一页的JSONL），
+放弃写出不留临时文件，以及分片乱序完成时仍按页序写出
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("magic_pdf")
+
+from create_jsonandimage import (CONTENT_LIST_FORMATS, ContentListWriter, iter_page_groups,  # noqa: E402
+                                 write_content_list)
+from run_parallel_layout import _stream_shard  # noqa: E402
+
+# 读取端在analysis_report的预处理模块中（utils.py只依赖标准库，不经过包初始化导入）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "analysis_report", "preprocess_module"))
+from utils import load_content_list  # noqa: E402
+
+CONTENT_LIST = [
+    {'type': 'text', 'text': "关于本报告", 'text_level': 1, 'page_idx': 0},
+    {'type': 'text', 'text': "本报告涵盖2023年1月1日至12月31日。", 'page_idx': 0},
+    {'type': 'image', 'img_path': "images/abc.jpg", 'img_caption': [], 'page_idx': 1},
+    {'type': 'table', 'table_body': "<table><tr><td>1</td></tr></table>", 'page_idx': 3},
+]
+
+
+@pytest.mark.parametrize("output_format", CONTENT_LIST_FORMATS)
+def test_round_trip(tmp_path, output_format):
+    path = str(tmp_path / "report.json")
+    write_content_list(CONTENT_LIST, path, output_format)
+    assert load_content_list(path) == CONTENT_LIST
+    assert os.listdir(tmp_path) == ["report.json"]
+
+
+@pytest.mark.parametrize("output_format", CONTENT_LIST_FORMATS)
+def test_empty_content_list(tmp_path, output_format):
+    path = str(tmp_path / "report.json")
+    write_content_list([], path, output_format)
+    assert load_content_list(path) == []
+
+
+@pytest.mark.parametrize("output_format", CONTENT_LIST_FORMATS)
+def test_empty_pages(tmp_path, output_format):
+    path = str(tmp_path / "report.json")
+    with ContentListWriter(path, output_format) as writer:
+        writer.write_page([])
+        writer.write_page(CONTENT_LIST[:2])
+        writer.write_page([])
+        writer.write_page(CONTENT_LIST[2:])
+    assert load_content_list(path) == CONTENT_LIST
+
+
+def test_single_page_jsonl(tmp_path):
+    # 只有一页时整个文件就是一个合法的JSON数组，按JSON读取得到的也是该页的条目
+    path = str(tmp_path / "report.json")
+    write_content_list(CONTENT_LIST[:2], path, 'jsonl')
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read().count("\n") == 1
+    assert load_content_list(path) == CONTENT_LIST[:2]
+
+
+@pytest.mark.parametrize("output_format", CONTENT_LIST_FORMATS)
+def test_abort_leaves_no_tmp(tmp_path, output_format):
+    path = str(tmp_path / "report.json")
+    write_content_list(CONTENT_LIST[:1], path, output_format)
+
+    writer = ContentListWriter(path, output_format)
+    writer.write_page(CONTENT_LIST[2:])
+    writer.abort()
+    assert os.listdir(tmp_path) == ["report.json"]
+    # 已有的内容列表不受影响
+    assert load_content_list(path) == CONTENT_LIST[:1]
+
+
+def test_writer_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        ContentListWriter(str(tmp_path / "report.json"), 'yaml')
+
+
+def shard_record(start, end, pages, success=True):
+    """分片执行记录：pages为该分片内各页（从0编号）的条目数"""
+    content_list = [{'type': 'text', 'text': f"{start + n}-{k}", 'page_idx': n}
+                    for n, count in enumerate(pages) for k in range(count)]
+    return {'start': start, 'end': end, 'success': success, 'error': '', 'content_list': content_list}
+
+
+def test_stream_shards_out_of_order(tmp_path):
+    job = {'json_path': str(tmp_path / "report.json")}
+    state = {}
+    _stream_shard(state, job, shard_record(4, 6, [1, 2]), 'jsonl')
+    _stream_shard(state, job, shard_record(2, 4, [0, 1]), 'jsonl')
+    # 第0个分片未完成，后面的分片暂存不写出
+    assert state['writer'].items_written == 0
+    assert sorted(state['ready']) == [2, 4]
+
+    _stream_shard(state, job, shard_record(0, 2, [2, 1]), 'jsonl')
+    assert state['next_start'] == 6 and state['ready'] == {}
+    state['writer'].close()
+
+    content_list = load_content_list(job['json_path'])
+    assert [item['page_idx'] for item in content_list] == [0, 0, 1, 3, 4, 5, 5]
+    assert [item['text'] for item in content_list] == ["0-0", "0-1", "1-0", "3-0", "4-0", "5-0", "5-1"]
+    assert [len(items) for items in iter_page_groups(content_list)] == [2, 1, 1, 1, 2]
+
+
+def test_stream_stops_after_failed_shard(tmp_path):
+    job = {'json_path': str(tmp_path / "report.json")}
+    state = {}
+    _stream_shard(state, job, shard_record(0, 2, [1, 1]), 'compact')
+    _stream_shard(state, job, shard_record(2, 4, [1, 1], success=False), 'compact')
+    _stream_shard(state, job, shard_record(4, 6, [1, 1]), 'compact')
+    assert state['failed']
+    assert state['writer'].items_written == 2
+    state['writer'].abort()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片存储测试
+校验多个写入器（同一报告的并发分片）同时写入相同图片时不会失败、硬链接不可用时的复制回退，
+以及图片沿用magic_pdf的文件名、同名冲突时才改按内容哈希命名
+"""
+
+import errno
+import hashlib
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("magic_pdf")
+
+import image_store  # noqa: E402
+from image_store import (ContentAddressedImageWriter, ReportImageWriter, _link_or_copy,  # noqa: E402
+                         content_image_name, link_stored_image, store_image_file)
+
+LOGO = b"\x89PNG\r\n\x1a\n" + b"logo" * 512
+BADGE = b"\x89PNG\r\n\x1a\n" + b"badge" * 512
+
+
+def test_link_target_created_concurrently(tmp_path, monkeypatch):
+    blob = tmp_path / "blob.png"
+    blob.write_bytes(LOGO)
+    target = tmp_path / "report" / "logo.png"
+    target.parent.mkdir()
+
+    real_link = os.link
+
+    def racing_link(src, dst):
+        # 另一个分片在检查与链接之间抢先链接了同一张图片
+        if not os.path.exists(dst):
+            real_link(src, dst)
+        real_link(src, dst)
+
+    monkeypatch.setattr(image_store.os, "link", racing_link)
+    _link_or_copy(str(blob), str(target))
+    assert os.path.samefile(blob, target)
+
+
+def test_link_fallback_copies_atomically(tmp_path, monkeypatch):
+    blob = tmp_path / "blob.png"
+    blob.write_bytes(LOGO)
+    target = tmp_path / "logo.png"
+
+    def no_link(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(image_store.os, "link", no_link)
+    _link_or_copy(str(blob), str(target))
+    _link_or_copy(str(blob), str(target))
+    assert target.read_bytes() == LOGO
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["blob.png", "logo.png"]
+
+
+def test_link_other_errors_propagate(tmp_path, monkeypatch):
+    blob = tmp_path / "blob.png"
+    blob.write_bytes(LOGO)
+
+    def disk_full(src, dst):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(image_store.os, "link", disk_full)
+    with pytest.raises(OSError):
+        _link_or_copy(str(blob), str(tmp_path / "logo.png"))
+
+
+def test_two_writers_store_same_image(tmp_path):
+    report_dir = tmp_path / "md_jpg" / "report"
+    writers = [ContentAddressedImageWriter(str(report_dir)) for _ in range(2)]
+    barrier = threading.Barrier(len(writers))
+    errors = []
+
+    def shard(writer):
+        try:
+            barrier.wait()
+            for n in range(200):
+                writer.write(f"crop_{n % 5}.jpg", LOGO)
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=shard, args=(writer,)) for writer in writers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # 同一内容的同名文件不改名，沿用magic_pdf的文件名
+    assert sorted(os.listdir(report_dir)) == [f"crop_{n}.jpg" for n in range(5)]
+    assert len({os.stat(report_dir / f"crop_{n}.jpg").st_ino for n in range(5)}) == 1
+    assert all(not w.renamed for w in writers)
+    stored = [f for _, _, names in os.walk(tmp_path / "md_jpg" / ".image_store") for f in names]
+    assert len(stored) == 1
+    assert sum(w.stats()['images'] for w in writers) == 400
+
+
+@pytest.mark.parametrize("writer_class", [ReportImageWriter, ContentAddressedImageWriter])
+def test_name_collision_renames_later_image(tmp_path, writer_class):
+    report_dir = tmp_path / "md_jpg" / "report"
+    first, second = writer_class(str(report_dir)), writer_class(str(report_dir))
+    # 两个分片的第0页同一位置各有一张图片，magic_pdf给出相同的文件名
+    first.write("abc.jpg", LOGO)
+    second.write("abc.jpg", BADGE)
+
+    badge_name = content_image_name(hashlib.sha256(BADGE).hexdigest(), "abc.jpg")
+    assert (report_dir / "abc.jpg").read_bytes() == LOGO
+    assert (report_dir / badge_name).read_bytes() == BADGE
+    assert first.renamed == {} and second.renamed == {"abc.jpg": badge_name}
+
+    content_list = [{'type': 'image', 'img_path': "report/abc.jpg", 'page_idx': 0}, {'type': 'text', 'text': "x"}]
+    second.rename_image_paths(content_list)
+    assert content_list[0]['img_path'] == f"report/{badge_name}"
+    assert second.renamed == {}
+    assert not [name for name in os.listdir(report_dir) if name.endswith(".tmp")]
+
+
+def test_restore_keeps_name_unless_taken(tmp_path):
+    report_dir = tmp_path / "md_jpg" / "report"
+    report_dir.mkdir(parents=True)
+    store_dir = str(tmp_path / "md_jpg" / ".image_store")
+    source = tmp_path / "old.jpg"
+    source.write_bytes(LOGO)
+    blob_name = store_image_file(str(source), store_dir)
+
+    restored = link_stored_image(blob_name, str(report_dir / "abc.jpg"), store_dir)
+    assert restored == str(report_dir / "abc.jpg")
+    # 同名文件已是另一张图片（按其他页码编号的分析写入）时不覆盖
+    (report_dir / "def.jpg").write_bytes(BADGE)
+    restored = link_stored_image(blob_name, str(report_dir / "def.jpg"), store_dir)
+    assert os.path.basename(restored) == os.path.basename(blob_name)
+    assert (report_dir / "def.jpg").read_bytes() == BADGE
+    assert link_stored_image("00/missing.jpg", str(report_dir / "x.jpg"), store_dir) is None
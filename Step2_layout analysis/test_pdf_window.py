@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片读取测试
+校验按跳过页过滤后的页序读取页码区间，与先整本过滤再截取的结果一致，以及内容哈希校验
+"""
+
+import fitz
+import pytest
+
+pytest.importorskip("magic_pdf")
+
+from create_jsonandimage import file_sha256, load_pdf_bytes, load_pdf_window  # noqa: E402
+
+SKIP_PAGES = [0, 3, 4, 9]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "report.pdf"
+    with fitz.open() as doc:
+        for n in range(12):
+            doc.new_page().insert_text((72, 72), f"page {n}")
+        doc.save(str(path))
+    return str(path)
+
+
+def page_texts(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+def test_windows_match_filtered_pdf(pdf_path):
+    expected = page_texts(load_pdf_bytes(pdf_path, SKIP_PAGES))
+    windows = []
+    for start in range(0, len(expected), 3):
+        windows.extend(page_texts(load_pdf_window(pdf_path, start, start + 3, SKIP_PAGES)))
+    assert windows == expected
+    assert page_texts(load_pdf_window(pdf_path, 0, None, SKIP_PAGES)) == expected
+
+
+def test_window_without_skip_pages(pdf_path):
+    assert page_texts(load_pdf_window(pdf_path, 10, 20)) == ["page 10", "page 11"]
+
+
+def test_window_checks_source_hash(pdf_path):
+    assert page_texts(load_pdf_window(pdf_path, 0, 1, SKIP_PAGES, file_sha256(pdf_path))) == ["page 1"]
+    with pytest.raises(ValueError):
+        load_pdf_window(pdf_path, 0, 1, SKIP_PAGES, "0" * 64)
@@ -0,0 +1,99 @@
+#读取Step1入库分诊写在分诊目录（Step1输出基础目录下的triage/）中的分诊清单，据此选择OCR/文本解析模式，不再调用ds.classify()
+
+import os
+import json
+import hashlib
+
+# 以下常量和文件命名与Step1的pdf_triage一致
+TRIAGE_DIR_NAME = "triage"
+TRIAGE_SUFFIX = "_triage.json"
+TRIAGE_VERSION = 1
+# 需要OCR才能得到文字的页面类别：G 乱码文字层、S 扫描页、V 无文字层的矢量页；B 为空白页
+OCR_PAGE_KINDS = ('G', 'S', 'V')
+OCR_PAGE_RATIO = 0.2
+
+
+def default_triage_dir(base_dir):
+    """
+    默认分诊目录：Step2的根目录是Step1输出基础目录下的success/，分诊目录是其同级的triage/
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(str(base_dir))), TRIAGE_DIR_NAME)
+
+
+def sidecar_stem(pdf_file_path):
+    """分诊目录中的文件名前缀：PDF文件名 + 绝对路径哈希"""
+    path = os.path.normcase(os.path.realpath(str(pdf_file_path)))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]}"
+
+
+def triage_path(pdf_file_path, triage_dir):
+    """PDF在分诊目录中对应的分诊清单路径"""
+    return os.path.join(str(triage_dir), f"{sidecar_stem(pdf_file_path)}{TRIAGE_SUFFIX}")
+
+
+def load_triage(pdf_file_path, triage_dir):
+    """
+    读取PDF的分诊清单
+
+    Args:
+        pdf_file_path (str): PDF路径
+        triage_dir (str): 分诊目录（None时不读取）
+
+    Returns:
+        dict: 分诊记录；清单不存在、版本不符或文件大小/修改时间与PDF不一致时返回None
+    """
+    if not triage_dir:
+        return None
+    path = triage_path(pdf_file_path, triage_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            triage = json.load(f)
+        stat = os.stat(pdf_file_path)
+    except (OSError, ValueError):
+        return None
+    if triage.get('version') != TRIAGE_VERSION:
+        return None
+    if triage.get('size') != stat.st_size or triage.get('mtime_ns') != stat.st_mtime_ns:
+        return None
+    return triage
+
+
+def check_triage(triage, pdf_file_path):
+    """分诊为加密或损坏的PDF直接报错，不进入版面分析"""
+    if triage is not None and triage.get('status', 'ok') != 'ok':
+        raise ValueError(f"分诊结果为{triage['status']}，跳过: {pdf_file_path} - {triage.get('error', '')}")
+
+
+def triage_ocr_mode(triage, skip_pages=None):
+    """
+    按分诊清单判断是否使用OCR模式
+
+    去掉skip_pages后按逐页类别重新汇总：非空白页中需要OCR的页面占比超过OCR_PAGE_RATIO时用OCR模式。
+
+    Args:
+        triage (dict): 分诊记录（可为None）
+        skip_pages (list): 版面分析前过滤掉的页码
+
+    Returns:
+        bool: 是否使用OCR模式；没有可用的分诊记录时返回None（由magic_pdf自行判断）
+    """
+    if triage is None or triage.get('status', 'ok') != 'ok' or 'pages' not in triage:
+        return None
+    if not skip_pages:
+        return triage['parse_method'] == 'ocr'
+    skip = set(skip_pages)
+    content = [k for n, k in enumerate(triage['pages']) if n not in skip and k != 'B']
+    if not content:
+        return True
+    return sum(1 for k in content if k in OCR_PAGE_KINDS) / len(content) > OCR_PAGE_RATIO
+
+
+def triage_page_count(triage, skip_pages=None):
+    """分诊记录中的页数（去掉skip_pages后），没有记录时返回None"""
+    if triage is None or 'page_count' not in triage:
+        return None
+    total = triage['page_count']
+    return total - len(set(skip_pages or []) & set(range(total)))
@@ -30,7 +30,7 @@ from .pipeline import PreprocessPipeline, BatchPreprocessPipeline
 from .config import PreprocessConfig
 
 # 导入工具函数
-from .utils import setup_logging, validate_paths
+from .utils import setup_logging, validate_paths, load_content_list
 
 # 定义公共接口
 __all__ = [
@@ -41,7 +41,8 @@ __all__ = [
     'BatchPreprocessPipeline',
     'PreprocessConfig',
     'setup_logging',
-    'validate_paths'
+    'validate_paths',
+    'load_content_list'
 ]
 
 # 版本兼容性检查
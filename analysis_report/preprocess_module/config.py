@@ -47,6 +47,7 @@ class PreprocessConfig:
     # === 性能配置 ===
     enable_parallel_processing: bool = False
     max_workers: int = 4
+    cpu_budget: int = 0  # 总核心预算（0表示读取ESG_CPU_BUDGET环境变量，未设置时为全部可用核心）
     
     # === 消融实验配置 ===
     experiment_name: str = "default"
@@ -64,8 +64,8 @@ def json_to_md(objs, output_md_path):
 
 def main():
     # 直接使用硬编码路径
-    with open(INPUT_JSON, 'r', encoding='utf-8') as f:
-        objs = json.load(f)
+    from utils import load_content_list  # 兼容紧凑JSON和按页分行的JSONL
+    objs = load_content_list(INPUT_JSON)
     json_to_md(objs, OUTPUT_MD)
 
 
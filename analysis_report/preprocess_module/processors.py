@@ -10,16 +10,23 @@
 import json
 import re
 import os
+import sys
 import logging
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 import pytesseract
 from PIL import Image
 
 from .config import PreprocessConfig
-from .utils import safe_file_operation, get_file_stats, backup_file, timing_context
+from .utils import safe_file_operation, get_file_stats, backup_file, timing_context, load_content_list
+
+# 线程预算模块与Step1、Step2共用（位于Step1目录）
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "Step1_ocr_detect_ToC"))
+from thread_budget import CPUMeter, apply_thread_budget, cpu_budget, threads_per_worker
 
 
 class BaseProcessor(ABC):
@@ -74,9 +81,8 @@ class JsonToMarkdownProcessor(BaseProcessor):
             处理结果字典
         """
         with timing_context(self.logger, f"JSON转Markdown: {input_json_path}"):
-            # 读取JSON文件
-            with open(input_json_path, 'r', encoding='utf-8') as f:
-                objs = json.load(f)
+            # 读取JSON文件（兼容紧凑JSON和按页分行的JSONL）
+            objs = load_content_list(input_json_path)
             
             # 转换为Markdown
             md_lines = self._convert_objects_to_markdown(objs)
@@ -288,9 +294,22 @@ class ImageTextDetector(BaseProcessor):
         super().__init__(config, logger)
         self.logger.info("初始化图片文本检测处理器")
         
+        # 检测结果按文件inode缓存：Step2按内容去重后，重复图片是同一文件的硬链接
+        self._text_cache = {}
+        
         # 设置Tesseract路径
         if self.config.tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = self.config.tesseract_path
+        
+        # 单个文件内的图片由max_workers个线程并发检测（Tesseract在子进程中运行，不受GIL限制）
+        self.pool_size = max(1, self.config.max_workers)
+        
+        # 线程预算：同时运行的Tesseract进程数 = 文件内并发数（并行处理多个文件时再乘以文件并发数），
+        # 每个进程分到预算的一份（Tesseract子进程继承OMP_THREAD_LIMIT等环境变量）
+        concurrency = self.pool_size * (self.config.max_workers if self.config.enable_parallel_processing else 1)
+        self.tesseract_threads = apply_thread_budget(
+            threads_per_worker(concurrency, cpu_budget(self.config.cpu_budget or None)))
+        self.logger.info(f"Tesseract线程数: {self.tesseract_threads}（并发{concurrency}）")
     
     @safe_file_operation("图片文本检测")
     def process(self, md_file_path: str, images_dir: str) -> Dict[str, Any]:
@@ -305,6 +324,7 @@ class ImageTextDetector(BaseProcessor):
             处理结果字典
         """
         with timing_context(self.logger, f"图片文本检测: {md_file_path}"):
+            meter = CPUMeter()
             # 读取文件内容
             with open(md_file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
@@ -315,34 +335,44 @@ class ImageTextDetector(BaseProcessor):
             image_pattern = r'!\[.*?\]\((.+)\)'
             matches = list(re.finditer(image_pattern, content))
             
-            links_to_remove = []
             processed_images = 0
             removed_images = 0
             
             self.logger.info(f"找到 {len(matches)} 个图片链接")
             
-            # 检查每个图片链接
+            # 确定每个链接对应的图片；同一文件（含硬链接）只检测一次
+            keys = []
+            pending = {}
             for match in matches:
-                image_path = match.group(1)
-                image_filename = os.path.basename(image_path)
+                image_filename = os.path.basename(match.group(1))
                 full_image_path = Path(images_dir) / image_filename
                 
-                self.logger.debug(f"处理图片: {image_filename}")
-                processed_images += 1
-                
                 if full_image_path.exists():
-                    has_text = self._detect_text_in_image(str(full_image_path))
-                    
-                    if not has_text:
-                        links_to_remove.append(match.group(0))
-                        removed_images += 1
-                        self.logger.info(f"移除无文本图片: {image_filename}")
+                    key = self._cache_key(full_image_path)
+                    keys.append(key)
+                    if key in self._text_cache:
+                        self.logger.debug(f"重复图片，沿用检测结果: {image_filename}")
+                    else:
+                        pending.setdefault(key, str(full_image_path))
                 else:
+                    keys.append(None)
                     self.logger.warning(f"图片文件不存在: {full_image_path}")
             
-            # 从Markdown文件中删除无文本图片链接
-            for link in links_to_remove:
-                content = content.replace(link, '')
+            self._detect_pending(pending)
+            
+            # 按文档顺序汇总检测结果，一次性删除无文本图片链接
+            pieces = []
+            last_end = 0
+            for match, key in zip(matches, keys):
+                processed_images += 1
+                if key is None or self._text_cache[key]:
+                    continue
+                pieces.append(content[last_end:match.start()])
+                last_end = match.end()
+                removed_images += 1
+                self.logger.info(f"移除无文本图片: {os.path.basename(match.group(1))}")
+            pieces.append(content[last_end:])
+            content = ''.join(pieces)
             
             # 备份原文件
             backup_path = backup_file(md_file_path)
@@ -356,6 +386,8 @@ class ImageTextDetector(BaseProcessor):
             # 更新统计信息
             self.stats["processed_files"] += 1
             self.stats["successful_operations"] += processed_images
+            # CPU时间为进程级统计（含Tesseract子进程）；多个文件并行处理时包含其他文件的开销
+            cpu = meter.snapshot(self.tesseract_threads)
             
             result = {
                 "status": "success",
@@ -366,12 +398,43 @@ class ImageTextDetector(BaseProcessor):
                 "images_kept": processed_images - removed_images,
                 "content_size_before": len(original_content),
                 "content_size_after": len(content),
-                "content_changed": original_content != content
+                "content_changed": original_content != content,
+                "tesseract_threads": self.tesseract_threads,
+                "cpu_seconds": cpu["cpu_seconds"],
+                "cpu_utilization": cpu["utilization"]
             }
             
-            self.logger.info(f"检测完成: 处理{processed_images}张图片，移除{removed_images}张无文本图片")
+            self.logger.info(f"检测完成: 处理{processed_images}张图片，移除{removed_images}张无文本图片，"
+                             f"CPU利用率{cpu['utilization']:.1%}")
             return result
     
+    @staticmethod
+    def _cache_key(image_path: Path):
+        """检测结果的缓存键：文件inode（硬链接共享），文件系统不提供inode时用路径"""
+        stat = image_path.stat()
+        if not stat.st_ino:
+            return str(image_path)
+        return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    
+    def _detect_pending(self, pending: Dict[Any, str]):
+        """
+        检测尚无结果的图片并写入缓存
+        
+        Args:
+            pending: 缓存键 -> 图片路径
+        """
+        if not pending:
+            return
+        keys = list(pending)
+        paths = [pending[key] for key in keys]
+        if self.pool_size <= 1 or len(paths) == 1:
+            verdicts = [self._detect_text_in_image(path) for path in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.pool_size, len(paths))) as executor:
+                verdicts = list(executor.map(self._detect_text_in_image, paths))
+        self._text_cache.update(zip(keys, verdicts))
+        self.logger.info(f"Tesseract检测 {len(paths)} 张图片（并发{min(self.pool_size, len(paths))}）")
+    
     def _detect_text_in_image(self, image_path: str) -> bool:
         """检测图片中是否包含文本"""
         try:
@@ -9,6 +9,7 @@
 """
 
 import os
+import json
 import logging
 import time
 import shutil
@@ -204,6 +205,49 @@ def backup_file(file_path: str, backup_suffix: str = ".backup") -> Optional[str]
         return None
 
 
+def load_content_list(file_path: str) -> List[Dict[str, Any]]:
+    """
+    读取Step2生成的内容列表
+    
+    兼容缩进/紧凑JSON（整个文件是一个数组）和按页分行的JSONL
+    （每行是一页条目组成的数组，中间页可以为空行）。
+    
+    Args:
+        file_path: 内容列表文件路径
+    
+    Returns:
+        按页序展开的条目列表
+    
+    Raises:
+        json.JSONDecodeError: 文件既不是合法JSON也不是合法JSONL
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    
+    # 没有任何页面内容的JSONL为空文件
+    if not text.strip():
+        return []
+    
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # 多行且各行独立成数组：按页分行的JSONL
+        if '\n' not in text.strip():
+            raise
+    
+    objs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        page_items = json.loads(line)
+        if isinstance(page_items, list):
+            objs.extend(page_items)
+        else:
+            objs.append(page_items)
+    return objs
+
+
 def count_lines(file_path: str) -> int:
     """
     统计文件行数
@@ -21,7 +21,7 @@ import glob
 import sys
 import tempfile
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from structure_enhancement_module import TitleExtractor, StructureEnhancementConfig
 
 # ==================== 配置区域 ====================
@@ -81,8 +81,12 @@ def discover_processing_folders(base_path: str) -> List[Dict[str, str]]:
         ]
         
         toc_image_path = None
-        # 首先尝试优先候选者
-        for candidate in toc_image_candidates:
+        # Step1导出的目录页图像（旁边可能有文字层标题清单，可免去VLM调用）
+        step1_images = sorted(subfolder.glob("toc_page_*.jpg"))
+        if step1_images:
+            toc_image_path = str(step1_images[0])
+        # 其次尝试优先候选者
+        for candidate in ([] if toc_image_path else toc_image_candidates):
             candidate_path = subfolder / candidate
             if candidate_path.exists():
                 toc_image_path = str(candidate_path)
@@ -95,11 +99,15 @@ def discover_processing_folders(base_path: str) -> List[Dict[str, str]]:
         else:
             print(f"📸 使用优先JPG文件: {Path(toc_image_path).name}")
         
+        # Step1导出的标题字号线索（可选）
+        heading_hints = sorted(subfolder.glob("*_headings.json"))
+        
         folder_info = {
             "folder_name": subfolder.name,
             "folder_path": str(subfolder),
             "md_file": str(md_files[0]),  # 使用第一个找到的预处理文件
             "toc_image": toc_image_path,
+            "heading_hints": str(heading_hints[0]) if heading_hints else None,
             "output_dir": str(subfolder)
         }
         
@@ -153,7 +161,8 @@ def process_single_folder(folder_info: Dict[str, str]) -> None:
             print(f"📁 失败的文件夹: {folder_name}")
             sys.exit(1)
         
-        print(f"✅ 标题提取成功，共提取 {len(titles_result.get('titles_data', []))} 个标题")
+        source_label = "文字层解析" if titles_result.get('source') == 'text_layer' else "VLM"
+        print(f"✅ 标题提取成功（{source_label}），共提取 {len(titles_result.get('titles_data', []))} 个标题")
         print(f"📄 titles.json文件已生成: {titles_file}")
         
         # 显示提取的标题预览
@@ -192,7 +201,7 @@ def process_single_folder(folder_info: Dict[str, str]) -> None:
         output_md_path = os.path.join(output_dir, "aligned_output.md")
         
         # 如果对齐失败，函数内部会终止程序
-        align_titles_with_original_logic(content, titles_file, output_md_path)
+        align_titles_with_original_logic(content, titles_file, output_md_path, folder_info.get("heading_hints"))
         
         print(f"✅ {folder_name} 处理完成！")
             
@@ -206,7 +215,8 @@ def process_single_folder(folder_info: Dict[str, str]) -> None:
 
 # ==================== 导入原始align_title逻辑 ====================
 
-def align_titles_with_original_logic(content: str, titles_json_path: str, output_md_path: str) -> None:
+def align_titles_with_original_logic(content: str, titles_json_path: str, output_md_path: str,
+                                     heading_hints_path: Optional[str] = None) -> None:
     """使用原始align_title.py的完整逻辑进行标题对齐（使用DeepSeek R1架构）
     
     Note:
@@ -232,6 +242,8 @@ def align_titles_with_original_logic(content: str, titles_json_path: str, output
     print(f"📄 输入内容长度: {len(content)} 字符")
     print(f"📁 标题JSON文件: {titles_json_path}")
     print(f"📁 输出文件: {output_md_path}")
+    if heading_hints_path:
+        print(f"🔤 标题字号线索: {heading_hints_path}")
     print(f"🔑 DeepSeek R1 API Key: {DEEPSEEK_R1_API_KEY[:20]}...")
     
     print("\n" + "-" * 40)
@@ -239,7 +251,7 @@ def align_titles_with_original_logic(content: str, titles_json_path: str, output
     print("-" * 40)
     
     # 执行标题对齐 - 这包含了标准匹配、模糊匹配等所有核心逻辑
-    success, unmatched_titles = align_titles(content, titles_json_path, output_md_path)
+    success, unmatched_titles = align_titles(content, titles_json_path, output_md_path, heading_hints_path)
     
     if success:
         print("\n" + "=" * 60)
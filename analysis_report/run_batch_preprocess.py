@@ -60,6 +60,9 @@ config = get_config_for_environment(ENVIRONMENT)
 
 # ==================== 主程序 ====================
 
+# 与内容列表JSON放在同一目录、但不是ESG报告内容的文件（如Step1写出的跳过页清单、分诊清单）
+NON_CONTENT_JSON_SUFFIXES = ('_skip_pages.json', '_triage.json')
+
 def discover_json_files(directory: str, pattern: str = "**/*.json") -> List[str]:
     """
     自动发现目录中的JSON文件
@@ -81,6 +84,8 @@ def discover_json_files(directory: str, pattern: str = "**/*.json") -> List[str]
         # 使用glob模式搜索文件
         for file_path in search_path.glob(pattern):
             if file_path.is_file() and file_path.suffix.lower() == '.json':
+                if file_path.name.endswith(NON_CONTENT_JSON_SUFFIXES):
+                    continue
                 json_files.append(str(file_path))
         
         print(f"📁 在目录 {directory} 中发现 {len(json_files)} 个JSON文件")
@@ -130,7 +135,7 @@ def discover_subfolder_json_files(base_directory: str, exclude_patterns: List[st
             # 搜索该文件夹中的JSON文件
             json_files = []
             for json_file in subfolder.glob("*.json"):
-                if json_file.is_file():
+                if json_file.is_file() and not json_file.name.endswith(NON_CONTENT_JSON_SUFFIXES):
                     json_files.append(str(json_file))
             
             if json_files:
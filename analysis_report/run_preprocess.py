@@ -13,7 +13,7 @@ import os
 import json
 import sys
 from pathlib import Path
-from preprocess_module import quick_preprocess, PreprocessConfig
+from preprocess_module import quick_preprocess, PreprocessConfig, load_content_list
 
 # ==================== 配置区域 ====================
 # 请修改以下路径为您的实际路径
@@ -76,7 +76,9 @@ def find_json_files(base_path):
         'batch_log.json',
         '_log.json',
         '_config.json',
-        '_report.json'
+        '_report.json',
+        '_skip_pages.json',  # Step1写出的跳过页清单
+        '_triage.json'  # 入库分诊清单
     ]
     
     # 递归查找所有JSON文件
@@ -125,8 +127,7 @@ def process_single_json(json_path, config):
     
     # 检查文件是否可读
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            json.load(f)
+        load_content_list(json_path)
     except json.JSONDecodeError as e:
         print(f"❌ JSON文件格式错误: {e}")
         print("程序立即停止，请检查JSON文件格式")
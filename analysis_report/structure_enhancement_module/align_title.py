@@ -21,6 +21,15 @@ Markdown标题对齐与格式化工具
    - 支持标题文本的模糊匹配（忽略空格差异）
    - 保持标题的原始格式和大小写
 
+4. 页码窗口
+   - JSON标题带有目录印刷页码（page）时，由唯一精确匹配的标题估计印刷页码与page_idx的偏移
+   - 模糊匹配和未匹配标题的LLM插入范围限定在对应的page_idx窗口内
+
+5. 字号线索
+   - Step1导出的<文件名>_headings.json记录PDF文字层中字号较大的候选标题行（含字号排名）
+   - 精确和模糊匹配都失败时，若窗口内某页的候选标题与JSON标题一致，把MD中该页对应的正文行提升为标题，
+     不再交给LLM插入
+
 输入文件：
     - pdf_titles.json: PDF目录结构文件
     - markdown2_cleaned.md: 待处理的Markdown文件
@@ -38,7 +47,7 @@ import json
 import re
 import os
 from rapidfuzz import fuzz, process as rapidfuzz_process
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple, Set, Optional
 from .deepseek_title import deepseek_api, SYSTEM_PROMPT_SELECT_TITLE, SYSTEM_PROMPT_INSERT_POSITION
 from pathlib import Path
 
@@ -46,6 +55,20 @@ def extract_chinese(text: str) -> str:
     """提取文本中的中文字符"""
     return ''.join(char for char in text if '\u4e00' <= char <= '\u9fff')
 
+# 去掉空白和标点（保留字母、数字和中文）
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+def normalize_hint_text(text: str) -> str:
+    """字号线索匹配用的规范化文本：转为小写并去掉空白和标点"""
+    return _NON_WORD_RE.sub('', text.casefold())
+
+def title_key(text: str) -> str:
+    """
+    标题完全匹配用的键：含中文时为中文部分，不含中文（英文报告等）时为规范化后的全文；
+    只有标点的标题为空串，调用方不应把空键当作匹配
+    """
+    return extract_chinese(text) or normalize_hint_text(text)
+
 def normalize_title(title: str) -> str:
     """标准化标题文本，只保留中文字符并移除空白"""
     # 只提取中文字符
@@ -187,6 +210,100 @@ def process_json_titles(titles_json: List) -> List[Tuple[str, int, int, str]]:
     
     return result
 
+# 页码窗口：在印刷页码换算出的page_idx两侧各放宽的页数
+PAGE_WINDOW_SLACK = 1
+# 估计页码偏移至少需要的唯一精确匹配标题数
+MIN_OFFSET_SAMPLES = 2
+PAGE_IDX_RE = re.compile(r'^\s*<page_idx:(\d+)>')
+
+def json_title_pages(titles_json: List) -> List[Tuple[str, int, Optional[int]]]:
+    """按process_json_titles的顺序返回(标题, 原始索引, 印刷页码)，字符串标题或未记录页码时为None"""
+    result = []
+
+    def process_entry(entry, index: int):
+        if isinstance(entry, str):
+            result.append((entry, index, None))
+            return
+        title = entry.get('title', '')
+        if not title:
+            return
+        page = entry.get('page')
+        result.append((title, index, page if isinstance(page, int) else None))
+        for sub in entry.get('subtitles', []):
+            process_entry(sub, index)
+
+    for i, entry in enumerate(titles_json):
+        process_entry(entry, i)
+    return result
+
+def line_page_indices(lines: List[str]) -> List[Optional[int]]:
+    """每一行所在的page_idx（按<page_idx:N>标记划分，第一个标记之前为None）"""
+    pages = []
+    current = None
+    for line in lines:
+        m = PAGE_IDX_RE.match(line)
+        if m:
+            current = int(m.group(1))
+        pages.append(current)
+    return pages
+
+def estimate_page_offset(md_titles: List[Tuple[str, int, int]], line_pages: List[Optional[int]], title_pages: List[Optional[int]], json_titles: List[str]) -> Optional[int]:
+    """
+    估计印刷页码到page_idx的偏移（page_idx = 印刷页码 + 偏移）
+    只使用在MD中恰好出现一次且完全一致（按title_key比较）的标题，取偏移的中位数；
+    样本不足或超过半数样本与中位数相差1页以上时返回None
+    """
+    occurrences: Dict[str, List[int]] = {}
+    for md_title, md_line, _ in md_titles:
+        key = title_key(md_title)
+        if key and line_pages[md_line] is not None:
+            occurrences.setdefault(key, []).append(line_pages[md_line])
+    samples = []
+    for json_title, page in zip(json_titles, title_pages):
+        if page is None:
+            continue
+        found = occurrences.get(title_key(json_title), [])
+        if len(found) == 1:
+            samples.append(found[0] - page)
+    if len(samples) < MIN_OFFSET_SAMPLES:
+        return None
+    samples.sort()
+    offset = samples[len(samples) // 2]
+    if sum(1 for s in samples if abs(s - offset) <= 1) * 2 <= len(samples):
+        return None
+    return offset
+
+def title_page_windows(title_pages: List[Optional[int]], offset: Optional[int]) -> List[Optional[Tuple[Optional[int], Optional[int]]]]:
+    """
+    每个JSON标题的page_idx窗口(起, 止)，None表示该侧不限
+    有页码的标题取其页码；没有页码的标题取前后最近的有页码标题之间
+    """
+    if offset is None:
+        return [None] * len(title_pages)
+    windows = []
+    for j, page in enumerate(title_pages):
+        if page is not None:
+            lo = hi = page
+        else:
+            lo = next((p for p in reversed(title_pages[:j]) if p is not None), None)
+            hi = next((p for p in title_pages[j + 1:] if p is not None), None)
+            if lo is not None and hi is not None and lo > hi:
+                windows.append(None)
+                continue
+        if lo is None and hi is None:
+            windows.append(None)
+            continue
+        windows.append((None if lo is None else lo + offset - PAGE_WINDOW_SLACK,
+                        None if hi is None else hi + offset + PAGE_WINDOW_SLACK))
+    return windows
+
+def in_page_window(page_idx: Optional[int], window: Optional[Tuple[Optional[int], Optional[int]]]) -> bool:
+    """page_idx是否落在窗口内（无窗口或该行没有页码时不限制）"""
+    if window is None or page_idx is None:
+        return True
+    lo, hi = window
+    return (lo is None or page_idx >= lo) and (hi is None or page_idx <= hi)
+
 def find_best_match_in_range(md_titles: List[Tuple[str, int, int]], start_title: str, end_title: str, target_title: str, level: int, api_key: str) -> Tuple[int, float, int]:
     """在指定范围内查找最佳匹配
     Args:
@@ -289,8 +406,91 @@ def find_best_match_in_range(md_titles: List[Tuple[str, int, int]], start_title:
     
     return -1, 0.0, -1
 
-def align_titles(content: str, titles_json_path: str, output_md_path: str) -> Tuple[bool, List[Tuple[str, int, int, str, str, str]]]:
+# 字号线索匹配时，MD正文行（去掉空白和标点后）的长度最多为标题的此倍数（避免把含标题的长句当作标题）
+HINT_LINE_LENGTH_RATIO = 2
+def is_hint_match(text: str, json_title: str) -> Tuple[bool, float]:
+    """
+    字号线索匹配：标题含中文时按is_title_match比较中文部分；
+    不含中文（英文报告等）时比较规范化后的全文，避免两侧中文都为空串时被当作完全匹配
+    Returns:
+        (是否匹配, 相似度)
+    """
+    if extract_chinese(json_title):
+        is_match, similarity, _ = is_title_match(text, json_title)
+        return is_match, similarity
+    key, title_key = normalize_hint_text(text), normalize_hint_text(json_title)
+    if not key or not title_key:
+        return False, 0.0
+    if key == title_key:
+        return True, 1.0
+    similarity = fuzz.ratio(key, title_key) / 100.0
+    if similarity >= 0.8:
+        return True, similarity
+    return False, 0.0
+
+def load_heading_hints(path: Optional[str]) -> Dict[int, List[dict]]:
+    """读取标题字号线索（page_idx -> 候选标题列表）；未提供、不存在或无法解析时返回空字典"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            hints = json.load(f)
+        return {int(page): items for page, items in hints.get('pages', {}).items()}
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"读取标题字号线索失败: {path} - {e}")
+        return {}
+
+def find_hinted_line(lines: List[str], line_pages: List[Optional[int]], heading_hints: Dict[int, List[dict]], json_title: str, start_line: int, window: Optional[Tuple[Optional[int], Optional[int]]]) -> Tuple[int, float, int]:
+    """
+    借助字号线索查找版面分析漏标为正文的标题行
+    先找窗口内与JSON标题一致的候选标题所在页，再在MD中这些页的正文行（start_line之后）里找与标题一致的短行；
+    标题不含中文时按规范化全文比较（见is_hint_match）
+    Returns:
+        (行号, 相似度, 字号排名)；未找到时行号为-1
+    """
+    best = (-1, 0.0, 0)
+    title_length = len(normalize_hint_text(json_title))
+    if not title_length:
+        return best
+    hinted_pages = {}
+    for page, items in heading_hints.items():
+        if not in_page_window(page, window):
+            continue
+        for item in items:
+            if is_hint_match(item['text'], json_title)[0]:
+                hinted_pages[page] = min(hinted_pages.get(page, item['rank']), item['rank'])
+    if not hinted_pages:
+        return best
+    max_chars = title_length * HINT_LINE_LENGTH_RATIO
+    for i in range(start_line + 1, len(lines)):
+        page = line_pages[i]
+        if page not in hinted_pages:
+            continue
+        text = lines[i].strip()
+        if not text or text.startswith('#') or text in ('[', ']') or PAGE_IDX_RE.match(text):
+            continue
+        if len(normalize_hint_text(text)) > max_chars:
+            continue
+        is_match, similarity = is_hint_match(text, json_title)
+        if is_match and similarity > best[1]:
+            best = (i, similarity, hinted_pages[page])
+    return best
+
+def find_exact_match(md_titles: List[Tuple[str, int, int]], matched_md_idx: Set[int], md_ptr: int, json_title: str, line_pages: List[Optional[int]], window: Optional[Tuple[Optional[int], Optional[int]]]) -> int:
+    """从md_ptr起查找与JSON标题完全一致（或title_key一致）且落在页码窗口内的MD标题，返回下标，未找到返回-1"""
+    key = title_key(json_title)
+    for m in range(md_ptr, len(md_titles)):
+        md_title, md_line, _ = md_titles[m]
+        if md_line in matched_md_idx or not in_page_window(line_pages[md_line], window):
+            continue
+        if md_title == json_title or (key and title_key(md_title) == key):
+            return m
+    return -1
+
+def align_titles(content: str, titles_json_path: str, output_md_path: str, heading_hints_path: Optional[str] = None) -> Tuple[bool, List[Tuple[str, int, int, str, str, str]]]:
     """对齐标题并返回未匹配的标题列表（含前后标题信息）
+    Args:
+        heading_hints_path: Step1导出的标题字号线索（<文件名>_headings.json），可选
     Returns:
         Tuple[bool, List[Tuple[str, int, int, str, str, str]]]: (是否成功, 未匹配的标题列表，每项为(标题, 层级, 原始索引, 父标题, prev_title, next_title))
     """
@@ -311,6 +511,16 @@ def align_titles(content: str, titles_json_path: str, output_md_path: str) -> Tu
                 title = m.group(2).strip()
                 md_titles.append((title, i, level))
         print(f"在MD文件中找到 {len(md_titles)} 个标题")
+        # 目录带印刷页码时，按估计的页码偏移限定每个标题的page_idx窗口
+        line_pages = line_page_indices(lines)
+        title_pages = [page for _, _, page in json_title_pages(titles_json)]
+        offset = estimate_page_offset(md_titles, line_pages, title_pages, [t[0] for t in json_titles])
+        windows = title_page_windows(title_pages, offset)
+        if offset is not None:
+            print(f"页码偏移估计: page_idx = 印刷页码 + {offset}，{sum(1 for w in windows if w)} 个标题限定页码窗口")
+        heading_hints = load_heading_hints(heading_hints_path)
+        if heading_hints:
+            print(f"读取标题字号线索: {sum(len(items) for items in heading_hints.values())} 行，{len(heading_hints)} 页")
         matched_md_idx = set()  # 已被匹配的md标题行号
         matched_json_idx = set()  # 已被匹配的json标题索引
         json2md = {}  # json索引->md索引
@@ -318,36 +528,37 @@ def align_titles(content: str, titles_json_path: str, output_md_path: str) -> Tu
         unmatched_titles = []  # (json_title, json_level, json_index, parent, prev_title, next_title)
         md_ptr = 0  # md标题指针
         for j, (json_title, json_level, json_index, parent) in enumerate(json_titles):
-            # 1. 精确匹配
-            found = False
-            for m in range(md_ptr, len(md_titles)):
-                md_title, md_line, md_level = md_titles[m]
-                if md_line in matched_md_idx:
-                    continue
-                # 完全一致/中文一致
-                if md_title == json_title or extract_chinese(md_title) == extract_chinese(json_title):
-                    processed_lines[md_line] = f"{'#'*json_level} {md_title}\n"
-                    matched_md_idx.add(md_line)
-                    matched_json_idx.add(j)
-                    json2md[j] = md_line
-                    md2json[md_line] = j
-                    md_ptr = m + 1
-                    print(f"精确匹配: MD标题 '{md_title}' -> JSON标题 '{json_title}' (层级: {json_level})")
-                    found = True
-                    break
-            if found:
-                continue
-            # 2. 模糊匹配
+            window = windows[j]
+            # 1. 精确匹配（先在页码窗口内查找）
+            exact_m = find_exact_match(md_titles, matched_md_idx, md_ptr, json_title, line_pages, window)
+            # 2. 模糊匹配（限定在页码窗口内）
             best_m = -1
             best_sim = 0
-            for m in range(md_ptr, len(md_titles)):
-                md_title, md_line, md_level = md_titles[m]
-                if md_line in matched_md_idx:
-                    continue
-                is_match, similarity, is_exact = is_title_match(md_title, json_title)
-                if is_match and similarity > best_sim:
-                    best_sim = similarity
-                    best_m = m
+            if exact_m == -1:
+                for m in range(md_ptr, len(md_titles)):
+                    md_title, md_line, md_level = md_titles[m]
+                    # MD标题按页序排列，超出窗口后不必再比较
+                    if window and window[1] is not None and line_pages[md_line] is not None and line_pages[md_line] > window[1]:
+                        break
+                    if md_line in matched_md_idx or not in_page_window(line_pages[md_line], window):
+                        continue
+                    is_match, similarity, is_exact = is_title_match(md_title, json_title)
+                    if is_match and similarity > best_sim:
+                        best_sim = similarity
+                        best_m = m
+            # 窗口内没有匹配时，回退到窗口外的精确匹配（页码偏移在个别章节可能不准）
+            if exact_m == -1 and best_m == -1 and window:
+                exact_m = find_exact_match(md_titles, matched_md_idx, md_ptr, json_title, line_pages, None)
+            if exact_m != -1:
+                md_title, md_line, md_level = md_titles[exact_m]
+                processed_lines[md_line] = f"{'#'*json_level} {md_title}\n"
+                matched_md_idx.add(md_line)
+                matched_json_idx.add(j)
+                json2md[j] = md_line
+                md2json[md_line] = j
+                md_ptr = exact_m + 1
+                print(f"精确匹配: MD标题 '{md_title}' -> JSON标题 '{json_title}' (层级: {json_level})")
+                continue
             if best_m != -1:
                 md_title, md_line, md_level = md_titles[best_m]
                 processed_lines[md_line] = f"{'#'*json_level} {md_title}\n"
@@ -358,7 +569,22 @@ def align_titles(content: str, titles_json_path: str, output_md_path: str) -> Tu
                 md_ptr = best_m + 1
                 print(f"模糊匹配: MD标题 '{md_title}' -> JSON标题 '{json_title}' (层级: {json_level}, 相似度: {best_sim:.2f})")
                 continue
-            # 3. 未匹配，记录前后json标题
+            # 3. 字号线索：版面分析漏标为正文的标题行
+            if heading_hints:
+                last_line = max(json2md.values(), default=-1)
+                hint_line, hint_sim, hint_rank = find_hinted_line(lines, line_pages, heading_hints, json_title, last_line, window)
+                if hint_line != -1:
+                    hint_text = lines[hint_line].strip()
+                    processed_lines[hint_line] = f"{'#'*json_level} {hint_text}\n"
+                    matched_md_idx.add(hint_line)
+                    matched_json_idx.add(j)
+                    json2md[j] = hint_line
+                    md2json[hint_line] = j
+                    while md_ptr < len(md_titles) and md_titles[md_ptr][1] < hint_line:
+                        md_ptr += 1
+                    print(f"字号线索匹配: MD正文 '{hint_text}' -> JSON标题 '{json_title}' (层级: {json_level}, 相似度: {hint_sim:.2f}, 字号排名: {hint_rank})")
+                    continue
+            # 4. 未匹配，记录前后json标题
             prev_title = json_titles[j-1][0] if j > 0 else None
             next_title = json_titles[j+1][0] if j < len(json_titles)-1 else None
             unmatched_titles.append((json_title, json_level, json_index, parent, prev_title, next_title))
@@ -517,6 +743,9 @@ def process_unmatched_titles(aligned_md_path: str, unmatched_titles: List[Tuple[
     print("[process_unmatched_titles] 开始处理未匹配标题...")
     try:
         print(f"[process_unmatched_titles] 未匹配标题总数: {len(unmatched_titles)}")
+        title_entries = json_title_pages(titles_json)
+        title_pages = [page for _, _, page in title_entries]
+        title_texts = [title for title, _, _ in title_entries]
         title_idx = 0
         while title_idx < len(unmatched_titles):
             with open(aligned_md_path, 'r', encoding='utf-8') as f:
@@ -537,32 +766,56 @@ def process_unmatched_titles(aligned_md_path: str, unmatched_titles: List[Tuple[
             prev_line = 0
             next_line = len(lines) - 1
             # 找到前一个标题的行号
-            if prev_title:
+            if prev_title and title_key(prev_title):
                 for md_title, line_num, _ in md_titles:
-                    if extract_chinese(md_title) == extract_chinese(prev_title):
+                    if title_key(md_title) == title_key(prev_title):
                         prev_line = line_num
                         break
             # 找到后一个标题的行号
-            if next_title:
+            if next_title and title_key(next_title):
                 for md_title, line_num, _ in md_titles:
-                    if extract_chinese(md_title) == extract_chinese(next_title):
+                    if title_key(md_title) == title_key(next_title):
                         next_line = line_num
                         break
-            # 自动扩展end_line，保证LLM能看到正文
-            # 如果范围太小（如只覆盖1-2页），则扩展到文档结尾或多给几页
+            # 目录带印刷页码时，把搜索范围收窄到该标题的page_idx窗口
+            line_pages = line_page_indices(lines)
+            position = next((k for k, (title, index, _) in enumerate(title_entries)
+                             if title == json_title and index == json_index), None)
+            window = None
+            if position is not None:
+                offset = estimate_page_offset(md_titles, line_pages, title_pages, title_texts)
+                window = title_page_windows(title_pages, offset)[position]
+            if window:
+                window_lines = [i for i, page in enumerate(line_pages)
+                                if page is not None and in_page_window(page, window)]
+                if window_lines and max(prev_line, window_lines[0]) <= min(next_line, window_lines[-1]):
+                    prev_line = max(prev_line, window_lines[0])
+                    next_line = min(next_line, window_lines[-1])
+                else:
+                    # 窗口与前后标题位置矛盾时不使用窗口
+                    window = None
             all_page_blocks = parse_page_blocks(aligned_md_path)
             print(f"[process_unmatched_titles] 解析出 {len(all_page_blocks)} 个页块")
-            # 统计范围内页数
-            # 新增：严格范围页块
-            strict_page_blocks = filter_page_blocks_by_lines(all_page_blocks, prev_line, next_line, strict_only=True)
-            strict_page_range = [int(page['page_idx']) for page in strict_page_blocks]
-            # 宽松范围用于内容生成
-            page_blocks_in_range = filter_page_blocks_by_lines(all_page_blocks, prev_line, next_line)
-            if len(page_blocks_in_range) <= 2:
-                # 扩展到文档结尾或多给5页
-                last_line = len(lines) - 1
-                next_line = min(last_line, prev_line + 200)  # 200行或结尾
+            if window:
+                pages_in_range = set(line_pages[prev_line:next_line + 1])
+                page_blocks_in_range = [{"page_idx": page_idx, "content": paras} for page_idx, paras in all_page_blocks
+                                        if int(page_idx) in pages_in_range]
+                strict_page_range = [int(page['page_idx']) for page in page_blocks_in_range]
+                print(f"[process_unmatched_titles] 按页码窗口 {window} 限定范围，共 {len(page_blocks_in_range)} 页")
+            else:
+                # 自动扩展end_line，保证LLM能看到正文
+                # 如果范围太小（如只覆盖1-2页），则扩展到文档结尾或多给几页
+                # 统计范围内页数
+                # 新增：严格范围页块
+                strict_page_blocks = filter_page_blocks_by_lines(all_page_blocks, prev_line, next_line, strict_only=True)
+                strict_page_range = [int(page['page_idx']) for page in strict_page_blocks]
+                # 宽松范围用于内容生成
                 page_blocks_in_range = filter_page_blocks_by_lines(all_page_blocks, prev_line, next_line)
+                if len(page_blocks_in_range) <= 2:
+                    # 扩展到文档结尾或多给5页
+                    last_line = len(lines) - 1
+                    next_line = min(last_line, prev_line + 200)  # 200行或结尾
+                    page_blocks_in_range = filter_page_blocks_by_lines(all_page_blocks, prev_line, next_line)
             # 生成 page_blocks_str，保留原始 Markdown 层级和全局行号，并标记类型
             # 先构建全局行号到内容的映射
             line_to_type = {}
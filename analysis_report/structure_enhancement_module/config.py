@@ -56,6 +56,9 @@ class StructureEnhancementConfig:
     extract_temperature: float = 0.0
     extract_top_p: float = 1.0
     
+    # Step1从文字层解析的标题清单（toc_page_N_titles.json）置信度不低于此值时直接使用，不调用VLM
+    local_titles_min_confidence: float = 0.75
+    
     # 示例文件路径
     # 注意：按照extract_title.py的映射
     # sample2base64.txt -> example1_base64 (用于规则C)
@@ -262,7 +265,8 @@ class StructureEnhancementConfig:
             "max_tokens": self.extract_max_tokens,
             "temperature": self.extract_temperature,
             "top_p": self.extract_top_p,
-            "sample_base64_files": self.sample_base64_files
+            "sample_base64_files": self.sample_base64_files,
+            "local_titles_min_confidence": self.local_titles_min_confidence
         }
     
     def get_title_alignment_config(self) -> Dict[str, Any]:
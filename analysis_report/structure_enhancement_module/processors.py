@@ -58,6 +58,9 @@ class BaseProcessor(ABC):
 class TitleExtractor(BaseProcessor):
     """标题提取处理器"""
     
+    # Step1文字层目录解析结果的后缀（与Step1的toc_parser一致）
+    LOCAL_TITLES_SUFFIX = "_titles.json"
+    
     def __init__(self, config: StructureEnhancementConfig):
         super().__init__(config)
         self.qwen_client = create_api_client("qwen", config.get_api_config("qwen"), self.logger)
@@ -74,25 +77,30 @@ class TitleExtractor(BaseProcessor):
                 
                 self.logger.info(f"开始提取标题: {image_path}")
                 
-                # 调用API提取标题
-                result_text = self.qwen_client.extract_titles_from_image(
-                    image_path=image_path,
-                    sample_base64_files=self.extraction_config["sample_base64_files"],
-                    max_tokens=self.extraction_config["max_tokens"],
-                    temperature=self.extraction_config["temperature"],
-                    top_p=self.extraction_config["top_p"]
-                )
-                
-                if not result_text:
-                    raise Exception("API返回空结果")
-                
-                # 显示LLM输出结果（调试用）
-                self.logger.info("=== LLM输出结果 ===")
-                self.logger.info(result_text)
-                self.logger.info("=" * 30)
-                
-                # 解析提取结果
-                titles_data = self._parse_extraction_result(result_text)
+                # 优先使用Step1从文字层解析的标题清单，置信度不足时才调用VLM
+                titles_data = self._load_local_titles(image_path)
+                source = "text_layer"
+                if titles_data is None:
+                    source = "vlm"
+                    # 调用API提取标题
+                    result_text = self.qwen_client.extract_titles_from_image(
+                        image_path=image_path,
+                        sample_base64_files=self.extraction_config["sample_base64_files"],
+                        max_tokens=self.extraction_config["max_tokens"],
+                        temperature=self.extraction_config["temperature"],
+                        top_p=self.extraction_config["top_p"]
+                    )
+                    
+                    if not result_text:
+                        raise Exception("API返回空结果")
+                    
+                    # 显示LLM输出结果（调试用）
+                    self.logger.info("=== LLM输出结果 ===")
+                    self.logger.info(result_text)
+                    self.logger.info("=" * 30)
+                    
+                    # 解析提取结果
+                    titles_data = self._parse_extraction_result(result_text)
                 
                 # 保存结果
                 if output_json_path:
@@ -105,6 +113,7 @@ class TitleExtractor(BaseProcessor):
                     "success": True,
                     "titles_data": titles_data,
                     "output_path": output_json_path,
+                    "source": source,
                     "stats": self.stats.to_dict()
                 }
                 
@@ -119,6 +128,32 @@ class TitleExtractor(BaseProcessor):
                     "stats": self.stats.to_dict()
                 }
     
+    def _load_local_titles(self, image_path: str) -> Optional[List[Dict]]:
+        """
+        读取目录页图像旁的文字层标题清单（toc_page_N_titles.json）
+        
+        Returns:
+            标题结构；文件不存在、无法解析或置信度低于阈值时返回None
+        """
+        image_path = Path(image_path)
+        sidecar = image_path.with_name(image_path.stem + self.LOCAL_TITLES_SUFFIX)
+        if not sidecar.exists():
+            return None
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                local = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取文字层标题清单失败: {sidecar} - {e}")
+            return None
+        
+        confidence = local.get("confidence", 0.0)
+        min_confidence = self.extraction_config["local_titles_min_confidence"]
+        if not local.get("titles") or confidence < min_confidence:
+            self.logger.info(f"文字层标题清单置信度{confidence:.2f}低于{min_confidence:.2f}，改用VLM提取")
+            return None
+        self.logger.info(f"使用文字层标题清单（置信度{confidence:.2f}），跳过VLM调用: {sidecar}")
+        return local["titles"]
+    
     def _parse_extraction_result(self, result_text: str) -> List[Dict]:
         """解析API返回的标题提取结果"""
         try:
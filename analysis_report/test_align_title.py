@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标题对齐测试
+校验由目录印刷页码估计page_idx偏移（含英文目录）、逐标题页码窗口、完全匹配，以及字号线索匹配（含英文标题）
+"""
+
+import pytest
+
+# structure_enhancement_module的包初始化会导入API客户端
+pytest.importorskip("rapidfuzz")
+pytest.importorskip("requests")
+pytest.importorskip("tenacity")
+
+from structure_enhancement_module.align_title import (  # noqa: E402
+    PAGE_WINDOW_SLACK,
+    estimate_page_offset,
+    find_exact_match,
+    find_hinted_line,
+    in_page_window,
+    line_page_indices,
+    title_page_windows,
+)
+
+
+def markdown(pages):
+    """由 [(page_idx, [行])] 构造带<page_idx:N>标记的MD行，返回(行, 每行page_idx, MD标题列表)"""
+    lines = []
+    for page_idx, page_lines in pages:
+        lines.append(f"<page_idx:{page_idx}>")
+        lines.extend(page_lines)
+    md_titles = []
+    for i, line in enumerate(lines):
+        if line.startswith('#'):
+            hashes = len(line) - len(line.lstrip('#'))
+            md_titles.append((line[hashes:].strip(), i, hashes))
+    return lines, line_page_indices(lines), md_titles
+
+
+# ---------- 页码偏移 ----------
+
+def test_offset_from_unique_exact_titles():
+    lines, line_pages, md_titles = markdown([
+        (4, ["# 关于本报告", "正文"]),
+        (8, ["# 公司治理", "正文"]),
+        (14, ["# 环境保护", "正文"]),
+    ])
+    json_titles = ["关于本报告", "公司治理", "环境保护"]
+    assert estimate_page_offset(md_titles, line_pages, [2, 6, 12], json_titles) == 2
+
+
+def test_offset_ignores_repeated_and_unpaged_titles():
+    lines, line_pages, md_titles = markdown([
+        (3, ["# 概述"]),
+        (5, ["# 公司治理"]),
+        (9, ["# 概述"]),
+        (11, ["# 环境保护"]),
+    ])
+    # “概述”在MD中出现两次，不作为样本；只剩一个有页码的样本时不估计
+    assert estimate_page_offset(md_titles, line_pages, [1, 3, None], ["概述", "公司治理", "环境保护"]) is None
+    assert estimate_page_offset(md_titles, line_pages, [1, 3, 9], ["概述", "公司治理", "环境保护"]) == 2
+
+
+def test_offset_rejects_inconsistent_samples():
+    lines, line_pages, md_titles = markdown([
+        (2, ["# 关于本报告"]),
+        (20, ["# 公司治理"]),
+        (5, ["# 环境保护"]),
+        (40, ["# 社会责任"]),
+    ])
+    json_titles = ["关于本报告", "公司治理", "环境保护", "社会责任"]
+    assert estimate_page_offset(md_titles, line_pages, [1, 3, 30, 7], json_titles) is None
+
+
+def test_offset_from_english_titles():
+    lines, line_pages, md_titles = markdown([
+        (4, ["# About This Report", "Body"]),
+        (8, ["# Corporate Governance", "Body"]),
+        (14, ["# Environmental Protection", "Body"]),
+    ])
+    # 英文标题的中文部分都为空，按规范化全文比较（大小写、空白和标点不影响）
+    json_titles = ["About this report", "Corporate governance", "Environmental  Protection."]
+    assert estimate_page_offset(md_titles, line_pages, [2, 6, 12], json_titles) == 2
+
+
+# ---------- 完全匹配 ----------
+
+def test_exact_match_english_titles():
+    lines, line_pages, md_titles = markdown([
+        (3, ["# Chairman's Statement", "# Corporate Governance"]),
+        (5, ["# ...", "# Climate Change"]),
+    ])
+    assert find_exact_match(md_titles, set(), 0, "Climate change", line_pages, None) == 3
+    assert find_exact_match(md_titles, set(), 0, "CORPORATE GOVERNANCE", line_pages, None) == 1
+    # 两侧中文都为空不算匹配
+    assert find_exact_match(md_titles, set(), 0, "Water Stewardship", line_pages, None) == -1
+    # 只有标点的标题不与其他只有标点的标题匹配
+    assert find_exact_match(md_titles, set(), 0, "—", line_pages, None) == -1
+
+
+def test_exact_match_chinese_title_ignores_english_part():
+    lines, line_pages, md_titles = markdown([(3, ["# Environment", "# 环境保护 Environmental Protection"])])
+    assert find_exact_match(md_titles, set(), 0, "环境保护", line_pages, None) == 1
+    assert find_exact_match(md_titles, set(), 0, "环境保护", line_pages, (5, 6)) == -1
+
+
+# ---------- 页码窗口 ----------
+
+def test_windows_without_offset():
+    assert title_page_windows([3, None, 9], None) == [None, None, None]
+
+
+def test_windows_from_printed_pages():
+    slack = PAGE_WINDOW_SLACK
+    windows = title_page_windows([None, 3, None, None, 9, None], 2)
+    assert windows == [
+        (None, 3 + 2 + slack),              # 第一个有页码标题之前：只限上界
+        (3 + 2 - slack, 3 + 2 + slack),
+        (3 + 2 - slack, 9 + 2 + slack),     # 前后有页码标题之间
+        (3 + 2 - slack, 9 + 2 + slack),
+        (9 + 2 - slack, 9 + 2 + slack),
+        (9 + 2 - slack, None),              # 最后一个有页码标题之后：只限下界
+    ]
+
+
+def test_windows_with_decreasing_pages():
+    # 前后页码倒序（目录页码识别有误）时不限制
+    assert title_page_windows([12, None, 4], 0)[1] is None
+    assert title_page_windows([None, None], 0) == [None, None]
+
+
+def test_in_page_window():
+    assert in_page_window(5, None)
+    assert in_page_window(None, (1, 2))
+    assert in_page_window(5, (4, 6))
+    assert in_page_window(5, (None, 5))
+    assert in_page_window(5, (5, None))
+    assert not in_page_window(3, (4, 6))
+    assert not in_page_window(7, (None, 6))
+
+
+# ---------- 字号线索 ----------
+
+def hints(page_idx, *texts):
+    return {page_idx: [{'text': text, 'rank': rank} for rank, text in enumerate(texts, 1)]}
+
+
+def test_hinted_line_chinese_title():
+    lines, line_pages, _ = markdown([(6, ["# 公司治理", "董事会多元化", "本年度董事会共召开会议十二次，审议议案四十项。"])])
+    line, similarity, rank = find_hinted_line(lines, line_pages, hints(6, "董事会多元化"), "董事会多元化", 0, (5, 7))
+    assert (line, similarity, rank) == (2, 1.0, 1)
+    # 窗口之外的页面不使用线索
+    assert find_hinted_line(lines, line_pages, hints(6, "董事会多元化"), "董事会多元化", 0, (8, 9))[0] == -1
+
+
+def test_hinted_line_english_title_ignores_body_text():
+    body = "The company reduced its Scope 1 and Scope 2 emissions by 12% compared with the baseline year."
+    lines, line_pages, _ = markdown([(6, ["# Environment", body, "Climate Change", body])])
+    heading_hints = hints(6, "Climate change")
+
+    # 英文标题与正文的中文部分都为空，不能当作完全匹配
+    line, similarity, _ = find_hinted_line(lines, line_pages, heading_hints, "Climate Change", 0, None)
+    assert (line, similarity) == (3, 1.0)
+    assert find_hinted_line(lines, line_pages, heading_hints, "Water Stewardship", 0, None)[0] == -1
+
+    # 只有正文时找不到标题行
+    lines, line_pages, _ = markdown([(6, ["# Environment", body])])
+    assert find_hinted_line(lines, line_pages, heading_hints, "Climate Change", 0, None)[0] == -1
+
+
+def test_hinted_line_length_cap_uses_whole_line():
+    long_line = "环境保护 Environmental Protection and Resource Conservation"
+    lines, line_pages, _ = markdown([(3, [long_line, "环境保护"])])
+    line, _, _ = find_hinted_line(lines, line_pages, hints(3, "环境保护"), "环境保护", 0, None)
+    assert line == 2
+
+
+def test_hinted_line_rejects_empty_title():
+    lines, line_pages, _ = markdown([(3, ["...", "—"])])
+    assert find_hinted_line(lines, line_pages, hints(3, "—"), "—", 0, None) == (-1, 0.0, 0)